@@ -0,0 +1,85 @@
+import sys
+import logging
+import argparse
+
+from ..benchmarks import runner
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None) -> None:
+    if argv is None:
+        argv = sys.argv
+
+    parser = argparse.ArgumentParser(
+        prog="nxxas_benchmark", description="Benchmark reading, converting and saving"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=None,
+        help="Save the results in this JSON file",
+    )
+    run_parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="Run only small cases",
+    )
+    run_parser.add_argument(
+        "--repeats",
+        type=int,
+        default=3,
+        help="Each stage takes the best time of this number of runs",
+    )
+    run_parser.add_argument(
+        "--workdir",
+        type=str,
+        default=None,
+        help="Directory in which the synthetic data files are written",
+    )
+
+    compare_parser = subparsers.add_parser(
+        "compare", help="Compare benchmark results with reference results"
+    )
+    compare_parser.add_argument(
+        "reference", type=str, help="JSON file with the reference results"
+    )
+    compare_parser.add_argument("results", type=str, help="JSON file with the results")
+
+    args = parser.parse_args(argv[1:])
+    logging.basicConfig()
+
+    if args.command == "run":
+        if args.quick:
+            cases = runner.QUICK_CASES
+        else:
+            cases = runner.DEFAULT_CASES
+        results = runner.run_benchmarks(
+            cases=cases, repeats=args.repeats, workdir=args.workdir
+        )
+        if args.output:
+            runner.save_results(results, args.output)
+        for result in results["results"]:
+            print(
+                f"{result['stage']:>14} {result['case']:>40}: "
+                f"{result['files_per_second']:10.1f} files/s "
+                f"{result['mb_per_second']:8.2f} MB/s "
+                f"{result['peak_memory_mb']:8.2f} MB peak"
+            )
+    else:
+        reference = runner.load_results(args.reference)
+        results = runner.load_results(args.results)
+        for comparison in runner.compare_results(reference, results):
+            print(
+                f"{comparison['stage']:>14} {comparison['case']:>40}: "
+                f"throughput x{comparison['throughput_ratio']:.2f} "
+                f"memory x{comparison['memory_ratio']:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
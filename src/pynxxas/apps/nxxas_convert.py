@@ -4,6 +4,8 @@ import argparse
 
 from .. import models
 from ..io.convert import convert_files
+from ..io.metrics import ConversionStats
+from ..io.hdf5_utils import StoragePolicy
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +40,99 @@ def main(argv=None) -> None:
         help="Overwrite the output file",
     )
 
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help="Only convert new or changed files and append them to the output file (uses a manifest next to the output file)",
+    )
+
+    parser.add_argument(
+        "--hash",
+        action="store_true",
+        help="With --incremental, record the content hash of files and compare it when the modification time changed",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of processes to load and convert files in parallel",
+    )
+
+    parser.add_argument(
+        "--chunks",
+        type=int,
+        default=None,
+        help="Chunk size of HDF5 array datasets (contiguous by default)",
+    )
+
+    parser.add_argument(
+        "--compression",
+        type=str,
+        default=None,
+        choices=["gzip", "lzf"],
+        help="Compression filter of HDF5 array datasets",
+    )
+
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        default=None,
+        help="Compression level for gzip (0-9)",
+    )
+
+    parser.add_argument(
+        "--shuffle",
+        action="store_true",
+        help="Apply the byte shuffle filter before compression",
+    )
+
+    parser.add_argument(
+        "--compact-threshold",
+        type=int,
+        default=0,
+        help="HDF5 array datasets smaller than this number of bytes are stored compact",
+    )
+
+    parser.add_argument(
+        "--rows-per-block",
+        type=int,
+        default=None,
+        help="Convert XDI files to NeXus in blocks of rows to bound the memory of large files",
+    )
+
+    parser.add_argument(
+        "--derive-mu",
+        action="store_const",
+        const=True,
+        default=None,
+        help="Derive the absorption coefficient from the raw intensities (ln(I0/It) and If/I0) of all files which have none (default: beamline files only)",
+    )
+
+    parser.add_argument(
+        "--no-derive-mu",
+        dest="derive_mu",
+        action="store_const",
+        const=False,
+        help="Do not derive the absorption coefficient from raw intensities",
+    )
+
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print the duration, bytes and number of models of each conversion stage",
+    )
+
+    parser.add_argument(
+        "--stats-format",
+        type=str,
+        default="table",
+        choices=["table", "json"],
+        help="Print the statistics as a table or as JSON with the statistics of each file",
+    )
+
     parser.add_argument(
         "output_filename", type=str, help="Convert destination filename"
     )
@@ -45,13 +140,40 @@ def main(argv=None) -> None:
     args = parser.parse_args(argv[1:])
     logging.basicConfig()
 
-    convert_files(
+    storage = StoragePolicy(
+        chunks=(args.chunks,) if args.chunks else None,
+        compression=args.compression,
+        compression_opts=args.compression_level,
+        shuffle=args.shuffle,
+        compact_threshold=args.compact_threshold,
+    )
+
+    if args.stats:
+        stats = ConversionStats()
+    else:
+        stats = None
+
+    return_code = convert_files(
         args.file_patterns,
         args.output_filename,
         args.output_format,
         overwrite=args.overwrite,
+        jobs=args.jobs,
+        storage=storage,
+        incremental=args.incremental,
+        use_hash=args.hash,
+        metrics_sink=stats,
+        rows_per_block=args.rows_per_block,
+        derive_mu=args.derive_mu,
     )
 
+    if stats is not None:
+        if args.stats_format == "json":
+            print(stats.to_json())
+        else:
+            print(stats.format_table())
+    return return_code
+
 
 if __name__ == "__main__":
     sys.exit(main())
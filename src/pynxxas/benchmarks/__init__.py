@@ -0,0 +1,2 @@
+"""Performance benchmarks of the read/convert/write pipeline
+"""
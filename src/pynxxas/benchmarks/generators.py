@@ -0,0 +1,79 @@
+"""Synthetic data files for benchmarks
+"""
+
+import pathlib
+from typing import List
+
+import numpy
+
+
+def write_xdi_file(
+    filename: pathlib.Path,
+    npoints: int = 1000,
+    ncolumns: int = 4,
+    nfields: int = 20,
+    seed: int = 0,
+) -> pathlib.Path:
+    """Write an XDI file with `npoints` rows, `ncolumns` data columns and `nfields`
+    header fields. The first 3 columns are energy, i0 and itrans, the others are
+    counters without a defined meaning."""
+    labels = _column_labels(ncolumns)
+    lines = ["# XDI/1.0 pynxxas-benchmark/1.0"]
+    lines += [f"# Column.{i}: {label}" for i, label in enumerate(labels, 1)]
+    fields = [
+        "Element.symbol: Fe",
+        "Element.edge: K",
+        "Mono.name: Si 111",
+        "Mono.d_spacing: 3.13555",
+        "Facility.name: Synchrotron",
+        "Facility.energy: 6.00 GeV",
+        "Beamline.name: BM00",
+        "Scan.start_time: 2024-01-01T00:00:00",
+        "Scan.edge_energy: 7112.0 eV",
+        "Sample.name: iron foil",
+    ]
+    for i in range(nfields):
+        if i < len(fields):
+            lines.append(f"# {fields[i]}")
+        else:
+            lines.append(f"# Extra.field{i}: {i * 0.5} mm")
+    lines += ["# ///", "# synthetic data", "#----", "# " + " ".join(labels)]
+
+    _write_table(filename, lines, npoints, ncolumns, seed)
+    return filename
+
+
+def write_beamline_file(
+    filename: pathlib.Path,
+    npoints: int = 1000,
+    ncolumns: int = 4,
+    nheader: int = 20,
+    seed: int = 0,
+) -> pathlib.Path:
+    """Write a plain column file with `nheader` header lines, the last one
+    with the column labels, as saved by many beamline acquisition systems."""
+    labels = _column_labels(ncolumns)
+    lines = [f"# Synthetic beamline data line {i}" for i in range(nheader - 1)]
+    lines.append("# " + " ".join(labels))
+
+    _write_table(filename, lines, npoints, ncolumns, seed)
+    return filename
+
+
+def _column_labels(ncolumns: int) -> List[str]:
+    labels = ["energy", "i0", "itrans"]
+    labels += [f"roi{i}" for i in range(ncolumns - len(labels))]
+    return labels
+
+
+def _write_table(
+    filename: pathlib.Path, lines: List[str], npoints: int, ncolumns: int, seed: int
+) -> None:
+    if ncolumns < 3:
+        raise ValueError("At least 3 columns are needed (energy, i0 and itrans)")
+    rng = numpy.random.default_rng(seed)
+    table = rng.uniform(1e4, 1e5, size=(npoints, ncolumns))
+    table[:, 0] = numpy.linspace(7000, 8000, npoints)
+    with open(filename, "w") as fh:
+        fh.write("\n".join(lines) + "\n")
+        numpy.savetxt(fh, table, fmt="%.6f")
@@ -0,0 +1,239 @@
+"""Run the benchmarks and save or compare the results
+"""
+
+import os
+import sys
+import json
+import time
+import pathlib
+import platform
+import tempfile
+import datetime
+import subprocess
+import tracemalloc
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import h5py
+import numpy
+
+from . import generators
+from ..io import xdi
+from ..io import nexus
+from ..io import beamline
+from ..io.convert import convert_files
+from ..io.manifest import PYNXXAS_VERSION
+from ..models import NxXasModel
+from ..models.convert import convert_model
+
+
+class BenchmarkCase(NamedTuple):
+    nfiles: int
+    npoints: int
+    ncolumns: int
+    nfields: int
+
+    @property
+    def name(self) -> str:
+        return (
+            f"{self.nfiles}files_{self.npoints}points_"
+            f"{self.ncolumns}columns_{self.nfields}fields"
+        )
+
+
+DEFAULT_CASES = (
+    BenchmarkCase(nfiles=20, npoints=1000, ncolumns=4, nfields=10),
+    BenchmarkCase(nfiles=20, npoints=1000, ncolumns=16, nfields=50),
+    BenchmarkCase(nfiles=5, npoints=100_000, ncolumns=4, nfields=10),
+)
+
+QUICK_CASES = (BenchmarkCase(nfiles=3, npoints=100, ncolumns=4, nfields=10),)
+
+
+def run_benchmarks(
+    cases: Sequence[BenchmarkCase] = DEFAULT_CASES,
+    repeats: int = 3,
+    workdir: Optional[str] = None,
+) -> dict:
+    """Runs all stages for all cases and returns the results as a JSON serializable
+    dictionary. The time of a stage is the best of `repeats` runs. The peak memory
+    is measured in a separate run since tracing allocations slows down parsing."""
+    with tempfile.TemporaryDirectory(dir=workdir) as tmpdir:
+        results = []
+        for case in cases:
+            casedir = pathlib.Path(tmpdir) / case.name
+            casedir.mkdir()
+            for stage, benchmark in _iter_stages(casedir, case):
+                results.append(_measure(stage, case, benchmark, repeats))
+    return {"metadata": _metadata(), "results": results}
+
+
+def save_results(results: dict, filename: str) -> None:
+    with open(filename, "w") as fh:
+        json.dump(results, fh, indent=2)
+
+
+def load_results(filename: str) -> dict:
+    with open(filename, "r") as fh:
+        return json.load(fh)
+
+
+def compare_results(reference: dict, results: dict) -> List[dict]:
+    """Returns the ratio of the throughput and the peak memory of each stage
+    and case which is in both results. A throughput ratio above 1 is faster
+    and a memory ratio above 1 uses more memory than the reference."""
+    reference_results = {
+        (result["stage"], result["case"]): result for result in reference["results"]
+    }
+    comparison = []
+    for result in results["results"]:
+        reference_result = reference_results.get((result["stage"], result["case"]))
+        if reference_result is None:
+            continue
+        comparison.append(
+            {
+                "stage": result["stage"],
+                "case": result["case"],
+                "throughput_ratio": result["files_per_second"]
+                / reference_result["files_per_second"],
+                "memory_ratio": result["peak_memory_mb"]
+                / max(reference_result["peak_memory_mb"], 1e-6),
+            }
+        )
+    return comparison
+
+
+class _Benchmark(NamedTuple):
+    run: Callable[[], None]
+    nfiles: int
+    nbytes: int
+
+
+def _iter_stages(casedir: pathlib.Path, case: BenchmarkCase):
+    xdi_files = [
+        generators.write_xdi_file(
+            casedir / f"data{i}.xdi",
+            npoints=case.npoints,
+            ncolumns=case.ncolumns,
+            nfields=case.nfields,
+            seed=i,
+        )
+        for i in range(case.nfiles)
+    ]
+    beamline_files = [
+        generators.write_beamline_file(
+            casedir / f"data{i}.dat",
+            npoints=case.npoints,
+            ncolumns=case.ncolumns,
+            nheader=case.nfields,
+            seed=i,
+        )
+        for i in range(case.nfiles)
+    ]
+    xdi_nbytes = sum(os.path.getsize(filename) for filename in xdi_files)
+    beamline_nbytes = sum(os.path.getsize(filename) for filename in beamline_files)
+
+    def load_xdi():
+        for filename in xdi_files:
+            list(xdi.load_xdi_file(filename))
+
+    yield "load_xdi", _Benchmark(load_xdi, case.nfiles, xdi_nbytes)
+
+    def load_beamline():
+        for filename in beamline_files:
+            list(beamline.load_beamline_file(filename))
+
+    yield "load_beamline", _Benchmark(load_beamline, case.nfiles, beamline_nbytes)
+
+    xdi_models = [next(xdi.load_xdi_file(filename)) for filename in xdi_files]
+
+    # The synthetic files only have raw intensities
+    def convert():
+        for xdi_model in xdi_models:
+            list(convert_model(xdi_model, NxXasModel, derive_mu=True))
+
+    yield "convert_model", _Benchmark(convert, case.nfiles, xdi_nbytes)
+
+    nxxas_models = [
+        list(convert_model(xdi_model, NxXasModel, derive_mu=True))
+        for xdi_model in xdi_models
+    ]
+    output_filename = casedir / "output.h5"
+
+    def save_nexus():
+        if output_filename.exists():
+            output_filename.unlink()
+        with nexus.NexusWriter(str(output_filename)) as writer:
+            for i, models in enumerate(nxxas_models, 1):
+                for j, nxxas_model in enumerate(models, 1):
+                    url = f"{output_filename}?path=/dataset{i:02}_{j}"
+                    writer.save(nxxas_model, url)
+
+    save_nexus()
+    nexus_nbytes = os.path.getsize(output_filename)
+    yield "save_nexus", _Benchmark(save_nexus, case.nfiles, nexus_nbytes)
+
+    def convert_all():
+        convert_files(
+            [str(filename) for filename in xdi_files],
+            str(output_filename),
+            "nexus",
+            overwrite=True,
+            derive_mu=True,
+        )
+
+    yield "convert_files", _Benchmark(convert_all, case.nfiles, xdi_nbytes)
+
+
+def _measure(
+    stage: str, case: BenchmarkCase, benchmark: _Benchmark, repeats: int
+) -> dict:
+    seconds = []
+    for _ in range(max(repeats, 1)):
+        t0 = time.perf_counter()
+        benchmark.run()
+        seconds.append(time.perf_counter() - t0)
+    best = min(seconds)
+
+    tracemalloc.start()
+    try:
+        benchmark.run()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "stage": stage,
+        "case": case.name,
+        "parameters": case._asdict(),
+        "seconds": best,
+        "files_per_second": benchmark.nfiles / best,
+        "mb_per_second": benchmark.nbytes / 1024**2 / best,
+        "peak_memory_mb": peak_memory / 1024**2,
+    }
+
+
+def _metadata() -> Dict[str, Optional[str]]:
+    return {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "pynxxas": PYNXXAS_VERSION,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "h5py": h5py.__version__,
+        "platform": platform.platform(),
+        "executable": sys.executable,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=pathlib.Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
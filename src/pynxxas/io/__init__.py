@@ -1,31 +1,88 @@
 """File formats
 """
 
-from typing import Generator
+import importlib
+from typing import Generator, Optional, Sequence
 
 import pydantic
 
 from . import xdi
 from . import nexus
+from . import beamline
+from . import formats
 from .. import models
 from .url_utils import UrlType
+from .hdf5_utils import StoragePolicy
+
+formats.register_format(
+    "beamline",
+    beamline.is_beamline_prefix,
+    beamline.load_beamline_file,
+    priority=0,
+    prefix_size=beamline.HEADER_SIZE,
+)
+formats.register_format("xdi", xdi.is_xdi_prefix, xdi.load_xdi_file, priority=10)
+formats.register_format(
+    "nexus",
+    nexus.is_nexus_prefix,
+    nexus.load_nexus_file,
+    priority=20,
+    prefix_size=nexus.PREFIX_SIZE,
+)
 
 
 def load_models(url: UrlType) -> Generator[pydantic.BaseModel, None, None]:
-    if xdi.is_xdi_file(url):
-        yield from xdi.load_xdi_file(url)
-    elif nexus.is_nexus_file(url):
-        yield from nexus.load_nexus_file(url)
-    else:
+    file_format = formats.detect_format(url)
+    if file_format is None:
         raise NotImplementedError(f"File format not supported: {url}")
+    yield from file_format.load(url)
 
 
-def save_model(model_instance: pydantic.BaseModel, url: UrlType) -> None:
+def save_model(
+    model_instance: pydantic.BaseModel,
+    url: UrlType,
+    nexus_writer: Optional[nexus.NexusWriter] = None,
+    nexus_storage: Optional[StoragePolicy] = None,
+) -> None:
     if isinstance(model_instance, models.NxXasModel):
-        nexus.save_nexus_file(model_instance, url)
+        nexus.save_nexus_file(
+            model_instance, url, writer=nexus_writer, storage=nexus_storage
+        )
     elif isinstance(model_instance, models.XdiModel):
         xdi.save_xdi_file(model_instance, url)
     else:
         raise NotImplementedError(
             f"Saving of {type(model_instance).__name__} not implemented"
         )
+
+
+def save_models(
+    model_instances: Sequence[pydantic.BaseModel],
+    urls: Sequence[UrlType],
+    nexus_writer: Optional[nexus.NexusWriter] = None,
+    nexus_storage: Optional[StoragePolicy] = None,
+) -> None:
+    """Save models like `save_model`. NXxas models are saved in one pass
+    so all their URLs must be in the same file."""
+    if len(model_instances) != len(urls):
+        raise ValueError("The number of models and URLs must be the same")
+    if all(
+        isinstance(model_instance, models.NxXasModel)
+        for model_instance in model_instances
+    ):
+        nexus.save_nexus_models(
+            model_instances, urls, writer=nexus_writer, storage=nexus_storage
+        )
+        return
+    for model_instance, url in zip(model_instances, urls):
+        save_model(
+            model_instance, url, nexus_writer=nexus_writer, nexus_storage=nexus_storage
+        )
+
+
+def __getattr__(name: str):
+    # asyncio is only imported by applications which use it
+    if name in ("aio", "aload_models", "asave_model"):
+        aio = importlib.import_module(".aio", __name__)
+        return aio if name == "aio" else getattr(aio, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
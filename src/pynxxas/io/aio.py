@@ -0,0 +1,217 @@
+"""Loading and saving models from asyncio applications
+"""
+
+import os
+import asyncio
+import functools
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncGenerator, Callable, Iterator, Optional, TypeVar
+
+import numpy
+import pydantic
+
+from .. import io
+from . import nexus
+from . import url_utils
+from .hdf5_utils import StoragePolicy
+from .. import models
+from ..models import units
+
+ResultType = TypeVar("ResultType")
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class AsyncExecutor:
+    """Runs blocking calls in a pool of `max_workers` threads. At most `max_pending`
+    calls are submitted to the pool, other callers wait for a free slot.
+
+    A blocking call cannot be interrupted. When the awaiting task is cancelled, the
+    `cancel_event` is set and the call is awaited until it finishes before
+    `asyncio.CancelledError` is raised. The call can check the event to undo its work.
+    """
+
+    def __init__(
+        self, max_workers: int = DEFAULT_MAX_WORKERS, max_pending: Optional[int] = None
+    ) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pynxxas"
+        )
+        self._max_pending = max_pending or max_workers
+        self._semaphores = dict()
+
+    def __enter__(self) -> "AsyncExecutor":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.shutdown()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    async def run(
+        self,
+        func: Callable[..., ResultType],
+        *args,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> ResultType:
+        loop = asyncio.get_running_loop()
+        async with self._get_semaphore(loop):
+            future = loop.run_in_executor(
+                self._executor, functools.partial(func, *args)
+            )
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if cancel_event is not None:
+                    cancel_event.set()
+                await _wait_uncancellable(future)
+                raise
+
+    def _get_semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        # Semaphores are bound to an event loop
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            for other_loop in list(self._semaphores):
+                if other_loop.is_closed():
+                    del self._semaphores[other_loop]
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self._max_pending)
+        return semaphore
+
+
+def default_executor() -> AsyncExecutor:
+    global _DEFAULT_EXECUTOR
+    with _DEFAULT_EXECUTOR_LOCK:
+        if _DEFAULT_EXECUTOR is None:
+            _DEFAULT_EXECUTOR = AsyncExecutor()
+        return _DEFAULT_EXECUTOR
+
+
+async def aload_models(
+    url: url_utils.UrlType, executor: Optional[AsyncExecutor] = None
+) -> AsyncGenerator[pydantic.BaseModel, None]:
+    """Like `io.load_models` but each model is loaded in the `executor`.
+    The next model is only loaded when the previous one has been consumed.
+    The data arrays of NXxas models are read into memory in the `executor`
+    so that using them does not block the event loop."""
+    if executor is None:
+        executor = default_executor()
+    it_models = io.load_models(url)
+    try:
+        while True:
+            model_instance = await executor.run(_load_next_model, it_models)
+            if model_instance is None:
+                break
+            yield model_instance
+    finally:
+        it_models.close()
+
+
+async def asave_model(
+    model_instance: pydantic.BaseModel,
+    url: url_utils.UrlType,
+    executor: Optional[AsyncExecutor] = None,
+    nexus_writer: Optional[nexus.NexusWriter] = None,
+    nexus_storage: Optional[StoragePolicy] = None,
+) -> None:
+    """Like `io.save_model` but the model is saved in the `executor`.
+
+    When saving fails or is cancelled, the NeXus entry or the file created
+    by saving is removed. Outputs which existed before saving are kept.
+    """
+    if executor is None:
+        executor = default_executor()
+    cancelled = threading.Event()
+    await executor.run(
+        _save_model,
+        model_instance,
+        url,
+        nexus_writer,
+        nexus_storage,
+        cancelled,
+        cancel_event=cancelled,
+    )
+
+
+def _load_next_model(
+    it_models: Iterator[pydantic.BaseModel],
+) -> Optional[pydantic.BaseModel]:
+    model_instance = next(it_models, None)
+    if not isinstance(model_instance, models.NxXasModel):
+        return model_instance
+    # Memory maps and lazy datasets of the NeXus file are read here
+    update = dict()
+    for name in ("energy", "intensity"):
+        value = getattr(model_instance, name)
+        if value is not None:
+            update[name] = units.get_registry().Quantity(
+                numpy.array(value.magnitude), value.units
+            )
+    return model_instance.model_copy(update=update)
+
+
+async def _wait_uncancellable(future: "asyncio.Future[Any]") -> None:
+    while not future.done():
+        try:
+            await asyncio.wait({future})
+        except asyncio.CancelledError:
+            pass
+    if not future.cancelled():
+        _ = future.exception()
+
+
+def _save_model(
+    model_instance: pydantic.BaseModel,
+    url: url_utils.UrlType,
+    nexus_writer: Optional[nexus.NexusWriter],
+    nexus_storage: Optional[StoragePolicy],
+    cancelled: threading.Event,
+) -> None:
+    if not isinstance(model_instance, models.NxXasModel):
+        filename = url_utils.as_url(url).path
+        existed = os.path.exists(filename)
+        try:
+            io.save_model(model_instance, url)
+        except BaseException:
+            if not existed and os.path.exists(filename):
+                os.unlink(filename)
+            raise
+        if cancelled.is_set() and not existed:
+            os.unlink(filename)
+        return
+
+    url = url_utils.as_url(url)
+    if nexus_writer is None:
+        writer_context = nexus.NexusWriter(url.path, storage=nexus_storage)
+    else:
+        writer_context = nullcontext(nexus_writer)
+
+    # h5py serializes all HDF5 calls and writers are not thread-safe
+    with _HDF5_LOCK, writer_context as writer:
+        new_url = _first_new_url(url, writer)
+        try:
+            io.save_model(model_instance, url, nexus_writer=writer)
+        except BaseException:
+            if new_url is not None:
+                writer.remove(new_url)
+            raise
+        if cancelled.is_set() and new_url is not None:
+            writer.remove(new_url)
+
+
+def _first_new_url(
+    url: url_utils.ParsedUrlType, writer: nexus.NexusWriter
+) -> Optional[url_utils.ParsedUrlType]:
+    """The URL of the first group of the URL path which does not exist yet"""
+    parts = [s for s in url.internal_path.split("/") if s]
+    for i in range(len(parts)):
+        parent_url = url_utils.ParsedUrlType(url.path, "/" + "/".join(parts[: i + 1]))
+        if not writer.exists(parent_url):
+            return parent_url
+
+
+_HDF5_LOCK = threading.Lock()
+_DEFAULT_EXECUTOR = None
+_DEFAULT_EXECUTOR_LOCK = threading.Lock()
@@ -0,0 +1,180 @@
+"""Plain-text column files from beamlines without a standard header format
+"""
+
+import re
+from typing import List, Optional, Tuple, Generator
+
+import numpy
+
+from . import utils
+from . import url_utils
+from . import xas_beamlines
+from ..models import units
+from ..models import bragg
+from ..models.xdi import XdiModel, XDI_ARRAY_ALIASES
+
+HEADER_SIZE = 64 * 1024
+
+
+def is_beamline_prefix(prefix: bytes) -> bool:
+    """Text file with a data table of which the column labels give an energy (or
+    monochromator angle) and an absorption coefficient or the raw intensities to
+    derive it. `prefix` should have `HEADER_SIZE` bytes or the complete file."""
+    if not prefix.strip() or b"\0" in prefix:
+        return False
+    try:
+        header, offset, _ = _split_header(prefix, len(prefix) < HEADER_SIZE)
+    except ValueError:
+        return False
+    ncolumns = _count_numbers(prefix[offset:].split(b"\n", 1)[0])
+    beamline_data = xas_beamlines.guess_beamline(header)(header)
+    try:
+        labels = beamline_data.get_array_labels(ncolumns=ncolumns)
+    except ValueError:
+        return False
+    names = {_array_name(label) for label in labels}
+    if beamline_data.energy_units == "deg" and beamline_data.mono_dspace <= 0:
+        return False
+    if names & {"mutrans", "normtrans", "mufluor", "normfluor"}:
+        return True
+    return "i0" in names and bool(names & {"itrans", "ifluor"})
+
+
+def load_beamline_file(url: url_utils.UrlType) -> Generator[XdiModel, None, None]:
+    """The header and the first data lines are read with one bounded read. The
+    header lines are used to guess the beamline and the column labels after which
+    the data table is parsed in bulk starting from the first data line."""
+    filename = url_utils.as_url(url).path
+
+    with open(filename, "rb") as file:
+        prefix = file.read(HEADER_SIZE)
+        is_complete = len(prefix) < HEADER_SIZE
+        header, offset, delimiter = _split_header(prefix, is_complete)
+        file.seek(offset)
+        table = _read_beamline_table(file, delimiter)
+
+    beamline_data = xas_beamlines.guess_beamline(header)(header)
+    labels = beamline_data.get_array_labels(ncolumns=table.shape[1])
+    yield _as_xdi_model(beamline_data, labels, table)
+
+
+def _split_header(prefix: bytes, is_complete: bool) -> Tuple[List[str], int, str]:
+    """Returns the header lines, the byte offset of the first data line and the
+    column delimiter. The data table is the longest block of numeric lines with
+    the same number of columns. Numeric lines in the header (e.g. tables of scan
+    regions) come in shorter blocks."""
+    lines = prefix.splitlines(keepends=True)
+    if not is_complete and lines:
+        lines = lines[:-1]  # can be truncated
+
+    offset = 0
+    block = None  # (line index, offset, number of lines, number of columns)
+    best = None
+    for index, line in enumerate(lines):
+        ncolumns = _count_numbers(line)
+        if ncolumns:
+            if block is not None and block[3] == ncolumns:
+                block = block[0], block[1], block[2] + 1, ncolumns
+            else:
+                block = index, offset, 1, ncolumns
+            if best is None or block[2] >= best[2]:
+                best = block
+        elif line.strip():
+            block = None
+        offset += len(line)
+
+    if best is None:
+        raise ValueError("No data table found in the file header")
+
+    index, offset, _, _ = best
+    encoding = utils.detect_encoding(prefix[:offset])
+    header = [line.decode(encoding, errors="replace").strip() for line in lines[:index]]
+    header = [line for line in header if line]
+    delimiter = "," if b"," in lines[index] else None
+    return header, offset, delimiter
+
+
+def _count_numbers(line: bytes) -> int:
+    """Returns the number of columns when all words are numbers and 0 otherwise"""
+    words = _DELIMITER_REGEX.split(line.strip())
+    try:
+        for word in words:
+            float(word)
+    except ValueError:
+        return 0
+    return len(words)
+
+
+def _read_beamline_table(file, delimiter: Optional[str]) -> numpy.ndarray:
+    return numpy.loadtxt(
+        file, dtype=float, ndmin=2, delimiter=delimiter, comments=_COMMENT_CHARS
+    )
+
+
+def _as_xdi_model(
+    beamline_data: xas_beamlines.GenericBeamlineData,
+    labels: List[str],
+    table: numpy.ndarray,
+) -> XdiModel:
+    energy_index = beamline_data.energy_column - 1
+    energy_units = beamline_data.energy_units
+    if energy_units == "deg":
+        energy_name = "angle"
+    else:
+        energy_name = "energy"
+
+    data = dict()
+    for index, (label, array) in enumerate(zip(labels, table.T)):
+        if index == energy_index:
+            data[energy_name] = units.from_magnitude(array, energy_units)
+            continue
+        name = _array_name(label)
+        if name in data or name == energy_name:
+            name = f"{label}_col{index + 1}"
+        data[name] = units.from_magnitude(array, "")
+
+    content = {"data": data}
+    if type(beamline_data) is not xas_beamlines.GenericBeamlineData:
+        content["beamline"] = {"name": beamline_data.name}
+    if beamline_data.mono_dspace > 0:
+        d_spacing = units.from_magnitude(beamline_data.mono_dspace, "angstrom")
+        content["mono"] = {"d_spacing": d_spacing}
+        if energy_name == "angle":
+            data["energy"] = bragg.angle_to_energy(data["angle"], d_spacing)
+    return XdiModel(**content)
+
+
+def _array_name(label: str) -> str:
+    """XDI array name of a column label. Labels are compared without case and the
+    intensity columns can have a suffix like in 'I0_EH1' or 'It_32'."""
+    name = label.lower()
+    name = _BEAMLINE_ARRAY_ALIASES.get(name, name)
+    if name in _XDI_ARRAY_NAMES:
+        return name
+    prefix = name.split("_")[0]
+    prefix = _BEAMLINE_ARRAY_ALIASES.get(prefix, prefix)
+    if prefix in _INTENSITY_NAMES:
+        return prefix
+    return label
+
+
+_COMMENT_CHARS = list("#;%*!$\x1a")  # including the DOS end-of-file marker
+_DELIMITER_REGEX = re.compile(rb"[\s,]+")
+_BEAMLINE_ARRAY_ALIASES = {
+    **XDI_ARRAY_ALIASES,
+    "io": "i0",
+    "prekb_i0": "i0",
+    "it": "itrans",
+    "mu": "mutrans",
+    "xmu": "mutrans",
+}
+_INTENSITY_NAMES = {"i0", "itrans", "ifluor", "irefer"}
+_XDI_ARRAY_NAMES = {
+    *_INTENSITY_NAMES,
+    "energy",
+    "angle",
+    "mutrans",
+    "normtrans",
+    "mufluor",
+    "normfluor",
+}
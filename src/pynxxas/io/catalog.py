@@ -0,0 +1,265 @@
+"""SQLite catalog of the header metadata of XDI and NeXus files
+"""
+
+import os
+import logging
+import pathlib
+import sqlite3
+import datetime
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import xdi
+from . import nexus
+from . import formats
+from .manifest import PYNXXAS_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+class Catalog:
+    """Index of the scans in an archive of XDI and NeXus files which can be searched
+    without loading the files. Only the file headers are parsed: the element, edge,
+    mode, beamline, facility and start time of each scan.
+
+    A file is parsed again when its size, modification time or the pynxxas version
+    changed since it was indexed. Files in other formats are indexed without scans.
+
+    .. code-block:: python
+
+        with Catalog("archive.sqlite") as catalog:
+            catalog.update(["archive/**/*.xdi", "archive/**/*.h5"], jobs=4)
+            for url in catalog.query(element="Fe", edge="K", mode="transmission"):
+                for model_instance in io.load_models(url):
+                    ...
+    """
+
+    def __init__(self, filename: str) -> None:
+        self._filename = str(filename)
+        self._connection = sqlite3.connect(self._filename)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def update(self, file_patterns: Iterable[str], jobs: int = 1) -> int:
+        """Index the files matching the glob patterns which are new or changed.
+        Headers are parsed in a pool of `jobs` worker processes when `jobs > 1`.
+        Returns the number of files which were indexed."""
+        filenames = list(self._iter_changed(file_patterns))
+        if jobs > 1 and len(filenames) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                chunksize = max(len(filenames) // (4 * jobs), 1)
+                results = executor.map(
+                    _read_scans,
+                    [filename for filename, _ in filenames],
+                    chunksize=chunksize,
+                )
+                return self._record_all(filenames, results)
+        results = map(_read_scans, [filename for filename, _ in filenames])
+        return self._record_all(filenames, results)
+
+    def prune(self) -> int:
+        """Remove the files which no longer exist. Returns the number of removed files."""
+        paths = [
+            path
+            for (path,) in self._connection.execute("SELECT path FROM files")
+            if not os.path.exists(path)
+        ]
+        with self._connection:
+            self._connection.executemany(
+                "DELETE FROM files WHERE path = ?", [(path,) for path in paths]
+            )
+        return len(paths)
+
+    def query(
+        self,
+        element: Optional[str] = None,
+        edge: Optional[str] = None,
+        mode: Optional[str] = None,
+        beamline: Optional[str] = None,
+        facility: Optional[str] = None,
+        start_after: Optional[datetime.datetime] = None,
+        start_before: Optional[datetime.datetime] = None,
+    ) -> List[str]:
+        """URLs of the scans which match all conditions, to be loaded with
+        `io.load_models`. Names are compared without case."""
+        conditions = []
+        parameters = []
+        for column, value in (
+            ("element", element),
+            ("edge", edge),
+            ("mode", mode),
+            ("beamline", beamline),
+            ("facility", facility),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if start_after is not None:
+            conditions.append("start_time >= ?")
+            parameters.append(start_after.isoformat())
+        if start_before is not None:
+            conditions.append("start_time < ?")
+            parameters.append(start_before.isoformat())
+
+        sql = "SELECT DISTINCT url FROM scans"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY url"
+        return [url for (url,) in self._connection.execute(sql, parameters)]
+
+    def _iter_changed(
+        self, file_patterns: Iterable[str]
+    ) -> Iterable[Tuple[str, os.stat_result]]:
+        for file_pattern in file_patterns:
+            for filename in glob(file_pattern, recursive=True):
+                filename = str(pathlib.Path(filename).absolute())
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue
+                if not os.path.isfile(filename):
+                    continue
+                row = self._connection.execute(
+                    "SELECT size, mtime_ns, version FROM files WHERE path = ?",
+                    (filename,),
+                ).fetchone()
+                if row != (stat.st_size, stat.st_mtime_ns, PYNXXAS_VERSION):
+                    yield filename, stat
+
+    def _record_all(
+        self,
+        filenames: List[Tuple[str, os.stat_result]],
+        results: Iterable[Tuple[Optional[str], List[Dict[str, Any]]]],
+    ) -> int:
+        nrecorded = 0
+        for (filename, stat), (error, scans) in zip(filenames, results):
+            if error:
+                logger.warning("Error when indexing '%s': %s", filename, error)
+                continue
+            with self._connection:
+                self._record(filename, stat, scans)
+            nrecorded += 1
+        return nrecorded
+
+    def _record(
+        self, filename: str, stat: os.stat_result, scans: List[Dict[str, Any]]
+    ) -> None:
+        # Deleting the file deletes its scans
+        self._connection.execute("DELETE FROM files WHERE path = ?", (filename,))
+        self._connection.execute(
+            "INSERT INTO files (path, size, mtime_ns, version) VALUES (?, ?, ?, ?)",
+            (filename, stat.st_size, stat.st_mtime_ns, PYNXXAS_VERSION),
+        )
+        self._connection.executemany(
+            "INSERT INTO scans (path, url, element, edge, mode, beamline, facility, start_time)"
+            " VALUES (:path, :url, :element, :edge, :mode, :beamline, :facility, :start_time)",
+            [dict(scan, path=filename) for scan in scans],
+        )
+
+
+def _read_scans(filename: str) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """Header metadata of each scan in a file (runs in worker processes).
+    Returns an error message instead of raising."""
+    try:
+        file_format = formats.detect_format(filename)
+        if file_format is None:
+            return None, []
+        if file_format.name == "xdi":
+            return None, _read_xdi_scans(filename)
+        if file_format.name == "nexus":
+            return None, _read_nexus_scans(filename)
+        return None, []
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", []
+
+
+def _read_xdi_scans(filename: str) -> List[Dict[str, Any]]:
+    """One scan per XAS mode of the data columns"""
+    header = xdi.read_xdi_header(filename)
+    element = header.get("element", {})
+    scan = {
+        "url": filename,
+        "element": _as_text(element.get("symbol")),
+        "edge": _as_text(element.get("edge")),
+        "beamline": _as_text(header.get("beamline", {}).get("name")),
+        "facility": _as_text(header.get("facility", {}).get("name")),
+        "start_time": _as_text(header.get("scan", {}).get("start_time")),
+    }
+    columns = {name.lower() for name in header["column"].values()}
+    modes = [mode for mode, has_mode in _XDI_MODES.items() if has_mode(columns)]
+    return [dict(scan, mode=mode) for mode in modes or [None]]
+
+
+def _read_nexus_scans(filename: str) -> List[Dict[str, Any]]:
+    scans = []
+    for header in nexus.iter_nexus_headers(filename):
+        beamline = header["short_name"]
+        facility = header["instrument"]
+        if beamline and facility and facility.endswith(f"-{beamline}"):
+            facility = facility[: -len(beamline) - 1]
+        scans.append(
+            {
+                "url": f"{filename}?path={header['path']}",
+                "element": _as_text(header["element"]),
+                "edge": _as_text(header["edge"]),
+                "mode": _as_text(header["mode"]),
+                "beamline": _as_text(beamline),
+                "facility": _as_text(facility),
+                "start_time": _as_text(header["start_time"]),
+            }
+        )
+    return scans
+
+
+def _as_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value)
+
+
+# Columns of each mode: the absorption coefficient or the raw intensities from which
+# `models.convert.xdi.to_nxxas` derives it with `derive_mu=True`
+_XDI_MODES = {
+    "transmission": lambda columns: bool({"mutrans", "normtrans"} & columns)
+    or {"i0", "itrans"} <= columns,
+    "fy": lambda columns: bool({"mufluor", "normfluor"} & columns)
+    or {"i0", "ifluor"} <= columns,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    version TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scans (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    element TEXT COLLATE NOCASE,
+    edge TEXT COLLATE NOCASE,
+    mode TEXT COLLATE NOCASE,
+    beamline TEXT COLLATE NOCASE,
+    facility TEXT COLLATE NOCASE,
+    start_time TEXT
+);
+CREATE INDEX IF NOT EXISTS scans_path ON scans (path);
+CREATE INDEX IF NOT EXISTS scans_element_edge ON scans (element, edge);
+"""
@@ -1,12 +1,25 @@
+import os
+import time
 import logging
 import pathlib
 from glob import glob
-from contextlib import contextmanager
-from typing import Iterator, Generator
+from itertools import chain
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Generator, Iterable, List, Optional, Tuple, Type
 
+import pint
 import pydantic
 
 from .. import io
+from . import xdi
+from . import nexus
+from . import formats
+from . import metrics
+from . import manifest
+from . import url_utils
+from .hdf5_utils import StoragePolicy
 from .. import models
 from ..models import convert
 
@@ -18,63 +31,444 @@ def convert_files(
     output_filename: str,
     output_format: str,
     overwrite: bool = False,
+    jobs: int = 1,
+    storage: Optional[StoragePolicy] = None,
+    incremental: bool = False,
+    use_hash: bool = False,
+    metrics_sink: Optional[metrics.MetricsSink] = None,
+    rows_per_block: Optional[int] = None,
+    derive_mu: Optional[bool] = None,
 ) -> int:
+    """Convert all files matching the patterns to the output format.
+
+    With `jobs > 1`, files are loaded and converted in a pool of `jobs` worker
+    processes while saving is done in the calling process. Output models are
+    saved in input order so the scan numbering does not depend on the workers.
+
+    The `storage` policy applies to array datasets when saving in NeXus format.
+
+    With `incremental=True` a sidecar manifest records the outputs of each input
+    file. When converting to an existing output with a manifest, unchanged input
+    files are skipped, the outputs of changed input files are replaced and new
+    input files are appended. Input files which no longer exist are removed from the
+    manifest while their outputs are kept. With `use_hash=True` an input file is also
+    unchanged when only its modification time changed. With `overwrite=True` the
+    output and the manifest are replaced and all input files are converted.
+
+    The `metrics_sink` is called with the `metrics.StageMetrics` of loading and
+    converting each input file and saving the output models of each scan. With
+    `jobs > 1` the load and convert durations are measured in the worker processes.
+
+    With `rows_per_block` and the NeXus output format, XDI files are loaded, converted
+    and saved in blocks of rows so that the memory does not grow with the size of the
+    data table. This only applies to serial conversions (`jobs=1`). The load and
+    convert metrics of these files are included in the save metrics.
+
+    The absorption coefficient of input files which only have raw intensities is
+    derived from the intensities (see `convert_model`) for all files with
+    `derive_mu=True`, for no files with `derive_mu=False` and for files in beamline
+    format by default. Input files which are loaded but give no output model are
+    counted as failed.
+    """
     model_type = models.MODELS[output_format]
 
     output_filename = pathlib.Path(output_filename)
-    if output_filename.exists():
-        if not overwrite:
-            return 1
-        output_filename.unlink()
+    manifest_filename = manifest.manifest_filename(output_filename)
+    conversion_manifest = None
+    if (
+        incremental
+        and not overwrite
+        and output_filename.exists()
+        and manifest_filename.exists()
+    ):
+        conversion_manifest = manifest.ConversionManifest.load(
+            manifest_filename, use_hash=use_hash
+        )
+        for filename in conversion_manifest.prune():
+            logger.info("Input file '%s' no longer exists", filename)
+    else:
+        if output_filename.exists():
+            if not overwrite:
+                return 1
+            output_filename.unlink()
+        if manifest_filename.exists():
+            manifest_filename.unlink()
+        if incremental:
+            conversion_manifest = manifest.ConversionManifest(
+                manifest_filename, use_hash=use_hash
+            )
     output_filename.parent.mkdir(parents=True, exist_ok=True)
 
-    state = {"return_code": 0, "scan_number": 0, "filename": None}
-    scan_number = 0
-    for model_in in _iter_load_models(file_patterns, state):
-        scan_number += 1
-        for model_out in _iter_convert_model(model_in, model_type, state):
-            if output_format == "nexus":
-                output_url = f"{output_filename}?path=/dataset{scan_number:02}"
-                if model_out.NX_class == "NXsubentry":
-                    output_url = f"{output_url}/{model_out.mode.replace(' ', '_')}"
-            else:
-                basename = f"{output_filename.stem}_{scan_number:02}"
-                if model_out.NX_class == "NXsubentry":
-                    basename = f"{basename}_{model_out.mode.replace(' ', '_')}"
-                output_url = output_filename.parent / basename + output_filename.suffix
-
-            with _handle_error("saving", state):
-                io.save_model(model_out, output_url)
+    filenames = _iter_filenames(file_patterns)
+    if conversion_manifest is not None:
+        filenames = conversion_manifest.iter_changed(filenames)
+
+    state = {
+        "return_code": 0,
+        "scan_number": 0,
+        "filename": None,
+        "failed": set(),
+        "metrics_sink": metrics_sink,
+        "derive_mu": derive_mu,
+    }
+    if jobs > 1:
+        it_models_out = _iter_convert_files_parallel(filenames, model_type, state, jobs)
+    else:
+        if output_format != "nexus":
+            rows_per_block = None
+        it_models_out = _iter_convert_files(
+            filenames, model_type, state, rows_per_block=rows_per_block
+        )
+
+    if output_format == "nexus":
+        nexus_writer = nexus.NexusWriter(str(output_filename), storage=storage)
+    else:
+        nexus_writer = None
+
+    if conversion_manifest is None:
+        scan_number = 0
+    else:
+        scan_number = conversion_manifest.last_scan_number
+    outputs = dict()
+    try:
+        with nexus_writer or nullcontext():
+            for models_out in it_models_out:
+                filename = state["filename"]
+                if conversion_manifest is not None and filename not in outputs:
+                    outputs[filename] = []
+                    with _handle_error("removing previous outputs of", state):
+                        previous_outputs = conversion_manifest.get_outputs(filename)
+                        _remove_outputs(previous_outputs, nexus_writer)
+
+                scan_number += 1
+                if isinstance(models_out, _BlockStream):
+                    blocks = models_out
+                    models_out = []
+                    with _handle_error("loading", state):
+                        models_out = next(blocks, [])
+                else:
+                    blocks = None
+                    models_out = list(models_out)
+                if not models_out:
+                    continue
+                output_urls = [
+                    _output_url(model_out, output_filename, output_format, scan_number)
+                    for model_out in models_out
+                ]
+                if conversion_manifest is not None:
+                    # Recorded before saving so that partial outputs are replaced
+                    outputs[filename].extend(str(url) for url in output_urls)
+
+                nerrors = state.get("nerrors", 0)
+                t0 = time.perf_counter()
+                with _handle_error("saving", state):
+                    if blocks is None:
+                        io.save_models(
+                            models_out, output_urls, nexus_writer=nexus_writer
+                        )
+                    else:
+                        nexus_writer.save_blocks(
+                            chain([models_out], blocks), output_urls
+                        )
+                if metrics_sink is not None:
+                    nfailed = state.get("nerrors", 0) - nerrors
+                    if nexus_writer is None:
+                        nbytes = sum(_file_size(url) for url in output_urls)
+                    elif blocks is not None:
+                        nbytes = blocks.nbytes
+                    else:
+                        nbytes = sum(map(_model_nbytes, models_out))
+                    metrics_sink(
+                        metrics.StageMetrics(
+                            "save",
+                            str(filename),
+                            time.perf_counter() - t0,
+                            nmodels=0 if nfailed else len(models_out),
+                            nbytes=nbytes,
+                            nfailed=nfailed,
+                        )
+                    )
+    finally:
+        if conversion_manifest is not None:
+            for filename, file_outputs in outputs.items():
+                complete = filename not in state["failed"]
+                conversion_manifest.record(filename, file_outputs, complete=complete)
+            conversion_manifest.last_scan_number = scan_number
+            conversion_manifest.save()
 
     return state["return_code"]
 
 
-def _iter_load_models(
-    file_patterns: Iterator[str], state: dict
-) -> Generator[pydantic.BaseModel, None, None]:
+def _output_url(
+    model_out: pydantic.BaseModel,
+    output_filename: pathlib.Path,
+    output_format: str,
+    scan_number: int,
+) -> url_utils.UrlType:
+    """All modes of a scan are saved in one NeXus entry or in one file per mode"""
+    if output_format == "nexus":
+        output_url = f"{output_filename}?path=/dataset{scan_number:02}"
+        if model_out.NX_class == "NXsubentry":
+            output_url = f"{output_url}/{_mode_name(model_out)}"
+        return output_url
+
+    basename = f"{output_filename.stem}_{scan_number:02}"
+    if getattr(model_out, "NX_class", None) == "NXsubentry":
+        basename = f"{basename}_{_mode_name(model_out)}"
+    return output_filename.parent / (basename + output_filename.suffix)
+
+
+def _mode_name(model_out: pydantic.BaseModel) -> str:
+    return str(model_out.mode.name).replace(" ", "_")
+
+
+def _remove_outputs(
+    output_urls: List[str], nexus_writer: Optional[nexus.NexusWriter]
+) -> None:
+    """Remove the NeXus entries or files of previous conversions"""
+    for output_url in output_urls:
+        if nexus_writer is None:
+            pathlib.Path(output_url).unlink(missing_ok=True)
+            continue
+        url = url_utils.as_url(output_url)
+        entry_name = url.internal_path.strip("/").split("/")[0]
+        nexus_writer.remove(f"{url.path}?path=/{entry_name}")
+
+
+def _iter_filenames(
+    file_patterns: Iterator[str],
+) -> Generator[pathlib.Path, None, None]:
     for file_pattern in file_patterns:
         for filename in glob(file_pattern):
-            filename = pathlib.Path(filename).absolute()
+            yield pathlib.Path(filename).absolute()
+
+
+def _iter_convert_files(
+    filenames: Iterable[pathlib.Path],
+    model_type: Type[pydantic.BaseModel],
+    state: dict,
+    rows_per_block: Optional[int] = None,
+) -> Generator[Iterable[pydantic.BaseModel], None, None]:
+    """Yields the output models for each input model. With `rows_per_block`, XDI files
+    yield a `_BlockStream` of the output models of each block of rows instead."""
+    for filename in filenames:
+        if rows_per_block and _is_xdi_file(filename):
             state["filename"] = filename
-            it_model_in = io.load_models(filename)
-            while True:
-                with _handle_error("loading", state):
-                    try:
-                        yield next(it_model_in)
-                    except StopIteration:
-                        break
+            yield _BlockStream(
+                _iter_convert_blocks(
+                    filename,
+                    model_type,
+                    rows_per_block,
+                    _derive_mu(filename, state.get("derive_mu")),
+                )
+            )
+            continue
+        for model_in in _iter_load_models(filename, state):
+            yield _iter_convert_model(model_in, model_type, state)
+
+
+class _BlockStream:
+    """Iterator of the output models of each block of rows of an input file. The
+    number of bytes of array data is counted while iterating."""
+
+    def __init__(self, blocks: Iterator[List[pydantic.BaseModel]]) -> None:
+        self._blocks = blocks
+        self.nbytes = 0
+
+    def __iter__(self) -> "_BlockStream":
+        return self
+
+    def __next__(self) -> List[pydantic.BaseModel]:
+        models_out = next(self._blocks)
+        self.nbytes += sum(map(_model_nbytes, models_out))
+        return models_out
+
+
+def _iter_convert_blocks(
+    filename: pathlib.Path,
+    model_type: Type[pydantic.BaseModel],
+    rows_per_block: int,
+    derive_mu: bool = False,
+) -> Generator[List[pydantic.BaseModel], None, None]:
+    for model_in in xdi.iter_xdi_blocks(filename, rows_per_block=rows_per_block):
+        yield list(convert.convert_model(model_in, model_type, derive_mu=derive_mu))
+
+
+def _is_xdi_file(filename: pathlib.Path) -> bool:
+    try:
+        return xdi.is_xdi_file(filename)
+    except OSError:
+        return False
+
+
+def _iter_convert_files_parallel(
+    filenames: Iterable[pathlib.Path],
+    model_type: Type[pydantic.BaseModel],
+    state: dict,
+    jobs: int,
+) -> Generator[Iterable[pydantic.BaseModel], None, None]:
+    """Yields the output models for each input model. Files are loaded and converted
+    by worker processes and the results are yielded in input order."""
+    max_pending = 2 * jobs
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque()
+        filenames = iter(filenames)
+        while True:
+            for filename in filenames:
+                future = executor.submit(
+                    _convert_file, filename, model_type, state.get("derive_mu")
+                )
+                pending.append((filename, future))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+
+            filename, future = pending.popleft()
+            state["filename"] = filename
+            models_out = []
+            with _handle_error("converting", state):
+                return_code, models_out, file_metrics = future.result()
+                if return_code:
+                    state["return_code"] = return_code
+                    state["failed"].add(filename)
+                if state["metrics_sink"] is not None:
+                    for stage_metrics in file_metrics:
+                        state["metrics_sink"](stage_metrics)
+            for models_out_per_scan in models_out:
+                state["filename"] = filename
+                yield models_out_per_scan
+
+
+def _convert_file(
+    filename: pathlib.Path,
+    model_type: Type[pydantic.BaseModel],
+    derive_mu: Optional[bool],
+) -> Tuple[int, List[List[pydantic.BaseModel]], List[metrics.StageMetrics]]:
+    """Load and convert one file in a worker process"""
+    file_metrics = []
+    state = {
+        "return_code": 0,
+        "scan_number": 0,
+        "filename": filename,
+        "metrics_sink": file_metrics.append,
+        "derive_mu": derive_mu,
+    }
+    models_out = [
+        list(_iter_convert_model(model_in, model_type, state))
+        for model_in in _iter_load_models(filename, state)
+    ]
+    return state["return_code"], models_out, file_metrics
+
+
+def _iter_load_models(
+    filename: pathlib.Path, state: dict
+) -> Generator[pydantic.BaseModel, None, None]:
+    state["filename"] = filename
+    nfailed = 0
+    nmodels = 0
+    seconds = 0.0
+    try:
+        it_model_in = io.load_models(filename)
+        while True:
+            model_in = None
+            # Errors when converting the yielded models are not counted
+            nerrors = state.get("nerrors", 0)
+            t0 = time.perf_counter()
+            with _handle_error("loading", state):
+                try:
+                    model_in = next(it_model_in)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - t0
+            nfailed += state.get("nerrors", 0) - nerrors
+            if model_in is not None:
+                nmodels += 1
+                yield model_in
+    finally:
+        if state.get("metrics_sink") is not None:
+            state["metrics_sink"](
+                metrics.StageMetrics(
+                    "load",
+                    str(filename),
+                    seconds,
+                    nmodels=nmodels,
+                    nbytes=_file_size(filename),
+                    nfailed=nfailed,
+                )
+            )
 
 
 def _iter_convert_model(
-    model_in: Iterator[pydantic.BaseModel], model_type: str, state: dict
+    model_in: Iterator[pydantic.BaseModel],
+    model_type: Type[pydantic.BaseModel],
+    state: dict,
 ) -> Generator[pydantic.BaseModel, None, None]:
-    it_model_out = convert.convert_model(model_in, model_type)
-    while True:
-        with _handle_error("converting", state):
-            try:
-                yield next(it_model_out)
-            except StopIteration:
-                break
+    nerrors = state.get("nerrors", 0)
+    nmodels = 0
+    seconds = 0.0
+    try:
+        derive_mu = _derive_mu(state["filename"], state.get("derive_mu"))
+        it_model_out = convert.convert_model(model_in, model_type, derive_mu=derive_mu)
+        while True:
+            model_out = None
+            t0 = time.perf_counter()
+            with _handle_error("converting", state):
+                try:
+                    model_out = next(it_model_out)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += time.perf_counter() - t0
+            if model_out is not None:
+                nmodels += 1
+                yield model_out
+        if not nmodels and state.get("nerrors", 0) == nerrors:
+            with _handle_error("converting", state):
+                raise NotImplementedError(
+                    f"no {model_type.__name__} model (the file has no absorption coefficient, see derive_mu)"
+                )
+    finally:
+        if state.get("metrics_sink") is not None:
+            state["metrics_sink"](
+                metrics.StageMetrics(
+                    "convert",
+                    str(state["filename"]),
+                    seconds,
+                    nmodels=nmodels,
+                    nfailed=state.get("nerrors", 0) - nerrors,
+                )
+            )
+
+
+def _derive_mu(filename: pathlib.Path, derive_mu: Optional[bool]) -> bool:
+    """Beamline files mostly have raw intensities only"""
+    if derive_mu is not None:
+        return derive_mu
+    try:
+        file_format = formats.detect_format(filename)
+    except OSError:
+        return False
+    return file_format is not None and file_format.name == "beamline"
+
+
+def _file_size(filename: pathlib.Path) -> int:
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+def _model_nbytes(model_instance: pydantic.BaseModel) -> int:
+    """Number of bytes of the array data in a model"""
+    nbytes = 0
+    for field_value in model_instance.__dict__.values():
+        if isinstance(field_value, pydantic.BaseModel):
+            nbytes += _model_nbytes(field_value)
+        elif isinstance(field_value, pint.Quantity):
+            nbytes += getattr(field_value.magnitude, "nbytes", 0)
+    return nbytes
 
 
 @contextmanager
@@ -83,7 +477,11 @@ def _handle_error(action: str, state: dict) -> Generator[None, None, None]:
         yield
     except NotImplementedError as e:
         state["return_code"] = 1
+        state["nerrors"] = state.get("nerrors", 0) + 1
+        state.setdefault("failed", set()).add(state["filename"])
         logger.warning("Error when %s '%s': %s", action, state["filename"], e)
     except Exception:
         state["return_code"] = 1
+        state["nerrors"] = state.get("nerrors", 0) + 1
+        state.setdefault("failed", set()).add(state["filename"])
         logger.error("Error when %s '%s'", action, state["filename"], exc_info=True)
@@ -0,0 +1,180 @@
+"""Index of the NXxas entries and subentries of a NeXus file
+"""
+
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import h5py
+import numpy
+import pint
+
+from ..models import units
+
+ENTRY_INDEX_NAME = "entry_index"
+
+ENTRY_INDEX_DTYPE = numpy.dtype(
+    [
+        ("path", h5py.string_dtype()),
+        ("element", "S3"),
+        ("edge", "S3"),
+        ("mode", "S16"),
+        ("npoints", numpy.int64),
+        ("energy_min", numpy.float64),
+        ("energy_max", numpy.float64),
+    ]
+)
+
+
+class EntryIndex:
+    """Structured array dataset at the root of a NeXus file with one row per NXxas
+    group: the HDF5 path, element, edge, mode, number of points and energy range
+    in eV. The row of a group which is saved again is replaced. The rows of a group
+    and the groups below it are removed with the group.
+    """
+
+    def __init__(self, nxroot: h5py.File) -> None:
+        self._nxroot = nxroot
+        self._positions: Dict[str, int] = dict()
+        dataset = nxroot.get(ENTRY_INDEX_NAME)
+        if isinstance(dataset, h5py.Dataset):
+            paths = dataset.fields("path")[()]
+            self._positions = {decode(path): i for i, path in enumerate(paths)}
+
+    def update(self, rows: Sequence[tuple]) -> None:
+        """Add rows (see `index_row`) or replace the rows with the same path"""
+        if not rows:
+            return
+        dataset = self._get_dataset()
+        new_rows = list()
+        for row in rows:
+            position = self._positions.get(row[0])
+            if position is None:
+                self._positions[row[0]] = len(dataset) + len(new_rows)
+                new_rows.append(row)
+            else:
+                dataset[position] = numpy.array(row, dtype=ENTRY_INDEX_DTYPE)
+        if new_rows:
+            n = len(dataset)
+            dataset.resize((n + len(new_rows),))
+            dataset[n:] = numpy.array(new_rows, dtype=ENTRY_INDEX_DTYPE)
+
+    def remove(self, path: str) -> None:
+        """Remove the rows of a group and the groups below it"""
+        path = "/" + path.strip("/")
+        removed = {
+            indexed_path
+            for indexed_path in self._positions
+            if indexed_path == path or indexed_path.startswith(path + "/")
+        }
+        if not removed:
+            return
+        dataset = self._get_dataset()
+        rows = dataset[()]
+        keep = [decode(row_path) not in removed for row_path in rows["path"]]
+        rows = rows[keep]
+        dataset.resize((len(rows),))
+        dataset[...] = rows
+        self._positions = {decode(path): i for i, path in enumerate(rows["path"])}
+
+    def _get_dataset(self) -> h5py.Dataset:
+        dataset = self._nxroot.get(ENTRY_INDEX_NAME)
+        if dataset is None:
+            dataset = self._nxroot.create_dataset(
+                ENTRY_INDEX_NAME,
+                shape=(0,),
+                maxshape=(None,),
+                chunks=(_ROWS_PER_CHUNK,),
+                dtype=ENTRY_INDEX_DTYPE,
+            )
+        return dataset
+
+
+def read_entry_index(nxroot: h5py.File) -> Optional[numpy.ndarray]:
+    """The index rows as a structured array or `None` when the file has no index"""
+    dataset = nxroot.get(ENTRY_INDEX_NAME)
+    if not isinstance(dataset, h5py.Dataset):
+        return None
+    return dataset[()]
+
+
+def read_matching_entry_index(nxroot: h5py.File) -> Optional[numpy.ndarray]:
+    """Like `read_entry_index` but `None` when the index does not match the groups at
+    the root of the file. This is the case for entries which are being streamed,
+    which were left by a crashed stream or which were written by other HDF5 tools."""
+    rows = read_entry_index(nxroot)
+    if rows is None:
+        return None
+    indexed_names = {decode(path).strip("/").split("/")[0] for path in rows["path"]}
+    group_names = {
+        name for name in nxroot if nxroot.get(name, getclass=True) is h5py.Group
+    }
+    if indexed_names != group_names:
+        return None
+    return rows
+
+
+def rows_below(rows: numpy.ndarray, path: str) -> numpy.ndarray:
+    """The index rows of a group and the groups below it"""
+    path = "/" + path.strip("/")
+    if path == "/":
+        return rows
+    mask = [
+        row_path == path or row_path.startswith(path + "/")
+        for row_path in map(decode, rows["path"])
+    ]
+    return rows[numpy.asarray(mask, dtype=bool)]
+
+
+def index_row(
+    path: str,
+    element: Optional[str],
+    edge: Optional[str],
+    mode: Optional[str],
+    npoints: int,
+    energy_range: Tuple[float, float],
+) -> tuple:
+    return (
+        path,
+        encode(element),
+        encode(edge),
+        encode(mode),
+        npoints,
+        *energy_range,
+    )
+
+
+def energy_range(energy: Any) -> Tuple[float, float]:
+    """Minimum and maximum energy in eV. NaN when there are no points or the
+    units are not energy units."""
+    if energy is None or not energy.size:
+        return numpy.nan, numpy.nan
+    magnitude = numpy.asarray(energy.magnitude, dtype=float).ravel()
+    limits = numpy.array([numpy.fmin.reduce(magnitude), numpy.fmax.reduce(magnitude)])
+    try:
+        limits = units.from_magnitude(limits, energy.units).m_as("eV")
+    except pint.DimensionalityError:
+        return numpy.nan, numpy.nan
+    return float(limits[0]), float(limits[1])
+
+
+def combine_energy_ranges(*ranges: Tuple[float, float]) -> Tuple[float, float]:
+    """Energy range of all points of several energy ranges (NaN is ignored)"""
+    if not ranges:
+        return numpy.nan, numpy.nan
+    minima = [energy_min for energy_min, _ in ranges]
+    maxima = [energy_max for _, energy_max in ranges]
+    return float(numpy.fmin.reduce(minima)), float(numpy.fmax.reduce(maxima))
+
+
+def encode(value: Optional[str]) -> bytes:
+    if value is None:
+        return b""
+    return str(value).encode()
+
+
+def decode(value: Any) -> str:
+    if isinstance(value, bytes):
+        return value.decode()
+    return str(value)
+
+
+_ROWS_PER_CHUNK = 256
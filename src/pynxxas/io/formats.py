@@ -0,0 +1,86 @@
+"""Registry of file formats which can be loaded. The format of a file is
+detected from a small prefix of the file.
+"""
+
+import os
+from functools import lru_cache
+from typing import Callable, Generator, List, NamedTuple, Optional
+
+import pydantic
+
+from . import url_utils
+
+PREFIX_SIZE = 1024
+
+
+class FileFormat(NamedTuple):
+    name: str
+    matches: Callable[[bytes], bool]
+    load: Callable[[url_utils.UrlType], Generator[pydantic.BaseModel, None, None]]
+    priority: int = 0
+    prefix_size: int = PREFIX_SIZE
+
+
+_FORMATS: List[FileFormat] = list()
+
+
+def register_format(
+    name: str,
+    matches: Callable[[bytes], bool],
+    load: Callable[[url_utils.UrlType], Generator[pydantic.BaseModel, None, None]],
+    priority: int = 0,
+    prefix_size: int = PREFIX_SIZE,
+) -> None:
+    """Register a file format. `matches` gets the first bytes of a file (up to
+    `prefix_size`) and returns whether the file has this format. Formats with a
+    higher priority are tried first."""
+    _FORMATS[:] = [file_format for file_format in _FORMATS if file_format.name != name]
+    _FORMATS.append(
+        FileFormat(
+            name=name,
+            matches=matches,
+            load=load,
+            priority=priority,
+            prefix_size=prefix_size,
+        )
+    )
+    _FORMATS.sort(key=lambda file_format: -file_format.priority)
+    _detect_format.cache_clear()
+
+
+def unregister_format(name: str) -> None:
+    _FORMATS[:] = [file_format for file_format in _FORMATS if file_format.name != name]
+    _detect_format.cache_clear()
+
+
+def get_format(name: str) -> FileFormat:
+    for file_format in _FORMATS:
+        if file_format.name == name:
+            return file_format
+    raise KeyError(f"File format '{name}' is not registered")
+
+
+def detect_format(url: url_utils.UrlType) -> Optional[FileFormat]:
+    """Returns the format of a file or `None` when not supported. The result is
+    cached for as long as the modification time and size of the file do not change."""
+    filename = url_utils.as_url(url).path
+    stat = os.stat(filename)
+    return _detect_format(filename, stat.st_mtime_ns, stat.st_size)
+
+
+def read_prefix(url: url_utils.UrlType, size: int = PREFIX_SIZE) -> bytes:
+    filename = url_utils.as_url(url).path
+    with open(filename, "rb") as file:
+        return file.read(size)
+
+
+@lru_cache(maxsize=1024)
+def _detect_format(filename: str, mtime_ns: int, size: int) -> Optional[FileFormat]:
+    # The prefix is only read again when a format needs more bytes
+    prefix = b""
+    for file_format in _FORMATS:
+        prefix_size = min(file_format.prefix_size, size)
+        if len(prefix) < prefix_size:
+            prefix = read_prefix(filename, max(prefix_size, PREFIX_SIZE))
+        if file_format.matches(prefix[: file_format.prefix_size]):
+            return file_format
@@ -1,7 +1,67 @@
 import os
-from typing import Optional, Union
+from typing import Any, NamedTuple, Optional, Tuple, Union
 
 import h5py
+import numpy
+
+
+# HDF5 limits compact datasets to 64 KiB (including the object header)
+_MAX_COMPACT_NBYTES = 60 * 1024
+
+
+class StoragePolicy(NamedTuple):
+    """HDF5 storage of numerical array datasets.
+
+    :param chunks: chunk shape, `True` for automatic chunking or `None` for contiguous storage
+    :param compression: "gzip", "lzf" or `None`
+    :param compression_opts: compression level for "gzip" (0-9)
+    :param shuffle: apply the byte shuffle filter before compression
+    :param compact_threshold: datasets smaller than this number of bytes are stored
+                              in the object header (compact layout)
+    """
+
+    chunks: Union[None, bool, Tuple[int, ...]] = None
+    compression: Optional[str] = None
+    compression_opts: Optional[int] = None
+    shuffle: bool = False
+    compact_threshold: int = 0
+
+
+def create_dataset(
+    h5group: h5py.Group,
+    name: str,
+    data: Any,
+    storage: Optional[StoragePolicy] = None,
+) -> h5py.Dataset:
+    """Create an HDF5 dataset. The storage policy only applies to non-empty numerical arrays."""
+    data = numpy.asarray(data)
+    if (
+        storage is None
+        or not data.ndim
+        or not data.size
+        or data.dtype.kind not in "biufc"
+    ):
+        return h5group.create_dataset(name, data=data)
+
+    if data.nbytes < min(storage.compact_threshold, _MAX_COMPACT_NBYTES):
+        dcpl = h5py.h5p.create(h5py.h5p.DATASET_CREATE)
+        dcpl.set_layout(h5py.h5d.COMPACT)
+        return h5group.create_dataset(name, data=data, dcpl=dcpl)
+
+    chunks = storage.chunks
+    if isinstance(chunks, tuple):
+        if len(chunks) == data.ndim:
+            chunks = tuple(min(n, m) for n, m in zip(chunks, data.shape))
+        else:
+            chunks = True
+    return h5group.create_dataset(
+        name,
+        data=data,
+        chunks=chunks,
+        compression=storage.compression,
+        compression_opts=storage.compression_opts,
+        shuffle=storage.shuffle,
+    )
 
 
 def create_hdf5_link(
@@ -39,3 +99,97 @@ def create_hdf5_link(
     if absolute:
         return h5py.ExternalLink(target_filename, target_name)
     return h5py.ExternalLink(rel_target_filename, target_name)
+
+
+class FileOwner:
+    """Owns an open HDF5 file and closes it when the owner is released, which is
+    when the last lazy dataset that refers to it is released."""
+
+    def __init__(self, h5file: h5py.File) -> None:
+        self._h5file = h5file
+
+    @property
+    def file(self) -> h5py.File:
+        return self._h5file
+
+    def close(self) -> None:
+        if self._h5file.id.valid:
+            self._h5file.close()
+
+    def __del__(self) -> None:
+        self.close()
+
+
+class LazyDataset:
+    """Array-like proxy of an HDF5 dataset. Data is only read from the file
+    when indexed or converted to a numpy array. The proxy keeps the owner of the
+    file alive."""
+
+    def __init__(
+        self, dataset: h5py.Dataset, owner: Optional[FileOwner] = None
+    ) -> None:
+        self._dataset = dataset
+        self._owner = owner
+
+    @property
+    def dataset(self) -> h5py.Dataset:
+        return self._dataset
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self._dataset.shape
+
+    @property
+    def dtype(self) -> numpy.dtype:
+        return self._dataset.dtype
+
+    @property
+    def size(self) -> int:
+        return self._dataset.size
+
+    @property
+    def ndim(self) -> int:
+        return self._dataset.ndim
+
+    def __len__(self) -> int:
+        return len(self._dataset)
+
+    def __getitem__(self, idx) -> Any:
+        return self._dataset[idx]
+
+    def __array__(self, dtype=None, copy=None) -> numpy.ndarray:
+        return numpy.asarray(self._dataset[()], dtype=dtype)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._dataset.file.filename}::{self._dataset.name})"
+
+    def __reduce__(self):
+        # h5py objects cannot be pickled (e.g. to return models from worker processes)
+        return numpy.asarray, (self._dataset[()],)
+
+
+def lazy_array(
+    dataset: h5py.Dataset, owner: Optional[FileOwner] = None
+) -> Union[numpy.memmap, LazyDataset]:
+    """Returns a read-only memory map for contiguous, uncompressed datasets
+    and a lazy proxy of the dataset otherwise. Memory maps do not need the
+    HDF5 file to stay open, lazy proxies keep its owner alive."""
+    if _is_memory_mappable(dataset):
+        return numpy.memmap(
+            dataset.file.filename,
+            mode="r",
+            dtype=dataset.dtype,
+            offset=dataset.id.get_offset(),
+            shape=dataset.shape,
+        )
+    return LazyDataset(dataset, owner=owner)
+
+
+def _is_memory_mappable(dataset: h5py.Dataset) -> bool:
+    if dataset.chunks is not None or dataset.compression is not None:
+        return False
+    if dataset.is_virtual or dataset.external:
+        return False
+    if dataset.dtype.kind not in "biufc" or not dataset.size:
+        return False
+    return dataset.id.get_offset() is not None
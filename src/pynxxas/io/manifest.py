@@ -0,0 +1,144 @@
+"""Sidecar manifest of incremental file conversions
+"""
+
+import os
+import json
+import hashlib
+import pathlib
+from typing import Dict, Generator, Iterable, List
+
+from importlib.metadata import version, PackageNotFoundError
+
+try:
+    PYNXXAS_VERSION = version("pynxxas")
+except PackageNotFoundError:
+    PYNXXAS_VERSION = "unknown"
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def manifest_filename(output_filename: pathlib.Path) -> pathlib.Path:
+    output_filename = pathlib.Path(output_filename)
+    return output_filename.with_name(output_filename.name + MANIFEST_SUFFIX)
+
+
+class ConversionManifest:
+    """Maps each converted input file to the outputs it was converted to.
+
+    An input file is unchanged when its size, modification time and the pynxxas
+    version are the same as when it was converted. With `use_hash=True` the SHA-256
+    of the content is recorded as well and an input file with the same content
+    is unchanged even when its modification time differs.
+    """
+
+    def __init__(self, filename: pathlib.Path, use_hash: bool = False) -> None:
+        self._filename = pathlib.Path(filename)
+        self._use_hash = use_hash
+        self._records: Dict[str, dict] = dict()
+        self._stats: Dict[str, os.stat_result] = dict()
+        self.last_scan_number = 0
+
+    @classmethod
+    def load(cls, filename: pathlib.Path, use_hash: bool = False):
+        manifest = cls(filename, use_hash=use_hash)
+        with open(filename, "r") as fh:
+            content = json.load(fh)
+        manifest._records = content["files"]
+        manifest.last_scan_number = content["last_scan_number"]
+        return manifest
+
+    def save(self) -> None:
+        content = {"last_scan_number": self.last_scan_number, "files": self._records}
+        tmp_filename = self._filename.with_name(self._filename.name + ".tmp")
+        with open(tmp_filename, "w") as fh:
+            json.dump(content, fh, indent=2)
+        os.replace(tmp_filename, self._filename)
+
+    @property
+    def filename(self) -> pathlib.Path:
+        return self._filename
+
+    def iter_changed(
+        self, filenames: Iterable[pathlib.Path]
+    ) -> Generator[pathlib.Path, None, None]:
+        """Yields the input files which are new or changed since their conversion"""
+        for filename in filenames:
+            if self.is_unchanged(filename):
+                self._stats.pop(str(filename), None)
+            else:
+                yield filename
+
+    def is_unchanged(self, filename: pathlib.Path) -> bool:
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            return False
+        # The state of the file before conversion is recorded
+        self._stats[str(filename)] = stat
+        record = self._records.get(str(filename))
+        if record is None or record["version"] != PYNXXAS_VERSION:
+            return False
+        if record["size"] != stat.st_size:
+            return False
+        if record["mtime_ns"] == stat.st_mtime_ns:
+            return True
+        if not self._use_hash or record.get("sha256") is None:
+            return False
+        if record["sha256"] != _sha256(filename):
+            return False
+        record["mtime_ns"] = stat.st_mtime_ns
+        return True
+
+    def prune(self) -> List[str]:
+        """Remove the records of input files which no longer exist. Their outputs
+        are kept."""
+        removed = [
+            filename for filename in self._records if not os.path.exists(filename)
+        ]
+        for filename in removed:
+            del self._records[filename]
+        return removed
+
+    def get_outputs(self, filename: pathlib.Path) -> List[str]:
+        record = self._records.get(str(filename))
+        if record is None:
+            return list()
+        return record["outputs"]
+
+    def record(
+        self, filename: pathlib.Path, outputs: List[str], complete: bool = True
+    ) -> None:
+        """Record the outputs of an input file. Incomplete conversions are
+        recorded so that their outputs can be replaced but they are never
+        considered to be unchanged."""
+        stat = self._stats.pop(str(filename), None)
+        if complete:
+            if stat is None:
+                stat = os.stat(filename)
+            size = stat.st_size
+            mtime_ns = stat.st_mtime_ns
+        else:
+            size = -1
+            mtime_ns = -1
+        if complete and self._use_hash:
+            sha256 = _sha256(filename)
+        else:
+            sha256 = None
+        self._records[str(filename)] = {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": sha256,
+            "version": PYNXXAS_VERSION,
+            "outputs": outputs,
+        }
+
+
+def _sha256(filename: pathlib.Path) -> str:
+    digest = hashlib.sha256()
+    with open(filename, "rb") as fh:
+        for block in iter(lambda: fh.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+_HASH_BLOCK_SIZE = 1024 * 1024
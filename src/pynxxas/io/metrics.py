@@ -0,0 +1,100 @@
+"""Timing and counters of file conversions
+"""
+
+import json
+from typing import Callable, Dict, List, NamedTuple
+
+STAGES = ("load", "convert", "save")
+
+
+class StageMetrics(NamedTuple):
+    """Metrics of one stage for one input file (load and convert) or all output
+    models of one scan, which are saved in one pass (save). `nmodels` is the number
+    of models loaded, converted or saved and
+    `nfailed` the number of errors. `nbytes` is the size of the input file when
+    loading and the number of bytes written when saving."""
+
+    stage: str
+    filename: str
+    seconds: float
+    nmodels: int = 0
+    nbytes: int = 0
+    nfailed: int = 0
+
+
+MetricsSink = Callable[[StageMetrics], None]
+
+
+class ConversionStats:
+    """Metrics sink which aggregates the metrics per input file and per stage"""
+
+    def __init__(self) -> None:
+        self._files: Dict[str, Dict[str, List[float]]] = dict()
+
+    def __call__(self, metrics: StageMetrics) -> None:
+        stages = self._files.setdefault(metrics.filename, dict())
+        totals = stages.setdefault(metrics.stage, [0.0, 0, 0, 0])
+        totals[0] += metrics.seconds
+        totals[1] += metrics.nmodels
+        totals[2] += metrics.nbytes
+        totals[3] += metrics.nfailed
+
+    def per_file(self) -> Dict[str, Dict[str, dict]]:
+        return {
+            filename: {
+                stage: _as_dict(totals) for stage, totals in _iter_stages(stages)
+            }
+            for filename, stages in self._files.items()
+        }
+
+    def per_stage(self) -> Dict[str, dict]:
+        result = dict()
+        for stages in self._files.values():
+            for stage, totals in _iter_stages(stages):
+                stage_totals = result.setdefault(stage, [0.0, 0, 0, 0, 0])
+                for i, value in enumerate(totals):
+                    stage_totals[i] += value
+                stage_totals[4] += 1
+        return {
+            stage: dict(_as_dict(totals[:4]), nfiles=totals[4])
+            for stage, totals in result.items()
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"stages": self.per_stage(), "files": self.per_file()}, indent=2
+        )
+
+    def format_table(self) -> str:
+        lines = [
+            f"{'stage':<8} {'files':>6} {'models':>7} {'failed':>7} "
+            f"{'seconds':>9} {'MB':>9} {'MB/s':>9}"
+        ]
+        for stage, totals in self.per_stage().items():
+            mbytes = totals["nbytes"] / 1024**2
+            if totals["seconds"] and totals["nbytes"]:
+                mbytes_per_second = f"{mbytes / totals['seconds']:9.2f}"
+            else:
+                mbytes_per_second = f"{'-':>9}"
+            lines.append(
+                f"{stage:<8} {totals['nfiles']:>6} {totals['nmodels']:>7} "
+                f"{totals['nfailed']:>7} {totals['seconds']:>9.3f} "
+                f"{mbytes:>9.2f} {mbytes_per_second}"
+            )
+        return "\n".join(lines)
+
+
+def _iter_stages(stages: Dict[str, List[float]]):
+    for stage in STAGES:
+        if stage in stages:
+            yield stage, stages[stage]
+
+
+def _as_dict(totals: List[float]) -> dict:
+    seconds, nmodels, nbytes, nfailed = totals
+    return {
+        "seconds": seconds,
+        "nmodels": nmodels,
+        "nbytes": nbytes,
+        "nfailed": nfailed,
+    }
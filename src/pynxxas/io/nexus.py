@@ -1,56 +1,877 @@
 """NeXus/HDF5 file format
 """
 
-from typing import Generator, Any, Tuple
+import os
+import hashlib
+from typing import Generator, Any, Tuple, Optional, Dict, Iterable, List, Sequence
+from typing import Union, Callable
 
 
 import h5py
+import numpy
 import pint
 import pydantic
 
 from . import url_utils
 from . import hdf5_utils
+from . import entry_index
 from ..models import nexus
+from ..models import units
+
+
+# Detection from the prefix finds user blocks up to 32 KiB
+PREFIX_SIZE = 64 * 1024
 
 
 def is_nexus_file(url: url_utils.UrlType) -> bool:
+    """The HDF5 signature is read at every user block offset in the file"""
     filename = url_utils.as_url(url).path
     with open(filename, "rb") as file:
-        try:
-            with h5py.File(file, mode="r"):
+        size = os.fstat(file.fileno()).st_size
+        for offset in _signature_offsets(size):
+            file.seek(offset)
+            if file.read(len(_HDF5_SIGNATURE)) == _HDF5_SIGNATURE:
                 return True
-        except Exception:
-            return False
+    return False
 
 
-def load_nexus_file(url: url_utils.UrlType) -> Generator[nexus.NxGroup, None, None]:
-    raise NotImplementedError(f"File format not supported: {url}")
+def is_nexus_prefix(prefix: bytes) -> bool:
+    """The HDF5 signature is at the start of the file or after a user block
+    of 512, 1024, 2048, ... bytes"""
+    for offset in _signature_offsets(len(prefix)):
+        if prefix[offset : offset + len(_HDF5_SIGNATURE)] == _HDF5_SIGNATURE:
+            return True
+    return False
 
 
-def save_nexus_file(nxgroup: nexus.NxXasModel, url: url_utils.UrlType) -> None:
-    if not isinstance(nxgroup, nexus.NxXasModel):
-        raise TypeError(f"nxgroup is not of type NxXasModel ({type(nxgroup)})")
-    if not nxgroup.has_data():
-        return
-    filename = url_utils.as_url(url).path
+_HDF5_SIGNATURE = b"\x89HDF\r\n\x1a\n"
+
+
+def _signature_offsets(size: int) -> Generator[int, None, None]:
+    offset = 0
+    while offset + len(_HDF5_SIGNATURE) <= size:
+        yield offset
+        offset = max(512, 2 * offset)
+
+
+def load_nexus_file(
+    url: url_utils.UrlType, swmr: bool = False
+) -> Generator[nexus.NxXasModel, None, None]:
+    """Yields all NXxas entries and subentries in the file or below the internal path
+    of the URL. Data arrays are not read into memory: they are memory maps of
+    contiguous datasets or lazy proxies of the HDF5 datasets otherwise.
+
+    Use `swmr=True` to read a file which is being written by a `NexusStreamWriter`
+    in SWMR mode.
+
+    When the file has an entry index which matches the file, the groups are looked
+    up by the paths of the index in the order in which they were saved. Otherwise
+    the groups are visited.
+
+    The URL can select points of the energy and intensity, for example
+    ``data.h5?path=/dataset03&emin=7100&emax=7200`` for an energy window in eV or
+    ``data.h5?path=/dataset03&points=100:300``. The energy window is found by binary
+    search on the monotonic energy dataset and only the selected points are read.
+    """
+    url = url_utils.as_url(url)
+    # The file is closed when the generator and all lazy datasets are released
+    owner = hdf5_utils.FileOwner(h5py.File(url.path, mode="r", swmr=swmr))
+    try:
+        h5group = owner.file[url.internal_path or "/"]
+        for h5group in _iter_indexed_nxxas_groups(h5group):
+            yield _read_nxxas_group(h5group, url, owner=owner)
+    except Exception:
+        # The traceback would keep the file open otherwise
+        del owner
+        raise
+
+
+def iter_nexus_headers(
+    url: url_utils.UrlType,
+) -> Generator[Dict[str, Any], None, None]:
+    """Yields the metadata of the NXxas entries and subentries which `load_nexus_file`
+    yields, without reading the data arrays: the HDF5 path, element symbol, edge,
+    mode, instrument name and short name and start time."""
     url = url_utils.as_url(url)
+    with h5py.File(url.path, mode="r") as nxroot:
+        h5group = nxroot[url.internal_path or "/"]
+        for h5group in _iter_indexed_nxxas_groups(h5group):
+            yield _read_nxxas_header(h5group)
+
+
+def find_nexus_entries(
+    url: url_utils.UrlType,
+    element: Optional[str] = None,
+    edge: Optional[str] = None,
+    mode: Optional[str] = None,
+    energy: Optional[float] = None,
+) -> List[str]:
+    """URLs of the NXxas entries and subentries which `load_nexus_file` yields and
+    which match all conditions. `energy` in eV must be within the energy range of
+    the entry. When the file has an entry index which matches the file, the conditions
+    are evaluated on the index dataset which is read at once. Otherwise the groups and
+    energy datasets are read."""
+    url = url_utils.as_url(url)
+    internal_path = url.internal_path or "/"
+    with h5py.File(url.path, mode="r") as nxroot:
+        rows = entry_index.read_matching_entry_index(nxroot)
+        if rows is None:
+            h5groups = _iter_nxxas_groups_below(nxroot[internal_path])
+            rows = numpy.array(
+                [_read_index_row(h5group) for h5group in h5groups],
+                dtype=entry_index.ENTRY_INDEX_DTYPE,
+            )
+        else:
+            rows = entry_index.rows_below(rows, internal_path)
+
+    mask = numpy.ones(len(rows), dtype=bool)
+    for field_name, value in (("element", element), ("edge", edge), ("mode", mode)):
+        if value is not None:
+            mask &= rows[field_name] == entry_index.encode(value)
+    if energy is not None:
+        mask &= (rows["energy_min"] <= energy) & (energy <= rows["energy_max"])
+    return [
+        f"{url.path}?path={entry_index.decode(path)}" for path in rows["path"][mask]
+    ]
+
+
+def save_nexus_file(
+    nxgroup: nexus.NxXasModel,
+    url: url_utils.UrlType,
+    writer: Optional["NexusWriter"] = None,
+    storage: Optional[hdf5_utils.StoragePolicy] = None,
+) -> None:
+    """Save an NXxas model. Provide an open `writer` when saving many models in
+    the same file to avoid opening and closing the file for each model.
+    The `storage` policy of array datasets is ignored when a writer is provided."""
+    if writer is not None:
+        writer.save(nxgroup, url)
+        return
+    with NexusWriter(url_utils.as_url(url).path, storage=storage) as writer:
+        writer.save(nxgroup, url)
+
+
+def save_nexus_models(
+    nxgroups: Sequence[nexus.NxXasModel],
+    urls: Sequence[url_utils.UrlType],
+    writer: Optional["NexusWriter"] = None,
+    storage: Optional[hdf5_utils.StoragePolicy] = None,
+) -> None:
+    """Save NXxas models in one pass (see `NexusWriter.save_many`). All URLs
+    must be in the same file."""
+    if writer is not None:
+        writer.save_many(nxgroups, urls)
+        return
+    if not urls:
+        return
+    with NexusWriter(url_utils.as_url(urls[0]).path, storage=storage) as writer:
+        writer.save_many(nxgroups, urls)
+
+
+class NexusWriter:
+    """Writer session which keeps a NeXus file open to save many NXxas models.
+    The file is opened on the first save.
+
+    .. code-block:: python
+
+        with NexusWriter("data.h5") as writer:
+            for i, nxxas_model in enumerate(nxxas_models, 1):
+                writer.save(nxxas_model, f"data.h5?path=/dataset{i:02}")
+    """
+
+    def __init__(
+        self, filename: str, storage: Optional[hdf5_utils.StoragePolicy] = None
+    ) -> None:
+        self._filename = os.path.abspath(filename)
+        self._storage = storage
+        self._nxroot: Optional[h5py.File] = None
+        self._nxgroups: Dict[str, h5py.Group] = dict()
+        self._entry_index: Optional[entry_index.EntryIndex] = None
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    def __enter__(self) -> "NexusWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._nxgroups.clear()
+        self._entry_index = None
+        if self._nxroot is not None:
+            self._nxroot.close()
+            self._nxroot = None
+
+    def save(self, nxgroup: nexus.NxXasModel, url: url_utils.UrlType) -> None:
+        self.save_many([nxgroup], [url])
 
-    with h5py.File(filename, mode="a", track_order=True) as nxroot:
-        nxparent = _prepare_nxparent(nxgroup, url, nxroot)
-        _save_nxgroup(nxgroup, nxparent)
+    def save_many(
+        self,
+        nxgroups: Sequence[nexus.NxXasModel],
+        urls: Sequence[url_utils.UrlType],
+    ) -> None:
+        """Save NXxas models in one pass, for example all modes of a scan. Parent
+        groups are created once and the "default" attributes are written once
+        after all models are saved.
 
+        Identical axis arrays (e.g. the energy shared by all modes) are saved once
+        per NXentry. The other models of the NXentry refer to it by a soft link.
+        """
+        if len(nxgroups) != len(urls):
+            raise ValueError("The number of models and URLs must be the same")
+        for nxgroup in nxgroups:
+            if not isinstance(nxgroup, nexus.NxXasModel):
+                raise TypeError(f"nxgroup is not of type NxXasModel ({type(nxgroup)})")
+        nxroot = self._get_nxroot()
+        defaults = dict()
+        shared = dict()
+        index_rows = list()
+        for nxgroup, url in zip(nxgroups, urls):
+            url = url_utils.as_url(url)
+            if os.path.abspath(url.path) != self._filename:
+                raise ValueError(f"URL '{url.path}' is not in '{self._filename}'")
+            if not nxgroup.has_data():
+                continue
+            nxparent = _prepare_nxparent(nxgroup, url, nxroot, self._nxgroups)
+            _save_nxgroup(nxgroup, nxparent, self._storage, defaults, shared)
+            index_rows.append(_index_row(nxgroup, nxparent.name))
+        for path, name in defaults.items():
+            nxroot[path].attrs["default"] = name
+        self._get_entry_index().update(index_rows)
 
-def _save_nxgroup(nxgroup: nexus.NxGroup, nxparent: h5py.Group) -> None:
+    def save_blocks(
+        self,
+        blocks: Iterable[Sequence[nexus.NxXasModel]],
+        urls: Sequence[url_utils.UrlType],
+        batch_size: int = 16 * 1024,
+    ) -> None:
+        """Save NXxas models of which the energy and intensity come in blocks of points,
+        for example all modes of a scan parsed in blocks of rows. Each block has one
+        model per URL. All fields but the energy and intensity are saved from the
+        first block. Models without energy or intensity are not saved. The points
+        of each block are written to resizable datasets which grow by chunks of
+        `batch_size` points, so only one block is in memory.
+
+        Models of the same NXentry which share the energy array of the first block
+        link to one energy dataset.
+        """
+        blocks = iter(blocks)
+        nxgroups = next(blocks, None)
+        if nxgroups is None:
+            return
+        if len(nxgroups) != len(urls):
+            raise ValueError("The number of models and URLs must be the same")
+        for nxgroup in nxgroups:
+            if not isinstance(nxgroup, nexus.NxXasModel):
+                raise TypeError(f"nxgroup is not of type NxXasModel ({type(nxgroup)})")
+        storage = self._storage
+        if storage is None:
+            storage = hdf5_utils.StoragePolicy()
+        nxroot = self._get_nxroot()
+
+        # Everything but the data
+        defaults = dict()
+        nxparents = list()
+        for nxgroup, url in zip(nxgroups, urls):
+            url = url_utils.as_url(url)
+            if os.path.abspath(url.path) != self._filename:
+                raise ValueError(f"URL '{url.path}' is not in '{self._filename}'")
+            if nxgroup.energy is None or nxgroup.intensity is None:
+                nxparents.append(None)
+                continue
+            nxparent = _prepare_nxparent(nxgroup, url, nxroot, self._nxgroups)
+            _save_nxgroup(_without_data(nxgroup), nxparent, storage, defaults)
+            nxparents.append(nxparent)
+        for path, name in defaults.items():
+            nxroot[path].attrs["default"] = name
+
+        # Resizable datasets. The energy is saved once for models of the same
+        # NXentry with the same energy array.
+        owners = [_energy_owner(nxgroups, nxparents, i) for i in range(len(nxgroups))]
+        energies = list()
+        intensities = list()
+        for i, (nxgroup, nxparent) in enumerate(zip(nxgroups, nxparents)):
+            if nxparent is None:
+                energies.append(None)
+                intensities.append(None)
+                continue
+            if owners[i] == i:
+                energy = _create_resizable_dataset(
+                    nxparent, "energy", nxgroup.energy.units, batch_size, storage
+                )
+            else:
+                nxparent["energy"] = h5py.SoftLink(energies[owners[i]].name)
+                energy = None
+            energies.append(energy)
+            intensities.append(
+                _create_resizable_dataset(
+                    nxparent, "intensity", nxgroup.intensity.units, batch_size, storage
+                )
+            )
+        energy_units = [getattr(nxgroup.energy, "units", None) for nxgroup in nxgroups]
+        intensity_units = [
+            getattr(nxgroup.intensity, "units", None) for nxgroup in nxgroups
+        ]
+        energy_ranges = [(numpy.nan, numpy.nan)] * len(nxgroups)
+        first_nxgroups = nxgroups
+
+        while nxgroups is not None:
+            if len(nxgroups) != len(urls):
+                raise ValueError("The number of models and URLs must be the same")
+            for i, nxgroup in enumerate(nxgroups):
+                if intensities[i] is None:
+                    continue
+                energy_ranges[i] = entry_index.combine_energy_ranges(
+                    energy_ranges[i], entry_index.energy_range(nxgroup.energy)
+                )
+                if energies[i] is not None:
+                    _append_to_dataset(energies[i], nxgroup.energy, energy_units[i])
+                elif (
+                    nxgroup.energy.magnitude is not nxgroups[owners[i]].energy.magnitude
+                ):
+                    raise ValueError(
+                        f"The energy of '{urls[i]}' must be shared in all blocks"
+                    )
+                _append_to_dataset(
+                    intensities[i], nxgroup.intensity, intensity_units[i]
+                )
+            nxgroups = next(blocks, None)
+
+        self._get_entry_index().update(
+            [
+                _index_row(nxgroup, nxparent.name, len(intensity), energy_range)
+                for nxgroup, nxparent, intensity, energy_range in zip(
+                    first_nxgroups, nxparents, intensities, energy_ranges
+                )
+                if nxparent is not None
+            ]
+        )
+
+    def exists(self, url: url_utils.UrlType) -> bool:
+        """Whether the HDF5 group or dataset of a URL exists"""
+        url = url_utils.as_url(url)
+        if os.path.abspath(url.path) != self._filename:
+            raise ValueError(f"URL '{url.path}' is not in '{self._filename}'")
+        path = "/" + url.internal_path.strip("/")
+        return path in self._get_nxroot()
+
+    def remove(self, url: url_utils.UrlType) -> None:
+        """Remove the HDF5 group or dataset of a URL when it exists"""
+        url = url_utils.as_url(url)
+        if os.path.abspath(url.path) != self._filename:
+            raise ValueError(f"URL '{url.path}' is not in '{self._filename}'")
+        path = "/" + url.internal_path.strip("/")
+        if path == "/":
+            raise ValueError("Cannot remove the root of a NeXus file")
+        nxroot = self._get_nxroot()
+        if path in nxroot:
+            del nxroot[path]
+        self._get_entry_index().remove(path)
+        for cached_path in list(self._nxgroups):
+            if cached_path == path or cached_path.startswith(path + "/"):
+                del self._nxgroups[cached_path]
+
+    def _get_nxroot(self) -> h5py.File:
+        if self._nxroot is None:
+            self._nxroot = h5py.File(self._filename, mode="a", track_order=True)
+            self._nxroot.attrs.setdefault("NX_class", "NXroot")
+        return self._nxroot
+
+    def _get_entry_index(self) -> entry_index.EntryIndex:
+        if self._entry_index is None:
+            self._entry_index = entry_index.EntryIndex(self._get_nxroot())
+        return self._entry_index
+
+
+class NexusStreamWriter:
+    """Writer session which appends points to the energy and intensity of an NXxas
+    entry while a scan is running. All other fields of the model are saved when the
+    session starts.
+
+    Points are buffered and the resizable HDF5 datasets grow by `batch_size` points
+    at a time. In SWMR mode readers can open the file with
+    `load_nexus_file(url, swmr=True)` and see the points of every flushed batch.
+    SWMR mode requires a file which is new or was created with `libver="latest"`.
+    Files saved by `NexusWriter` use the default format and cannot be appended to
+    in SWMR mode.
+
+    .. code-block:: python
+
+        with NexusStreamWriter(nxxas_model, "data.h5?path=/dataset01", swmr=True) as writer:
+            for energy, intensity in scan:
+                writer.append(energy, intensity)
+    """
+
+    def __init__(
+        self,
+        nxgroup: nexus.NxXasModel,
+        url: url_utils.UrlType,
+        batch_size: int = 256,
+        swmr: bool = False,
+        storage: Optional[hdf5_utils.StoragePolicy] = None,
+    ) -> None:
+        if not isinstance(nxgroup, nexus.NxXasModel):
+            raise TypeError(f"nxgroup is not of type NxXasModel ({type(nxgroup)})")
+        url = url_utils.as_url(url)
+        if storage is None:
+            storage = hdf5_utils.StoragePolicy()
+
+        self._batch_size = max(batch_size, 1)
+        self._energy_units = nxgroup.energy.units
+        self._intensity_units = nxgroup.intensity.units
+        self._energy_buffer = numpy.empty(self._batch_size, dtype=float)
+        self._intensity_buffer = numpy.empty(self._batch_size, dtype=float)
+        self._nbuffered = 0
+        self._energy_range = (numpy.nan, numpy.nan)
+        self._filename = url.path
+        self._swmr = swmr
+
+        kwargs = {"libver": "latest"} if swmr else {}
+        self._nxroot = h5py.File(url.path, mode="a", track_order=True, **kwargs)
+        new_path = _first_new_path(self._nxroot, url.internal_path)
+        try:
+            self._nxroot.attrs.setdefault("NX_class", "NXroot")
+            nxparent = _prepare_nxparent(nxgroup, url, self._nxroot)
+
+            # Everything but the data
+            empty_nxgroup = _without_data(nxgroup)
+            _save_nxgroup(empty_nxgroup, nxparent, storage)
+            self._index_fields = empty_nxgroup, nxparent.name
+
+            self._energy = _create_resizable_dataset(
+                nxparent, "energy", self._energy_units, self._batch_size, storage
+            )
+            self._intensity = _create_resizable_dataset(
+                nxparent, "intensity", self._intensity_units, self._batch_size, storage
+            )
+
+            # No objects can be created in SWMR mode. The row is updated on closing.
+            row = _index_row(empty_nxgroup, nxparent.name, 0, self._energy_range)
+            entry_index.EntryIndex(self._nxroot).update([row])
+            if swmr:
+                self._nxroot.swmr_mode = True
+        except BaseException:
+            try:
+                if new_path is not None and new_path in self._nxroot:
+                    del self._nxroot[new_path]
+                    entry_index.EntryIndex(self._nxroot).remove(new_path)
+            finally:
+                self._nxroot.close()
+            raise
+
+        if nxgroup.has_data():
+            self.append(nxgroup.energy, nxgroup.intensity)
+
+    @property
+    def npoints(self) -> int:
+        return len(self._energy) + self._nbuffered
+
+    def __enter__(self) -> "NexusStreamWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def append(self, energy: Any, intensity: Any) -> None:
+        """Append one or more points. Quantities are converted to the units of the model."""
+        energy = _as_magnitude(energy, self._energy_units)
+        intensity = _as_magnitude(intensity, self._intensity_units)
+        if energy.shape != intensity.shape:
+            raise ValueError(
+                f"energy and intensity have different shapes ({energy.shape} != {intensity.shape})"
+            )
+        start = 0
+        while start < energy.size:
+            n = min(self._batch_size - self._nbuffered, energy.size - start)
+            buffer_slice = slice(self._nbuffered, self._nbuffered + n)
+            self._energy_buffer[buffer_slice] = energy[start : start + n]
+            self._intensity_buffer[buffer_slice] = intensity[start : start + n]
+            self._nbuffered += n
+            start += n
+            if self._nbuffered == self._batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered points to the file"""
+        if self._nbuffered:
+            energy = units.from_magnitude(
+                self._energy_buffer[: self._nbuffered], self._energy_units
+            )
+            self._energy_range = entry_index.combine_energy_ranges(
+                self._energy_range, entry_index.energy_range(energy)
+            )
+            for dataset, buffer in (
+                (self._energy, self._energy_buffer),
+                (self._intensity, self._intensity_buffer),
+            ):
+                n = len(dataset)
+                dataset.resize((n + self._nbuffered,))
+                dataset[n:] = buffer[: self._nbuffered]
+            self._nbuffered = 0
+        self._energy.flush()
+        self._intensity.flush()
+
+    def close(self) -> None:
+        if not self._nxroot.id.valid:
+            return
+        try:
+            self.flush()
+            nxgroup, path = self._index_fields
+            row = _index_row(nxgroup, path, len(self._energy), self._energy_range)
+            if not self._swmr:
+                entry_index.EntryIndex(self._nxroot).update([row])
+        finally:
+            self._nxroot.close()
+        if self._swmr:
+            # No objects can be created in SWMR mode
+            with h5py.File(self._filename, mode="a") as nxroot:
+                entry_index.EntryIndex(nxroot).update([row])
+
+
+def _first_new_path(nxroot: h5py.File, internal_path: str) -> Optional[str]:
+    """The HDF5 path of the first group of the internal path which does not exist"""
+    parts = [s for s in internal_path.split("/") if s]
+    for i in range(len(parts)):
+        path = "/" + "/".join(parts[: i + 1])
+        if path not in nxroot:
+            return path
+    return None
+
+
+def _index_row(
+    nxgroup: nexus.NxXasModel,
+    path: str,
+    npoints: Optional[int] = None,
+    energy_range: Optional[Tuple[float, float]] = None,
+) -> tuple:
+    if npoints is None:
+        npoints = nxgroup.energy.size
+    if energy_range is None:
+        energy_range = entry_index.energy_range(nxgroup.energy)
+    return entry_index.index_row(
+        path,
+        nxgroup.element.symbol,
+        nxgroup.edge.name,
+        nxgroup.mode.name,
+        npoints,
+        energy_range,
+    )
+
+
+def _without_data(nxgroup: nexus.NxXasModel) -> nexus.NxXasModel:
+    """Copy of an NXxas model with empty energy and intensity (same units)"""
+    empty_energy = units.from_magnitude([], nxgroup.energy.units)
+    empty_intensity = units.from_magnitude([], nxgroup.intensity.units)
+    return nxgroup.model_copy(
+        update={"energy": empty_energy, "intensity": empty_intensity}
+    )
+
+
+def _energy_owner(
+    nxgroups: Sequence[nexus.NxXasModel], nxparents: Sequence[h5py.Group], index: int
+) -> int:
+    """Index of the first model in the same NXentry with the same energy array"""
+    nxgroup = nxgroups[index]
+    if nxparents[index] is None:
+        return index
+    entry_name = nxparents[index].name.split("/")[1]
+    for i in range(index):
+        if nxparents[i] is None:
+            continue
+        if (
+            nxgroups[i].energy.magnitude is nxgroup.energy.magnitude
+            and nxgroups[i].energy.units == nxgroup.energy.units
+            and nxparents[i].name.split("/")[1] == entry_name
+        ):
+            return i
+    return index
+
+
+def _as_magnitude(value: Any, value_units: pint.Unit) -> numpy.ndarray:
+    if isinstance(value, pint.Quantity):
+        value = value.m_as(value_units)
+    return numpy.atleast_1d(numpy.asarray(value, dtype=float)).ravel()
+
+
+def _create_resizable_dataset(
+    nxparent: h5py.Group,
+    name: str,
+    dataset_units: pint.Unit,
+    batch_size: int,
+    storage: hdf5_utils.StoragePolicy,
+) -> h5py.Dataset:
+    if isinstance(storage.chunks, tuple) and len(storage.chunks) == 1:
+        chunks = storage.chunks
+    else:
+        chunks = (batch_size,)
+    dataset = nxparent.create_dataset(
+        name,
+        shape=(0,),
+        maxshape=(None,),
+        dtype=float,
+        chunks=chunks,
+        compression=storage.compression,
+        compression_opts=storage.compression_opts,
+        shuffle=storage.shuffle,
+    )
+    dataset_units = str(dataset_units)
+    if dataset_units:
+        dataset.attrs["units"] = dataset_units
+    return dataset
+
+
+def _append_to_dataset(
+    dataset: h5py.Dataset, value: Any, dataset_units: pint.Unit
+) -> None:
+    """Append points to a resizable dataset. Quantities are converted to `dataset_units`."""
+    value = _as_magnitude(value, dataset_units)
+    if not value.size:
+        return
+    n = len(dataset)
+    dataset.resize((n + value.size,))
+    dataset[n:] = value
+
+
+# common alternate names of XAS modes
+_XAS_MODE_ALIASES = {"fluorescence": "fy"}
+
+
+def _iter_nxxas_groups(h5group: h5py.Group) -> Generator[h5py.Group, None, None]:
+    for h5item in h5group.values():
+        if not isinstance(h5item, h5py.Group):
+            continue
+        if _is_nxxas_group(h5item):
+            yield h5item
+        elif _read_attribute(h5item, "NX_class") in ("NXentry", "NXsubentry"):
+            yield from _iter_nxxas_groups(h5item)
+
+
+def _iter_nxxas_groups_below(h5group: h5py.Group) -> Iterable[h5py.Group]:
+    if _is_nxxas_group(h5group):
+        return [h5group]
+    return _iter_nxxas_groups(h5group)
+
+
+def _iter_indexed_nxxas_groups(
+    h5group: h5py.Group,
+) -> Generator[h5py.Group, None, None]:
+    """Like `_iter_nxxas_groups_below` but the groups are looked up by the paths of
+    the entry index of the file when it matches the file"""
+    rows = None
+    if not _is_nxxas_group(h5group):
+        rows = entry_index.read_matching_entry_index(h5group.file)
+    if rows is None:
+        yield from _iter_nxxas_groups_below(h5group)
+        return
+    for path in entry_index.rows_below(rows, h5group.name)["path"]:
+        indexed_group = h5group.file.get(entry_index.decode(path))
+        if _is_nxxas_group(indexed_group):
+            yield indexed_group
+
+
+def _is_nxxas_group(h5group: h5py.Group) -> bool:
+    if not isinstance(h5group, h5py.Group):
+        return False
+    if _read_attribute(h5group, "NX_class") not in ("NXentry", "NXsubentry"):
+        return False
+    return _read_field(h5group, "definition") == "NXxas"
+
+
+def _read_nxxas_group(
+    h5group: h5py.Group,
+    url: Optional[url_utils.ParsedUrlType] = None,
+    owner: Optional[hdf5_utils.FileOwner] = None,
+) -> nexus.NxXasModel:
+    data = {"@NX_class": _read_attribute(h5group, "NX_class")}
+
+    mode = h5group.get("mode")
+    if isinstance(mode, h5py.Dataset):
+        data["mode"] = {"name": _read_dataset(mode)}
+    else:
+        data["mode"] = _read_fields(mode, "name", "emission_lines")
+    if "name" in data["mode"]:
+        name = data["mode"]["name"]
+        data["mode"]["name"] = _XAS_MODE_ALIASES.get(name, name)
+    data["element"] = _read_fields(h5group.get("element"), "symbol", "atomic_number")
+    data["edge"] = _read_fields(h5group.get("edge"), "name")
+    data.update(_read_fields(h5group, "calculated"))
+
+    instrument = h5group.get("instrument")
+    if isinstance(instrument, h5py.Group):
+        data["instrument"] = {}
+        name = instrument.get("name")
+        if isinstance(name, h5py.Dataset):
+            data["instrument"]["name"] = {
+                "value": _read_dataset(name),
+                "@short_name": _read_attribute(name, "short_name"),
+            }
+
+    points = None
+    if url is not None and url.has_selection():
+        points = _select_points(h5group.get("energy"), url)
+
+    for field_name in ("energy", "intensity"):
+        dataset = h5group.get(field_name)
+        if isinstance(dataset, h5py.Dataset):
+            array = hdf5_utils.lazy_array(dataset, owner=owner)
+            if points is not None and dataset.ndim:
+                # Views of memory maps, only the hyperslab is read otherwise
+                array = array[points]
+            array_units = _read_attribute(dataset, "units") or ""
+            data[field_name] = units.as_quantity((array, array_units))
+
+    return nexus.NxXasModel(**data)
+
+
+def _select_points(
+    energy: Optional[h5py.Dataset], url: url_utils.ParsedUrlType
+) -> Optional[slice]:
+    """Slice of the points in the energy window of the URL and within this window,
+    the slice of points of the URL"""
+    if not isinstance(energy, h5py.Dataset) or not energy.ndim:
+        return url.points
+    npoints = len(energy)
+    start, stop = 0, npoints
+    if url.emin is not None or url.emax is not None:
+        emin = -numpy.inf if url.emin is None else url.emin
+        emax = numpy.inf if url.emax is None else url.emax
+        energy_units = _read_attribute(energy, "units") or "eV"
+        emin, emax = units.from_magnitude([emin, emax], "eV").m_as(energy_units)
+        if npoints > 1 and energy[0] > energy[-1]:
+            start = _bisect(energy, lambda value: value <= emax)
+            stop = _bisect(energy, lambda value: value < emin)
+        else:
+            start = _bisect(energy, lambda value: value >= emin)
+            stop = _bisect(energy, lambda value: value > emax)
+    indices = range(start, max(start, stop))
+    if url.points is not None:
+        indices = indices[url.points]
+    return slice(indices.start, indices.stop, indices.step)
+
+
+def _bisect(dataset: h5py.Dataset, predicate: Callable[[Any], bool]) -> int:
+    """Index of the first point for which the predicate is true, assuming it is
+    true for all following points. Only one point is read per iteration."""
+    lo, hi = 0, len(dataset)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if predicate(dataset[mid]):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def _read_nxxas_header(h5group: h5py.Group) -> Dict[str, Any]:
+    header = {"path": h5group.name}
+    mode = h5group.get("mode")
+    if isinstance(mode, h5py.Dataset):
+        name = _read_dataset(mode)
+    else:
+        name = _read_fields(mode, "name").get("name")
+    header["mode"] = _XAS_MODE_ALIASES.get(name, name)
+    header["element"] = _read_fields(h5group.get("element"), "symbol").get("symbol")
+    header["edge"] = _read_fields(h5group.get("edge"), "name").get("name")
+
+    header["instrument"] = None
+    header["short_name"] = None
+    instrument = h5group.get("instrument")
+    if isinstance(instrument, h5py.Group):
+        name = instrument.get("name")
+        if isinstance(name, h5py.Dataset):
+            header["instrument"] = _read_dataset(name)
+            header["short_name"] = _read_attribute(name, "short_name")
+
+    # The start time of subentries is in the parent entry
+    header["start_time"] = _read_field(h5group, "start_time")
+    if header["start_time"] is None and h5group.name != "/":
+        header["start_time"] = _read_field(h5group.parent, "start_time")
+    return header
+
+
+def _read_index_row(h5group: h5py.Group) -> tuple:
+    header = _read_nxxas_header(h5group)
+    npoints = 0
+    energy_range = numpy.nan, numpy.nan
+    dataset = h5group.get("energy")
+    if isinstance(dataset, h5py.Dataset):
+        npoints = dataset.size
+        energy = units.as_quantity(
+            (dataset[()], _read_attribute(dataset, "units") or "")
+        )
+        energy_range = entry_index.energy_range(energy)
+    return entry_index.index_row(
+        header["path"],
+        header["element"],
+        header["edge"],
+        header["mode"],
+        npoints,
+        energy_range,
+    )
+
+
+def _read_fields(h5group: Optional[h5py.Group], *field_names: str) -> Dict[str, Any]:
+    if not isinstance(h5group, h5py.Group):
+        return {}
+    fields = {}
+    for field_name in field_names:
+        dataset = h5group.get(field_name)
+        if isinstance(dataset, h5py.Dataset):
+            fields[field_name] = _read_dataset(dataset)
+    return fields
+
+
+def _read_field(h5group: h5py.Group, field_name: str) -> Any:
+    dataset = h5group.get(field_name)
+    if isinstance(dataset, h5py.Dataset):
+        return _read_dataset(dataset)
+
+
+def _read_dataset(dataset: h5py.Dataset) -> Any:
+    return _decode_value(dataset[()])
+
+
+def _read_attribute(h5item: Union[h5py.Group, h5py.Dataset], attr_name: str) -> Any:
+    return _decode_value(h5item.attrs.get(attr_name))
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, numpy.generic):
+        return value.item()
+    return value
+
+
+def _save_nxgroup(
+    nxgroup: nexus.NxGroup,
+    nxparent: h5py.Group,
+    storage: Optional[hdf5_utils.StoragePolicy] = None,
+    defaults: Optional[Dict[str, str]] = None,
+    shared: Optional[Dict[tuple, str]] = None,
+) -> None:
+    """The "default" attributes of the parents of NXdata groups are collected
+    in `defaults` when provided instead of being written.
+
+    Axis datasets are linked to identical datasets registered in `shared`
+    when provided (see `_find_shared_dataset`)."""
     if not isinstance(nxgroup, nexus.NxGroup):
         raise TypeError(f"nxgroup is not of type NxGroup ({type(nxgroup)})")
+    axes = _axes_names(nxgroup) if shared is not None else ()
     for field_name, field, field_value in _iter_model_fields(nxgroup):
         if field_value is None:
             continue
         elif isinstance(field_value, nexus.NxGroup):
             nxchild = nxparent.require_group(field_name)
-            _save_nxgroup(field_value, nxchild)
+            _save_nxgroup(field_value, nxchild, storage, defaults, shared)
             if isinstance(field_value, nexus.NxDataModel):
-                _set_default(nxchild)
+                if defaults is None:
+                    _set_default(nxchild)
+                else:
+                    _collect_defaults(nxchild.name, defaults)
         elif field.alias and field.alias.startswith("@"):
             try:
                 _save_attribute(nxparent, field_name, field_value)
@@ -60,7 +881,13 @@ def _save_nxgroup(nxgroup: nexus.NxGroup, nxparent: h5py.Group) -> None:
                 ) from e
         else:
             try:
-                _save_dataset(nxparent, field_name, field_value)
+                _save_dataset(
+                    nxparent,
+                    field_name,
+                    field_value,
+                    storage,
+                    shared if field_name in axes else None,
+                )
             except Exception as e:
                 raise ValueError(
                     f"{field_name} = {field_value} ({type(field_value)}) cannot be saved as an HDF5 dataset"
@@ -70,23 +897,41 @@ def _save_nxgroup(nxgroup: nexus.NxGroup, nxparent: h5py.Group) -> None:
 def _iter_model_fields(
     model: pydantic.BaseModel,
 ) -> Generator[Tuple[str, pydantic.Field, Any], None, None]:
-    for field_name, field in model.__fields__.items():
+    for field_name, field in type(model).model_fields.items():
         field_value = getattr(model, field_name)
         yield field_name, field, field_value
 
 
-def _save_dataset(nxparent: h5py.Group, field_name: str, field_value: Any) -> None:
+def _save_dataset(
+    nxparent: h5py.Group,
+    field_name: str,
+    field_value: Any,
+    storage: Optional[hdf5_utils.StoragePolicy] = None,
+    shared: Optional[Dict[tuple, str]] = None,
+) -> None:
     if isinstance(field_value, nexus.NxField):
         nxparent[field_name] = field_value.value
         for attr_name, attr, attr_value in _iter_model_fields(field_value):
+            if attr_value is None:
+                continue
             if attr.alias and attr.alias.startswith("@"):
                 nxparent[field_name].attrs[attr_name] = attr_value
     elif isinstance(field_value, pint.Quantity):
-        if field_value.size:
-            nxparent[field_name] = field_value.magnitude
-            units = str(field_value.units)
-            if units:
-                nxparent[field_name].attrs["units"] = units
+        if not field_value.size:
+            return
+        if shared is not None:
+            target_name, keys = _find_shared_dataset(nxparent, field_value, shared)
+            if target_name:
+                nxlink = nexus.NxLinkModel(target_name=target_name)
+                _save_dataset(nxparent, field_name, nxlink)
+                return
+        hdf5_utils.create_dataset(nxparent, field_name, field_value.magnitude, storage)
+        units = str(field_value.units)
+        if units:
+            nxparent[field_name].attrs["units"] = units
+        if shared is not None:
+            for key in keys:
+                shared[key] = nxparent[field_name].name
     elif isinstance(field_value, nexus.NxLinkModel):
         link = hdf5_utils.create_hdf5_link(
             nxparent, field_value.target_name, field_value.target_filename
@@ -96,6 +941,37 @@ def _save_dataset(nxparent: h5py.Group, field_name: str, field_value: Any) -> No
         nxparent[field_name] = field_value
 
 
+def _axes_names(nxgroup: nexus.NxGroup) -> Tuple[str, ...]:
+    plot = getattr(nxgroup, "plot", None)
+    if isinstance(plot, nexus.NxDataModel):
+        return tuple(plot.axes)
+    return ()
+
+
+def _find_shared_dataset(
+    nxparent: h5py.Group, field_value: pint.Quantity, shared: Dict[tuple, str]
+) -> Tuple[Optional[str], List[tuple]]:
+    """Returns the HDF5 path of a dataset with the same data and units, saved in
+    the same NXentry, and the keys under which to register the dataset otherwise.
+    Arrays are compared by identity first and by a hash of their content next."""
+    entry_name = nxparent.name.split("/")[1]
+    units = str(field_value.units)
+    identity_key = (entry_name, units, id(field_value.magnitude))
+    target_name = shared.get(identity_key)
+    if target_name:
+        return target_name, []
+    data = numpy.ascontiguousarray(field_value.magnitude)
+    if data.dtype.kind not in "biufc":
+        return None, []
+    digest = hashlib.blake2b(data).hexdigest()
+    content_key = (entry_name, units, data.dtype.str, data.shape, digest)
+    target_name = shared.get(content_key)
+    if target_name:
+        shared[identity_key] = target_name
+        return target_name, []
+    return None, [identity_key, content_key]
+
+
 def _save_attribute(nxparent: h5py.Group, field_name: str, field_value: Any) -> None:
     nxparent.attrs[field_name] = field_value
 
@@ -106,12 +982,20 @@ def _set_default(h5group: h5py.Group) -> None:
         h5group = h5group.parent
 
 
+def _collect_defaults(path: str, defaults: Dict[str, str]) -> None:
+    parts = path.strip("/").split("/")
+    for i, name in enumerate(parts):
+        defaults["/" + "/".join(parts[:i])] = name
+
+
 def _prepare_nxparent(
     nxgroup: nexus.NxGroup,
     url: url_utils.ParsedUrlType,
     nxroot: h5py.File,
+    nxgroups: Optional[Dict[str, h5py.Group]] = None,
 ) -> h5py.Group:
-    """Creates and returns the parent group of `nxgroup`"""
+    """Creates and returns the parent group of `nxgroup`. Groups are cached
+    by their HDF5 path in `nxgroups` when provided."""
     internal_path = url_utils.as_url(url).internal_path
     parts = [s for s in internal_path.split("/") if s]
     nparts = len(parts)
@@ -137,11 +1021,20 @@ def _prepare_nxparent(
     else:
         nxclasses = ["NXentry"] + ["NXsubentry"] * (len(parts) - 1)
 
-    nxroot.attrs.setdefault("NX_class", "NXroot")
-
     nxparent = nxroot
+    path = ""
     for part, nxclass in zip(parts, nxclasses):
-        nxparent = nxparent.require_group(part)
+        path = f"{path}/{part}"
+        if nxgroups is not None and path in nxgroups:
+            nxparent = nxgroups[path]
+            continue
+        if part in nxparent:
+            nxparent = nxparent.require_group(part)
+        else:
+            # Subentries are iterated in the order in which they are saved
+            nxparent = nxparent.create_group(part, track_order=True)
         nxparent.attrs.setdefault("NX_class", nxclass)
+        if nxgroups is not None:
+            nxgroups[path] = nxparent
 
     return nxparent
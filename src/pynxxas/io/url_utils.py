@@ -3,12 +3,25 @@ import sys
 import pathlib
 import urllib.parse
 import urllib.request
-from typing import Union, NamedTuple
+from typing import Union, NamedTuple, Optional
 
 
 class ParsedUrlType(NamedTuple):
+    """File URL with the query parameters
+
+    * ``path``: internal HDF5 path
+    * ``points``: slice of points like ``100:300`` or ``::10``
+    * ``emin``, ``emax``: energy window in eV
+    """
+
     path: str
     internal_path: str
+    points: Optional[slice] = None
+    emin: Optional[float] = None
+    emax: Optional[float] = None
+
+    def has_selection(self) -> bool:
+        return self.points is not None or self.emin is not None or self.emax is not None
 
 
 UrlType = Union[str, pathlib.Path, urllib.parse.ParseResult, ParsedUrlType]
@@ -41,4 +54,49 @@ def as_url(url: UrlType) -> ParsedUrlType:
     query = urllib.parse.parse_qs(parsed.query)
     internal_path = query.get("path", [""])[0]
 
-    return ParsedUrlType(path=path, internal_path=internal_path)
+    return ParsedUrlType(
+        path=path,
+        internal_path=internal_path,
+        points=_parse_slice(query, "points"),
+        emin=_parse_float(query, "emin"),
+        emax=_parse_float(query, "emax"),
+    )
+
+
+def _parse_slice(query: dict, name: str) -> Optional[slice]:
+    if name not in query:
+        return None
+    value = query[name][0]
+    parts = value.split(":")
+    if len(parts) > 3:
+        raise ValueError(f"URL query parameter '{name}' is not a slice ({value})")
+    try:
+        indices = [int(part) if part.strip() else None for part in parts]
+    except ValueError:
+        raise ValueError(
+            f"URL query parameter '{name}' is not a slice ({value})"
+        ) from None
+    if len(indices) == 1:
+        if indices[0] is None:
+            raise ValueError(f"URL query parameter '{name}' is not a slice ({value})")
+        # Single point
+        start = indices[0]
+        return slice(start, start + 1 if start != -1 else None)
+    points = slice(*indices)
+    if points.step is not None and points.step <= 0:
+        raise ValueError(
+            f"URL query parameter '{name}' must have a positive step ({value})"
+        )
+    return points
+
+
+def _parse_float(query: dict, name: str) -> Optional[float]:
+    if name not in query:
+        return None
+    value = query[name][0]
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(
+            f"URL query parameter '{name}' is not a number ({value})"
+        ) from None
@@ -1,8 +1,7 @@
 import io
+import codecs
 from math import log10
 
-from charset_normalizer import from_bytes
-
 
 MAX_FILESIZE = 100 * 1024 * 1024  # 100 Mb limit
 COMMENTCHARS = "#;%*!$"
@@ -55,6 +54,8 @@ def read_textfile(filename, size=None):
     text = ""
 
     def decode(bytedata):
+        from charset_normalizer import from_bytes  # slow import
+
         return str(from_bytes(bytedata).best())
 
     if isinstance(filename, io.IOBase):
@@ -67,6 +68,31 @@ def read_textfile(filename, size=None):
     return text.replace("\r\n", "\n").replace("\r", "\n")
 
 
+def detect_encoding(sample: bytes) -> str:
+    """detect the encoding of a sample of bytes
+
+    ASCII and UTF-8 are validated directly (ASCII is reported as UTF-8
+    since the rest of the file may not be ASCII). Only when the sample is
+    not valid UTF-8 charset_normalizer is used. A multi-byte character which is
+    cut at the end of the sample is not considered to be invalid.
+    """
+    if sample.isascii():
+        return "utf-8"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+    except UnicodeDecodeError:
+        pass
+    else:
+        return "utf-8"
+
+    from charset_normalizer import from_bytes  # slow import
+
+    match = from_bytes(sample).best()
+    if match is None:
+        return "latin-1"
+    return match.encoding
+
+
 def gformat(val, length=11):
     """Format a number with '%g'-like format.
 
@@ -430,6 +430,7 @@ class CLSHXMA_BeamlineData(GenericBeamlineData):
 
     name = "CLS HXMA"
     energy_column = 1
+    detector_labels = {"detector1": "i0", "detector2": "itrans", "detector3": "irefer"}
 
     def __init__(self, headerlines=None):
         GenericBeamlineData.__init__(self, headerlines=headerlines)
@@ -454,6 +455,7 @@ class CLSHXMA_BeamlineData(GenericBeamlineData):
                 labels = line.split()
 
         labels = [fix_varname(word.strip().lower()) for word in labels]
+        labels = [self.detector_labels.get(label, label) for label in labels]
         for i, label in enumerate(labels):
             if "energy" in label:
                 self.energy_column = i + 1
@@ -468,6 +470,7 @@ class KEKPF_BeamlineData(GenericBeamlineData):
     name = "KEK PF"
     energy_column = 2
     energy_units = "deg"
+    counter_labels = {"1": "i0", "2": "itrans", "3": "ifluor"}
 
     def __init__(self, headerlines=None):
         GenericBeamlineData.__init__(self, headerlines=headerlines)
@@ -482,8 +485,11 @@ class KEKPF_BeamlineData(GenericBeamlineData):
         if not self.beamline_matches():
             raise ValueError("header is not from beamline %s" % self.name)
 
+        modes = []
         for line in self.headerlines:
             line = line.lower().replace("#", " ").strip()
+            if line.startswith("mode "):
+                modes = line.split()[1:]
             if "mono :" in line:
                 words = ["_"] + line.replace("=", " ").split()
                 for i, w in enumerate(words):
@@ -500,4 +506,11 @@ class KEKPF_BeamlineData(GenericBeamlineData):
             ncols = max(ncols, ncolumns)
 
         labels = ["angle_drive", "angle_read", "time"]
+        # the counter columns are named after their mode in the "Mode" header line,
+        # which is aligned with the last columns
+        ncounters = ncols - len(labels)
+        if ncounters > 0:
+            modes = [""] * (ncounters - len(modes)) + modes[-ncounters:]
+            for mode in modes:
+                labels.append(self.counter_labels.get(mode, ""))
         return self._set_labels(labels, ncolumns=ncols)
@@ -3,100 +3,205 @@
 
 import re
 import datetime
-from typing import Union, Tuple, Optional, Generator
+import warnings
+from functools import lru_cache
+from typing import BinaryIO, Union, Tuple, Optional, Generator, NamedTuple
 
 import pint
 import numpy
+import numpy.typing
 
 from . import url_utils
+from . import formats
 from ..models import units
 from ..models.xdi import XdiModel
 
 
 def is_xdi_file(url: url_utils.UrlType) -> bool:
-    filename = url_utils.as_url(url).path
-    with open(filename, "r") as file:
-        try:
-            for line in file:
-                line = line.strip()
-                if not line:
-                    continue
-                return line.startswith("# XDI")
-        except Exception:
-            return False
+    return is_xdi_prefix(formats.read_prefix(url))
+
+
+def is_xdi_prefix(prefix: bytes) -> bool:
+    """The first non-empty line starts with '# XDI'"""
+    return prefix.lstrip().startswith(b"# XDI")
 
 
-def load_xdi_file(url: url_utils.UrlType) -> Generator[XdiModel, None, None]:
+def load_xdi_file(
+    url: url_utils.UrlType, dtype: numpy.typing.DTypeLike = numpy.float64
+) -> Generator[XdiModel, None, None]:
     """Specs described in
 
     https://github.com/XraySpectroscopy/XAS-Data-Interchange/blob/master/specification/spec.md
+
+    The file is opened only once: the header is parsed line by line after which
+    the data table is parsed in bulk starting from the current byte offset.
+
+    The data columns are contiguous arrays of type `dtype` which share a single
+    buffer. Use `numpy.float32` to halve the memory of large tables.
     """
     filename = url_utils.as_url(url).path
-    content = {"comments": [], "column": dict(), "data": dict()}
 
-    with open(filename, "r") as file:
-        # Version: first non-empty line
-        for line in file:
-            line = line.strip()
-            if not line:
-                continue
-            if not line.startswith("# XDI"):
-                raise ValueError(f"XDI file does not start with '# XDI': '{filename}'")
-            break
+    with open(filename, "rb") as file:
+        content = _read_xdi_header(file, filename)
+        table = _read_xdi_table(file, dtype=dtype)
 
-        # Fields and comments: lines starting with "#"
-        is_comment = False
-        for line in file:
-            line = line.strip()
+    yield _as_xdi_model(content, table)
 
-            if not line.startswith("#"):
-                raise ValueError(f"Invalid XDI header line: '{line}'")
 
-            if _XDI_HEADER_END_REGEX.match(line):
-                break
+def read_xdi_header(url: url_utils.UrlType) -> dict:
+    """Parse the header of an XDI file without reading the data table. Returns the
+    fields by namespace, the user comments and the column names (without units) by
+    column number."""
+    filename = url_utils.as_url(url).path
 
-            if _XDI_FIELDS_END_REGEX.match(line):
-                # Next lines in the header are user comments
-                is_comment = True
-                continue
+    with open(filename, "rb") as file:
+        content = _read_xdi_header(file, filename)
+    del content["data"]
+    content["column"] = {
+        number: _parse_xdi_column_name(name)[0]
+        for number, name in content["column"].items()
+    }
+    return content
 
-            if is_comment:
-                match_comment = _XDI_COMMENT_REGEX.match(line)
-                if not match_comment:
-                    continue
-                (comment,) = match_comment.groups()
-                content["comments"].append(comment)
-                continue
 
-            match_namespace = _XDI_FIELD_REGEX.match(line)
-            if match_namespace:
-                key, value = match_namespace.groups()
-                value = _parse_xdi_value(value)
-                key_parts = key.split(".")
-                if len(key_parts) > 1:
-                    namespace, key = key_parts
-                    namespace = namespace.lower()
-                    key = key.lower()
-                    key = _parse_xdi_value(key)
-                    if namespace not in content:
-                        content[namespace] = {}
-                    content[namespace][key] = value
-                else:
-                    key = key_parts[0]
-                    key = _parse_xdi_value(key)
-                    content[key] = value
-
-    # Data
-    table = numpy.loadtxt(filename, dtype=float)
+def iter_xdi_blocks(
+    url: url_utils.UrlType,
+    rows_per_block: Optional[int] = None,
+    dtype: numpy.typing.DTypeLike = numpy.float64,
+) -> Generator[XdiModel, None, None]:
+    """Like `load_xdi_file` but yields one model per block of at most `rows_per_block`
+    rows of the data table. All models have the header of the file. The table is
+    parsed while iterating so the peak memory is bounded by the size of a block
+    instead of the size of the table.
+    """
+    filename = url_utils.as_url(url).path
+    if rows_per_block is None:
+        rows_per_block = _ROWS_PER_BLOCK
+
+    with open(filename, "rb") as file:
+        content = _read_xdi_header(file, filename)
+        for i, rows in enumerate(_iter_xdi_rows(file, rows_per_block, dtype=dtype)):
+            if i and not len(rows):
+                break
+            yield _as_xdi_model(content, numpy.ascontiguousarray(rows.T))
+
+
+def _as_xdi_model(content: dict, table: numpy.ndarray) -> XdiModel:
+    """XDI model from the parsed header and a 2D array with one row per data column"""
+    content = dict(content)
     columns = [
         name
         for _, name in sorted(content.pop("column").items(), key=lambda tpl: tpl[0])
     ]
-    for name, array in zip(columns, table.T):
+    content["data"] = dict(content["data"])
+    for name, array in zip(columns, table):
         name, quant = _parse_xdi_column_name(name)
         content["data"][name] = array, quant
+    return XdiModel(**content)
+
+
+def _read_xdi_header(file: BinaryIO, filename: str) -> dict:
+    """Parse the XDI header from a binary stream. The stream position is left
+    at the first line after the header."""
+    content = {"comments": [], "column": dict(), "data": dict()}
+
+    # Version: first non-empty line
+    for line in iter(file.readline, b""):
+        line = _decode_line(line)
+        if not line:
+            continue
+        if not line.startswith("# XDI"):
+            raise ValueError(f"XDI file does not start with '# XDI': '{filename}'")
+        break
+
+    # Fields and comments: lines starting with "#"
+    is_comment = False
+    for line in iter(file.readline, b""):
+        line = _decode_line(line)
+
+        if not line.startswith("#"):
+            raise ValueError(f"Invalid XDI header line: '{line}'")
+
+        if _XDI_HEADER_END_REGEX.match(line):
+            break
 
-    yield XdiModel(**content)
+        if _XDI_FIELDS_END_REGEX.match(line):
+            # Next lines in the header are user comments
+            is_comment = True
+            continue
+
+        if is_comment:
+            match_comment = _XDI_COMMENT_REGEX.match(line)
+            if not match_comment:
+                continue
+            (comment,) = match_comment.groups()
+            content["comments"].append(comment)
+            continue
+
+        match_namespace = _XDI_FIELD_REGEX.match(line)
+        if match_namespace:
+            key, value = match_namespace.groups()
+            value = _parse_xdi_value(value)
+            key_parts = key.split(".")
+            if len(key_parts) > 1:
+                namespace, key = key_parts
+                namespace = namespace.lower()
+                key = key.lower()
+                key = _parse_xdi_value(key)
+                if namespace not in content:
+                    content[namespace] = {}
+                content[namespace][key] = value
+            else:
+                key = key_parts[0]
+                key = _parse_xdi_value(key)
+                content[key] = value
+
+    return content
+
+
+def _read_xdi_table(
+    file: BinaryIO, dtype: numpy.typing.DTypeLike = numpy.float64
+) -> numpy.ndarray:
+    """Parse the XDI data table from a binary stream, starting at the current
+    position. Returns a 2D array with one row per data column.
+
+    The number of lines is counted first so that the table can be allocated once
+    and filled with blocks of rows. The peak memory is the size of the table plus
+    one block instead of twice the size of the table when transposing."""
+    start = file.tell()
+    max_rows = 1
+    for block in iter(lambda: file.read(_COUNT_BLOCK_SIZE), b""):
+        max_rows += block.count(b"\n")
+    file.seek(start)
+
+    table = None
+    nrows = 0
+    for rows in _iter_xdi_rows(file, _ROWS_PER_BLOCK, dtype=dtype):
+        if table is None:
+            table = numpy.empty((rows.shape[1], max_rows), dtype=rows.dtype)
+        table[:, nrows : nrows + len(rows)] = rows.T
+        nrows += len(rows)
+    return table[:, :nrows]
+
+
+def _iter_xdi_rows(
+    file: BinaryIO, rows_per_block: int, dtype: numpy.typing.DTypeLike = numpy.float64
+) -> Generator[numpy.ndarray, None, None]:
+    """Yields blocks of at most `rows_per_block` rows of the XDI data table, starting
+    at the current position of the stream. The last block can be empty."""
+    rows_per_block = max(rows_per_block, 1)
+    while True:
+        with warnings.catch_warnings():
+            # Empty blocks and comment lines between data rows
+            warnings.filterwarnings("ignore", message=_NO_DATA_WARNING)
+            rows = numpy.loadtxt(file, dtype=dtype, ndmin=2, max_rows=rows_per_block)
+        yield rows
+        if len(rows) < rows_per_block:
+            break
+
+
+def _decode_line(line: bytes) -> str:
+    return line.decode(errors="replace").strip()
 
 
 def save_xdi_file(model_instance: XdiModel, url: url_utils.UrlType) -> None:
@@ -105,43 +210,77 @@ def save_xdi_file(model_instance: XdiModel, url: url_utils.UrlType) -> None:
     )
 
 
+_COUNT_BLOCK_SIZE = 1024 * 1024
+_ROWS_PER_BLOCK = 16 * 1024
+_NO_DATA_WARNING = r"(loadtxt: input|Input line \d+) contained no data"
 _XDI_FIELD_REGEX = re.compile(r"#\s*([\w.]+):\s*(.*)")
 _XDI_COMMENT_REGEX = re.compile(r"#\s*(.*)")
 _XDI_HEADER_END_REGEX = re.compile(r"#\s*-")
 _XDI_FIELDS_END_REGEX = re.compile(r"#\s*///")
-_NUMBER_REGEX = re.compile(r"(?=.)([+-]?([0-9]*)(\.([0-9]+))?)([eE][+-]?\d+)?\s+\w+")
+_NUMBER_REGEX = r"(?=.)([+-]?([0-9]*)(\.([0-9]+))?)([eE][+-]?\d+)?\s+\w+"
+_XDI_VALUE_REGEX = re.compile(
+    r"\s*(?:"
+    r"(?P<int>[+-]?\d+)\s*$"
+    r"|(?P<float>[+-]?(?:(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|nan|inf|infinity))\s*$"
+    r"|(?P<datetime>\d{4}-\d{2}-\d{2}.*)"
+    r")"
+    rf"|(?P<quantity>{_NUMBER_REGEX})",
+    re.IGNORECASE,
+)
 _SPACES_REGEX = re.compile(r"\s+")
 
 
 def _parse_xdi_value(
     value: str,
 ) -> Union[str, datetime.datetime, pint.Quantity, Tuple[str, pint.Quantity]]:
+    """Header values repeat a lot between files so the parsed values are cached.
+    Quantities are mutable so a new quantity is built from the cached magnitude and
+    units on each call."""
+    parsed = _parse_xdi_value_parts(value)
+    if isinstance(parsed, _QuantityParts):
+        return units.from_magnitude(parsed.magnitude, parsed.units)
+    return parsed
+
+
+class _QuantityParts(NamedTuple):
+    magnitude: Union[int, float]
+    units: pint.Unit
+
+
+@lru_cache(maxsize=4096)
+def _parse_xdi_value_parts(
+    value: str,
+) -> Union[str, datetime.datetime, _QuantityParts]:
+    """Classify the string with a single regular expression before converting it"""
+    match = _XDI_VALUE_REGEX.match(value)
+    if match is None:
+        return value
+    kind = match.lastgroup
+
     # Dimensionless integral number
-    try:
-        return units.as_quantity(int(value))
-    except ValueError:
-        pass
+    if kind == "int":
+        return _quantity_parts(units.as_quantity(int(value)))
 
     # Dimensionless decimal number
-    try:
-        return units.as_quantity(float(value))
-    except ValueError:
-        pass
+    if kind == "float":
+        return _quantity_parts(units.as_quantity(float(value)))
 
     # Date and time
-    try:
-        return datetime.datetime.fromisoformat(value)
-    except ValueError:
-        pass
+    if kind == "datetime":
+        try:
+            return datetime.datetime.fromisoformat(value.strip())
+        except ValueError:
+            return value
 
     # Number with units
-    if _NUMBER_REGEX.match(value):
-        try:
-            return units.as_quantity(value)
-        except pint.UndefinedUnitError:
-            pass
+    try:
+        return _quantity_parts(units.as_quantity(value))
+    except pint.UndefinedUnitError:
+        return value
+
 
-    return value
+def _quantity_parts(quantity: pint.Quantity) -> _QuantityParts:
+    return _QuantityParts(magnitude=quantity.magnitude, units=quantity.units)
 
 
 def _parse_xdi_column_name(
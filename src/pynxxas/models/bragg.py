@@ -0,0 +1,75 @@
+"""Monochromator angle to energy conversion (Bragg's law)
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Sequence, Union
+
+import numpy
+import pint
+
+from . import units
+
+
+def angle_to_energy(angle: pint.Quantity, d_spacing: pint.Quantity) -> pint.Quantity:
+    """Energy of the first order reflection of a crystal monochromator"""
+    d_spacing = units.as_quantity(d_spacing)
+    (energy,) = angles_to_energies(
+        [angle.magnitude],
+        [d_spacing.magnitude],
+        angle_units=angle.units,
+        d_spacing_units=d_spacing.units,
+    )
+    return units.from_magnitude(energy, "eV")
+
+
+def angles_to_energies(
+    angles: Sequence[numpy.ndarray],
+    d_spacings: Sequence[float],
+    angle_units: Union[str, pint.Unit] = "deg",
+    d_spacing_units: Union[str, pint.Unit] = "angstrom",
+    out: Optional[numpy.ndarray] = None,
+) -> List[numpy.ndarray]:
+    """Energies in eV of a batch of scans with one d-spacing per scan, computed
+    in place in a single buffer. The energies of each scan are views of this buffer.
+    The `out` buffer is filled in place when it is a float64 array with the total
+    number of points of the batch.
+
+    This is an API for applications which convert many scans at once. The readers
+    of this package have one scan per file and use `angle_to_energy`."""
+    lengths = [len(angles_scan) for angles_scan in angles]
+    if not lengths:
+        return []
+    npoints = sum(lengths)
+    if out is None or out.shape != (npoints,) or out.dtype != numpy.float64:
+        out = numpy.empty(npoints, dtype=numpy.float64)
+    if npoints:
+        numpy.concatenate(angles, out=out)
+
+    numpy.multiply(out, _conversion_factor(angle_units, "rad"), out=out)
+    numpy.sin(out, out=out)
+
+    # hc / (2 d sin(angle)) on the view of each scan
+    two_d = 2 * _conversion_factor(d_spacing_units, "angstrom")
+    two_d = two_d * numpy.asarray(d_spacings, dtype=numpy.float64)
+    energies = numpy.split(out, numpy.cumsum(lengths)[:-1])
+    with numpy.errstate(divide="ignore"):
+        for energies_scan, two_d_scan in zip(energies, two_d):
+            numpy.divide(_planck_hc() / two_d_scan, energies_scan, out=energies_scan)
+    return energies
+
+
+@lru_cache(maxsize=1)
+def _planck_hc() -> float:
+    """h*c in eV*angstrom"""
+    hc = units.get_registry().Quantity(1.0, "planck_constant * speed_of_light")
+    return hc.to("eV * angstrom").magnitude
+
+
+def _conversion_factor(from_units: Union[str, pint.Unit], to_units: str) -> float:
+    return _cached_conversion_factor(units.as_units(from_units), to_units)
+
+
+@lru_cache(maxsize=64)
+def _cached_conversion_factor(from_units: pint.Unit, to_units: str) -> float:
+    quantity = units.get_registry().Quantity(1.0, from_units)
+    return quantity.to(to_units).magnitude
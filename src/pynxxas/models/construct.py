@@ -0,0 +1,210 @@
+"""Construction of data models from trusted data without pydantic validation
+"""
+
+import copy
+from functools import lru_cache
+from typing import Any, Callable, Literal, Mapping, NamedTuple, Optional, Tuple
+from typing import Type, TypeVar, Union, Annotated, get_args, get_origin
+
+import pint
+import pydantic
+
+from . import units
+
+ModelType = TypeVar("ModelType", bound=pydantic.BaseModel)
+
+
+def construct_model(
+    model_type: Type[ModelType],
+    data: Optional[Mapping[str, Any]] = None,
+    /,
+    check: bool = False,
+    **kwargs,
+) -> ModelType:
+    """Construct a model like `model_type(**data, **kwargs)` but without validating
+    the fields. Use this for data produced by the converters of this package. Data
+    read from files is validated by instantiating the model.
+
+    Fields are populated by alias or by name. The alias is used when both are given.
+
+    Nested models are constructed recursively from dictionaries and quantity fields
+    are converted with `units.as_quantity` when needed. The "before" and "after"
+    model validators are applied since they derive fields (e.g. the title).
+
+    With `check=True` cheap invariants are checked: required fields must be
+    provided and literal fields must have one of the allowed values.
+    """
+    values = dict(data or {}, **kwargs)
+    model_info = _model_info(model_type)
+    for validator in model_info.before_validators:
+        values = validator(values)
+
+    fields = {}
+    fields_set = set()
+    for field_info in model_info.fields:
+        key = _find_key(values, field_info.keys)
+        if key is not None:
+            value = values.pop(key)
+            for other_key in field_info.keys:
+                values.pop(other_key, None)
+            if value is not None:
+                value = _construct_value(model_type, field_info, value, check)
+            fields_set.add(field_info.name)
+        elif field_info.required:
+            if check:
+                raise ValueError(
+                    f"{model_type.__name__}.{field_info.name}: field required"
+                )
+            continue
+        else:
+            value = _default_value(field_info)
+        fields[field_info.name] = value
+
+    if model_info.extra_allowed:
+        extra = values
+    else:
+        extra = None
+    instance = model_type.__new__(model_type)
+    _object_setattr(instance, "__dict__", fields)
+    _object_setattr(instance, "__pydantic_fields_set__", fields_set)
+    _object_setattr(instance, "__pydantic_extra__", extra)
+    _object_setattr(instance, "__pydantic_private__", None)
+
+    for validator in model_info.after_validators:
+        instance = validator(instance)
+    return instance
+
+
+class _FieldInfo(NamedTuple):
+    keys: Tuple[str, ...]
+    name: str
+    required: bool
+    kind: str
+    target: Any
+    default: Any
+    default_factory: Optional[Callable[[], Any]]
+
+
+class _ModelInfo(NamedTuple):
+    fields: Tuple[_FieldInfo, ...]
+    extra_allowed: bool
+    before_validators: Tuple[Callable[[Any], Any], ...]
+    after_validators: Tuple[Callable[[Any], Any], ...]
+
+
+_object_setattr = object.__setattr__
+_IMMUTABLE_TYPES = (str, bytes, int, float, bool, tuple, frozenset)
+
+
+def _find_key(values: Mapping[str, Any], keys: Tuple[str, ...]) -> Optional[str]:
+    for key in keys:
+        if key in values:
+            return key
+    return None
+
+
+def _construct_value(
+    model_type: Type[pydantic.BaseModel],
+    field_info: _FieldInfo,
+    value: Any,
+    check: bool,
+) -> Any:
+    kind = field_info.kind
+    if kind == "quantity":
+        if isinstance(value, pint.Quantity):
+            return value
+        return units.as_quantity(value)
+    if kind == "model":
+        if isinstance(value, dict):
+            return construct_model(field_info.target, value, check=check)
+        return value
+    if check and kind == "literal" and value not in field_info.target:
+        raise ValueError(
+            f"{model_type.__name__}.{field_info.name}: {value!r} is not one of {field_info.target}"
+        )
+    return value
+
+
+def _default_value(field_info: _FieldInfo) -> Any:
+    if field_info.default_factory is not None:
+        return field_info.default_factory()
+    return _copy_default(field_info.default)
+
+
+def _copy_default(value: Any) -> Any:
+    """Deep copy of a default value. Much faster than `copy.deepcopy` for models."""
+    if value is None or isinstance(value, _IMMUTABLE_TYPES):
+        return value
+    if isinstance(value, list):
+        return [_copy_default(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _copy_default(item) for key, item in value.items()}
+    if isinstance(value, pydantic.BaseModel) and value.__pydantic_private__ is None:
+        instance = type(value).__new__(type(value))
+        _object_setattr(instance, "__dict__", _copy_default(value.__dict__))
+        _object_setattr(
+            instance, "__pydantic_fields_set__", set(value.__pydantic_fields_set__)
+        )
+        _object_setattr(
+            instance, "__pydantic_extra__", _copy_default(value.__pydantic_extra__)
+        )
+        _object_setattr(instance, "__pydantic_private__", None)
+        return instance
+    return copy.deepcopy(value)
+
+
+@lru_cache(maxsize=None)
+def _model_info(model_type: Type[pydantic.BaseModel]) -> _ModelInfo:
+    """Fields are looked up by alias first and then by name."""
+    fields = []
+    for name, field in model_type.model_fields.items():
+        kind, target = _annotation_kind(field.annotation)
+        if field.alias and field.alias != name:
+            keys = (field.alias, name)
+        else:
+            keys = (name,)
+        field_info = _FieldInfo(
+            keys=keys,
+            name=name,
+            required=field.is_required(),
+            kind=kind,
+            target=target,
+            default=field.default,
+            default_factory=field.default_factory,
+        )
+        fields.append(field_info)
+
+    decorators = model_type.__pydantic_decorators__.model_validators.values()
+    return _ModelInfo(
+        fields=tuple(fields),
+        extra_allowed=model_type.model_config.get("extra") == "allow",
+        before_validators=tuple(
+            decorator.func
+            for decorator in decorators
+            if decorator.info.mode == "before"
+        ),
+        after_validators=tuple(
+            decorator.func for decorator in decorators if decorator.info.mode == "after"
+        ),
+    )
+
+
+def _annotation_kind(annotation: Any) -> Tuple[str, Any]:
+    origin = get_origin(annotation)
+    if origin is Union:
+        for arg in get_args(annotation):
+            if arg is type(None):
+                continue
+            kind, target = _annotation_kind(arg)
+            if kind != "other":
+                return kind, target
+        return "other", None
+    if origin is Annotated:
+        return _annotation_kind(get_args(annotation)[0])
+    if origin is Literal:
+        return "literal", get_args(annotation)
+    if annotation is pint.Quantity:
+        return "quantity", None
+    if isinstance(annotation, type) and issubclass(annotation, pydantic.BaseModel):
+        return "model", annotation
+    return "other", None
@@ -8,10 +8,16 @@ from .. import NxXasModel
 
 
 def convert_model(
-    instance: pydantic.BaseModel, model_type: Type[pydantic.BaseModel]
+    instance: pydantic.BaseModel,
+    model_type: Type[pydantic.BaseModel],
+    derive_mu: bool = False,
 ) -> Generator[pydantic.BaseModel, None, None]:
+    """With `derive_mu=True`, models with raw intensities but no absorption
+    coefficient are converted with the absorption coefficient derived from the
+    intensities."""
     if isinstance(instance, model_type):
         yield instance
+        return
 
     mod_from = _CONVERT_MODULE.get(type(instance))
     mod_to = _CONVERT_MODULE.get(model_type)
@@ -20,7 +26,7 @@ def convert_model(
             f"Conversion from {type(instance).__name__} to {model_type.__name__} is not implemented"
         )
 
-    for nxxas_model in mod_from.to_nxxas(instance):
+    for nxxas_model in mod_from.to_nxxas(instance, derive_mu=derive_mu):
         yield from mod_to.from_nxxas(nxxas_model)
 
 
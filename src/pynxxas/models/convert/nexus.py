@@ -2,7 +2,9 @@ from typing import Generator
 from .. import NxXasModel
 
 
-def to_nxxas(nxxas_model: NxXasModel) -> Generator[NxXasModel, None, None]:
+def to_nxxas(
+    nxxas_model: NxXasModel, derive_mu: bool = False
+) -> Generator[NxXasModel, None, None]:
     yield nxxas_model
 
 
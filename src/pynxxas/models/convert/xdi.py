@@ -1,16 +1,32 @@
-from typing import Generator
+from typing import Generator, Optional
 
+import numpy
+
+from .. import units
+from .. import bragg
 from .. import XdiModel
 from .. import NxXasModel
-
-from ..nexus import NxXasMode
+from ..construct import construct_model
 
 
-def to_nxxas(xdi_model: XdiModel) -> Generator[NxXasModel, None, None]:
-    has_mu = xdi_model.data.mutrans is not None or xdi_model.data.normtrans is not None
-    has_fluo = (
-        xdi_model.data.mufluor is not None or xdi_model.data.normfluor is not None
-    )
+def to_nxxas(
+    xdi_model: XdiModel, derive_mu: bool = False
+) -> Generator[NxXasModel, None, None]:
+    """With `derive_mu=True` the absorption coefficient is derived from the raw
+    intensities when the data has none: ln(I0/It) for transmission and If/I0
+    for fluorescence."""
+    mutrans = xdi_model.data.mutrans
+    if mutrans is None:
+        mutrans = xdi_model.data.normtrans
+    if mutrans is None and derive_mu:
+        mutrans = _ratio(xdi_model.data.i0, xdi_model.data.itrans, log=True)
+    mufluor = xdi_model.data.mufluor
+    if mufluor is None:
+        mufluor = xdi_model.data.normfluor
+    if mufluor is None and derive_mu:
+        mufluor = _ratio(xdi_model.data.ifluor, xdi_model.data.i0)
+    has_mu = mutrans is not None
+    has_fluo = mufluor is not None
     if not has_mu and not has_fluo:
         return
 
@@ -20,9 +36,9 @@ def to_nxxas(xdi_model: XdiModel) -> Generator[NxXasModel, None, None]:
     data["element"] = {"symbol": xdi_model.element.symbol}
 
     if has_mu and has_fluo:
-        data["NX_class"] = "NXsubentry"
+        data["@NX_class"] = "NXsubentry"
     else:
-        data["NX_class"] = "NXentry"
+        data["@NX_class"] = "NXentry"
 
     if xdi_model.facility and xdi_model.facility.name:
         if xdi_model.beamline and xdi_model.beamline.name:
@@ -31,37 +47,61 @@ def to_nxxas(xdi_model: XdiModel) -> Generator[NxXasModel, None, None]:
                 "@short_name": xdi_model.beamline.name,
             }
         else:
-            name = {"value": xdi_model.facility.name}
+            name = {"value": xdi_model.facility.name, "@short_name": None}
         data["instrument"] = {"name": name}
 
+    data["energy"] = _energy(xdi_model)
+
     if has_mu:
-        nxxas_mode = NxXasMode(name="transmission")
-        nxxas_model = NxXasModel(mode=nxxas_mode, **data)
-        nxxas_model.energy = xdi_model.data.energy
-        if xdi_model.data.mutrans is not None:
-            nxxas_model.intensity = xdi_model.data.mutrans
-        else:
-            nxxas_model.intensity = xdi_model.data.normtrans
-        yield nxxas_model
+        yield construct_model(
+            NxXasModel,
+            data,
+            check=True,
+            mode={"name": "transmission"},
+            intensity=mutrans,
+        )
 
     if has_fluo:
-        nxxas_mode = NxXasMode(name="fy")
-        nxxas_model = NxXasModel(mode=nxxas_mode, **data)
-        nxxas_model.energy = xdi_model.data.energy
-        if xdi_model.data.mufluor is not None:
-            nxxas_model.intensity = xdi_model.data.mufluor
-        else:
-            nxxas_model.intensity = xdi_model.data.normfluor
-        yield nxxas_model
+        yield construct_model(
+            NxXasModel,
+            data,
+            check=True,
+            mode={"name": "fy"},
+            intensity=mufluor,
+        )
+
+
+def _energy(xdi_model: XdiModel) -> Optional[units.PydanticQuantity]:
+    """Energy from the monochromator angle when there is no energy column"""
+    if xdi_model.data.energy is not None:
+        return xdi_model.data.energy
+    if xdi_model.data.angle is None or xdi_model.mono.d_spacing is None:
+        return None
+    return bragg.angle_to_energy(xdi_model.data.angle, xdi_model.mono.d_spacing)
+
+
+def _ratio(
+    numerator: Optional[units.PydanticQuantity],
+    denominator: Optional[units.PydanticQuantity],
+    log: bool = False,
+) -> Optional[units.PydanticQuantity]:
+    """Absorption coefficient from raw intensities"""
+    if numerator is None or denominator is None:
+        return None
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        ratio = numpy.asarray(numerator.magnitude) / numpy.asarray(
+            denominator.magnitude
+        )
+        if log:
+            ratio = numpy.log(ratio)
+    return units.as_quantity(ratio)
 
 
 def from_nxxas(nxxas_model: NxXasModel) -> Generator[XdiModel, None, None]:
-    xdi_model = XdiModel()
-    xdi_model.element.symbol = nxxas_model.element
-    xdi_model.element.edge = nxxas_model.edge
-    xdi_model.data.energy = nxxas_model.energy
+    data = {"energy": nxxas_model.energy}
     if nxxas_model.mode.name == "transmission":
-        xdi_model.data.mutrans = nxxas_model.intensity
+        data["mutrans"] = nxxas_model.intensity
     elif nxxas_model.mode.name == "fy":
-        xdi_model.data.mufluor = nxxas_model.intensity
-    yield xdi_model
+        data["mufluor"] = nxxas_model.intensity
+    element = {"symbol": nxxas_model.element.symbol, "edge": nxxas_model.edge.name}
+    yield construct_model(XdiModel, element=element, data=data)
@@ -117,8 +117,12 @@ class NxXasModel(NxClass, NxGroup, nx_class="NxXas"):
     element: NxElement
     edge: NxEdge
     calculated: Optional[bool] = None
-    energy: units.PydanticQuantity = units.as_quantity([])
-    intensity: units.PydanticQuantity = units.as_quantity([])
+    energy: units.PydanticQuantity = pydantic.Field(
+        default_factory=lambda: units.as_quantity([])
+    )
+    intensity: units.PydanticQuantity = pydantic.Field(
+        default_factory=lambda: units.as_quantity([])
+    )
     title: Optional[str] = None
     plot: Optional[NxDataModel] = None
     instrument: Optional[NxInstrument] = None
@@ -1,12 +1,43 @@
+import copyreg
+import threading
+from functools import lru_cache
+
 import pint
 import pydantic
 from pydantic_core import core_schema
 from pydantic.json_schema import JsonSchemaValue
 
-from typing import Any, Sequence, Union, List, Annotated
+from typing import Any, Optional, Sequence, Tuple, Union, List, Annotated
+
+_REGISTRY: Optional[pint.UnitRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_registry() -> pint.UnitRegistry:
+    """The unit registry is created on first use because it takes a large part
+    of the import time."""
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = _create_registry()
+    return _REGISTRY
+
+
+def _create_registry() -> pint.UnitRegistry:
+    registry = pint.UnitRegistry()
+    registry.formatter.default_format = "~"  # unit symbols instead of full unit names
+    copyreg.pickle(registry.Quantity, _pickle_quantity)
+    return registry
+
+
+def _unpickle_quantity(magnitude: Any, units: Any) -> pint.Quantity:
+    return get_registry().Quantity(magnitude, units)
+
 
-_REGISTRY = pint.UnitRegistry()
-_REGISTRY.formatter.default_format = "~"  # unit symbols instead of full unit names
+def _pickle_quantity(quantity: pint.Quantity) -> tuple:
+    # pint unpickles in the application registry by default
+    return _unpickle_quantity, (quantity.magnitude, quantity._units)
 
 
 def as_quantity(value: Union[str, pint.Quantity, Sequence]) -> pint.Quantity:
@@ -20,13 +51,42 @@ def as_quantity(value: Union[str, pint.Quantity, Sequence]) -> pint.Quantity:
         value, units = value
     else:
         units = None
-    return _REGISTRY.Quantity(value, units)
+    if isinstance(units, str):
+        return from_magnitude(value, units)
+    return get_registry().Quantity(value, units)
+
+
+def from_magnitude(magnitude: Any, units: Union[str, pint.Unit]) -> pint.Quantity:
+    """Build a quantity from a magnitude (e.g. a numpy array) and cached units,
+    without going through the unit parser of the registry."""
+    return get_registry().Quantity(magnitude, as_units(units)._units)
 
 
 def as_units(value: Union[str, pint.Unit]) -> pint.Unit:
     if isinstance(value, pint.Unit):
         return value
-    return _REGISTRY.parse_units(value)
+    units = _parse_units(value)
+    if units is None:
+        raise pint.UndefinedUnitError(value)
+    return units
+
+
+def units_cache_info() -> Tuple[int, int, int, int]:
+    """Hit and miss counters of the unit parsing cache: (hits, misses, maxsize, currsize)"""
+    return _parse_units.cache_info()
+
+
+def clear_units_cache() -> None:
+    _parse_units.cache_clear()
+
+
+@lru_cache(maxsize=256)
+def _parse_units(value: str) -> Optional[pint.Unit]:
+    try:
+        return get_registry().parse_units(value)
+    except pint.UndefinedUnitError:
+        # Column names and header values are often not units
+        return None
 
 
 class _QuantityPydanticAnnotation:
@@ -0,0 +1,135 @@
+import sys
+import time
+import subprocess
+import asyncio
+import threading
+
+import h5py
+import numpy
+import pytest
+
+from .. import io
+from ..io import aio
+from ..io import nexus
+from .utils import entry_names
+
+
+def test_aload_models(xdi_file):
+    async def load():
+        return [model_instance async for model_instance in io.aload_models(xdi_file)]
+
+    (model_instance,) = asyncio.run(load())
+    (expected,) = io.load_models(xdi_file)
+    assert model_instance.element.symbol == expected.element.symbol
+    assert model_instance.data.energy.tolist() == expected.data.energy.tolist()
+
+
+def test_aload_models_nexus(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    nexus.save_nexus_file(nxxas_model, f"{filename}?path=/dataset01")
+
+    async def load():
+        return [model_instance async for model_instance in io.aload_models(filename)]
+
+    (model_instance,) = asyncio.run(load())
+    assert type(model_instance.energy.magnitude) is numpy.ndarray
+    assert type(model_instance.intensity.magnitude) is numpy.ndarray
+    numpy.testing.assert_array_equal(
+        model_instance.energy.magnitude, nxxas_model.energy.magnitude
+    )
+    assert model_instance.energy.units == nxxas_model.energy.units
+
+
+def test_aio_is_imported_lazily():
+    code = "import sys, pynxxas.io; assert 'pynxxas.io.aio' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)
+    assert io.aload_models is aio.aload_models
+
+
+def test_asave_model(tmp_path, nxxas_model):
+    output_filename = tmp_path / "output.h5"
+
+    async def save():
+        with aio.AsyncExecutor(max_workers=2) as executor:
+            await asyncio.gather(
+                *[
+                    io.asave_model(
+                        nxxas_model,
+                        f"{output_filename}?path=/dataset{i:02}",
+                        executor=executor,
+                    )
+                    for i in range(1, 5)
+                ]
+            )
+
+    asyncio.run(save())
+    with h5py.File(output_filename, "r") as nxroot:
+        assert entry_names(nxroot) == [f"dataset{i:02}" for i in range(1, 5)]
+
+
+def test_asave_model_cancel(tmp_path, nxxas_model, monkeypatch):
+    saving = threading.Event()
+    resume = threading.Event()
+    save = nexus.NexusWriter.save
+
+    def blocking_save(self, *args, **kwargs):
+        try:
+            save(self, *args, **kwargs)
+        finally:
+            saving.set()
+        resume.wait()
+
+    monkeypatch.setattr(nexus.NexusWriter, "save", blocking_save)
+    output_filename = tmp_path / "output.h5"
+
+    async def cancel():
+        task = asyncio.create_task(
+            io.asave_model(nxxas_model, f"{output_filename}?path=/dataset01")
+        )
+        await asyncio.get_running_loop().run_in_executor(None, saving.wait)
+        task.cancel()
+        await asyncio.sleep(0.01)
+        assert not task.done()  # waits for saving to finish
+        resume.set()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(cancel())
+    with h5py.File(output_filename, "r") as nxroot:
+        assert "dataset01" not in nxroot
+
+
+def test_asave_model_error(tmp_path, nxxas_model, monkeypatch):
+    output_filename = tmp_path / "output.h5"
+    io.save_model(nxxas_model, f"{output_filename}?path=/dataset01")
+    save = nexus.NexusWriter.save
+
+    def failing_save(self, *args, **kwargs):
+        save(self, *args, **kwargs)
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(nexus.NexusWriter, "save", failing_save)
+    with pytest.raises(RuntimeError, match="disk full"):
+        asyncio.run(io.asave_model(nxxas_model, f"{output_filename}?path=/dataset02"))
+    with h5py.File(output_filename, "r") as nxroot:
+        assert entry_names(nxroot) == ["dataset01"]
+
+
+def test_async_executor_backpressure():
+    lock = threading.Lock()
+    running = [0, 0]  # current, maximum
+
+    def work():
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+
+    async def run_all():
+        with aio.AsyncExecutor(max_workers=4, max_pending=2) as executor:
+            await asyncio.gather(*[executor.run(work) for _ in range(10)])
+
+    asyncio.run(run_all())
+    assert running == [0, 2]
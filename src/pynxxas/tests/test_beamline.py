@@ -0,0 +1,149 @@
+import pathlib
+
+import numpy
+import pytest
+
+from .. import io
+from .. import models
+from ..io import beamline
+from ..io import formats
+from ..models import convert
+
+_BEAMLINE_FILES = sorted(
+    (pathlib.Path(__file__).parents[3] / "xas_beamline_data").glob("*")
+)
+
+
+def test_load_beamline_file(tmp_path):
+    filename = tmp_path / "data.dat"
+    filename.write_text(_SSRL_CONTENT)
+
+    model_instance = next(beamline.load_beamline_file(filename))
+    assert model_instance.beamline.name == "SSRL"
+
+    assert model_instance.data.energy.magnitude.tolist() == [7509, 7519, 7529]
+    assert str(model_instance.data.energy.units) == "eV"
+    assert model_instance.data.i0.magnitude.tolist() == [100, 110, 120]
+    assert model_instance.data.itrans.magnitude.tolist() == [50, 40, 30]
+
+
+def test_load_beamline_file_no_header(tmp_path):
+    filename = tmp_path / "data.dat"
+    filename.write_text("7509, 100, 50\n7519, 110, 40\n")
+
+    model_instance = next(beamline.load_beamline_file(filename))
+    assert model_instance.data.energy.magnitude.tolist() == [7509, 7519]
+    assert model_instance.data.col2.magnitude.tolist() == [100, 110]
+
+
+def test_beamline_to_nxxas(tmp_path):
+    filename = tmp_path / "data.dat"
+    filename.write_text(_SSRL_CONTENT)
+
+    model_instance = next(io.load_models(filename))
+    assert not list(convert.convert_model(model_instance, models.NxXasModel))
+
+    (nxxas_model,) = convert.convert_model(
+        model_instance, models.NxXasModel, derive_mu=True
+    )
+    assert nxxas_model.mode.name == "transmission"
+    numpy.testing.assert_allclose(
+        nxxas_model.intensity.magnitude, numpy.log([100 / 50, 110 / 40, 120 / 30])
+    )
+
+
+@pytest.mark.parametrize(
+    "name,mode,energy",
+    [("PF9A_2022.dat", "fy", 6606.2), ("PFBL12C_2005.dat", "transmission", 12049)],
+)
+def test_kekpf_angle_to_energy(name, mode, energy):
+    filename = pathlib.Path(__file__).parents[3] / "xas_beamline_data" / name
+
+    model_instance = next(io.load_models(filename))
+    assert str(model_instance.data.angle.units) == "deg"
+    assert str(model_instance.data.energy.units) == "eV"
+    numpy.testing.assert_allclose(
+        model_instance.data.energy[0].magnitude, energy, atol=1
+    )
+
+    model_instance.data.energy = None
+    (nxxas_model,) = convert.convert_model(
+        model_instance, models.NxXasModel, derive_mu=True
+    )
+    assert nxxas_model.mode.name == mode
+    numpy.testing.assert_allclose(nxxas_model.energy[0].magnitude, energy, atol=1)
+
+
+@pytest.mark.parametrize("filename", _BEAMLINE_FILES, ids=lambda path: path.name)
+def test_load_beamline_data(filename):
+    file_format = formats.detect_format(filename)
+    if filename.name in _UNSUPPORTED_FILES:
+        assert file_format is None
+        return
+    nxxas_models = []
+    for model_instance in io.load_models(filename):
+        if model_instance.data.energy is None:
+            assert model_instance.data.angle.size
+        else:
+            assert model_instance.data.energy.size
+        nxxas_models += convert.convert_model(
+            model_instance, models.NxXasModel, derive_mu=True
+        )
+    if file_format.name == "beamline":
+        assert nxxas_models
+
+
+@pytest.mark.parametrize(
+    "label,name",
+    [
+        ("I0", "i0"),
+        ("It", "itrans"),
+        ("xmu", "mutrans"),
+        ("I0_EH1", "i0"),
+        ("It_32", "itrans"),
+        ("If_32", "ifluor"),
+        ("xsp3_dt_corr_i0", "xsp3_dt_corr_i0"),
+        ("mu_ref", "mu_ref"),
+        ("ROI1", "ROI1"),
+    ],
+)
+def test_array_name(label, name):
+    assert beamline._array_name(label) == name
+
+
+def test_is_beamline_prefix():
+    assert beamline.is_beamline_prefix(b"# energy i0 it\n1 2 3\n")
+    assert beamline.is_beamline_prefix(b"# Energy I0 IF\n1 2 3\n")
+    assert beamline.is_beamline_prefix(b"# energy xmu\n1 2\n")
+    assert not beamline.is_beamline_prefix(b"# energy i0 roi\n1 2 3\n")
+    assert not beamline.is_beamline_prefix(b"1 2 3\n")
+    assert not beamline.is_beamline_prefix(b"no data\n")
+    assert not beamline.is_beamline_prefix(b"")
+
+
+# Columns without an absorption coefficient or known intensities (simulations,
+# headers without labels or with labels of unknown counters)
+_UNSUPPORTED_FILES = {
+    "ESRF_SNBL_2013.dat",
+    "FDMNES_2022_Mo2C_out.dat",
+    "FDMNES_2022_Mo2C_out_conv.dat",
+    "generic_columns_no_header.dat",
+}
+
+
+_SSRL_CONTENT = """SSRL                            EXAFS Data Collector 1.3
+PTS:      3 COLS:     4
+Weights:
+ 1.000  1.000  1.000  1.000
+Offsets:
+ 0.000  0.000  0.000  0.000
+Data:
+Real time clock
+Achieved Energy
+I0
+I1
+
+ 1.000  7509.000  100.000  50.000
+ 1.000  7519.000  110.000  40.000
+ 1.000  7529.000  120.000  30.000
+"""
@@ -0,0 +1,53 @@
+from ..io import xdi
+from ..io import beamline
+from ..benchmarks import runner
+from ..benchmarks import generators
+from ..apps import nxxas_benchmark
+
+
+def test_generators(tmp_path):
+    filename = generators.write_xdi_file(
+        tmp_path / "data.xdi", npoints=10, ncolumns=6, nfields=15
+    )
+    xdi_model = next(xdi.load_xdi_file(filename))
+    assert xdi_model.data.energy.size == 10
+    assert "roi2" in xdi_model.data.model_extra
+    assert xdi_model.element.symbol == "Fe"
+
+    filename = generators.write_beamline_file(
+        tmp_path / "data.dat", npoints=10, ncolumns=4, nheader=5
+    )
+    model_instance = next(beamline.load_beamline_file(filename))
+    assert model_instance.data.energy.size == 10
+    assert model_instance.data.itrans.size == 10
+
+
+def test_run_benchmarks(tmp_path):
+    case = runner.BenchmarkCase(nfiles=2, npoints=20, ncolumns=4, nfields=5)
+    results = runner.run_benchmarks(cases=[case], repeats=1, workdir=str(tmp_path))
+    stages = [result["stage"] for result in results["results"]]
+    assert stages == [
+        "load_xdi",
+        "load_beamline",
+        "convert_model",
+        "save_nexus",
+        "convert_files",
+    ]
+    for result in results["results"]:
+        assert result["files_per_second"] > 0
+        assert result["mb_per_second"] > 0
+        assert result["peak_memory_mb"] > 0
+
+    filename = str(tmp_path / "results.json")
+    runner.save_results(results, filename)
+    comparison = runner.compare_results(runner.load_results(filename), results)
+    assert len(comparison) == len(stages)
+    assert all(item["throughput_ratio"] == 1 for item in comparison)
+
+
+def test_nxxas_benchmark_app(tmp_path, capsys):
+    filename = str(tmp_path / "results.json")
+    argv = ["nxxas_benchmark", "run", "--quick", "--repeats", "1", "-o", filename]
+    nxxas_benchmark.main(argv)
+    nxxas_benchmark.main(["nxxas_benchmark", "compare", filename, filename])
+    assert "x1.00" in capsys.readouterr().out
@@ -0,0 +1,29 @@
+import numpy
+
+from ..models import bragg
+from ..models import units
+
+
+def test_angle_to_energy():
+    angle = units.as_quantity([[17.41446, 13.9325], "deg"])
+    d_spacing = units.as_quantity([3.13551, "angstrom"])
+    energy = bragg.angle_to_energy(angle, d_spacing)
+    assert str(energy.units) == "eV"
+    numpy.testing.assert_allclose(energy.magnitude, [6606.4, 8211.2], atol=0.5)
+
+    angle = units.as_quantity([numpy.radians([17.41446, 13.9325]), "rad"])
+    d_spacing = units.as_quantity([0.313551, "nm"])
+    energy = bragg.angle_to_energy(angle, d_spacing)
+    numpy.testing.assert_allclose(energy.magnitude, [6606.4, 8211.2], atol=0.5)
+
+
+def test_angles_to_energies():
+    angles = [numpy.array([17.41446, 13.9325]), numpy.array([17.41446])]
+    out = numpy.zeros(3)
+    energies = bragg.angles_to_energies(angles, [3.13551, 2 * 3.13551], out=out)
+    assert len(energies) == 2
+    for energies_scan in energies:
+        assert energies_scan.base is out
+    numpy.testing.assert_allclose(out, [6606.4, 8211.2, 3303.2], atol=0.5)
+
+    assert bragg.angles_to_energies([], []) == []
@@ -0,0 +1,42 @@
+import os
+import datetime
+
+from .. import io
+from ..io import nexus
+from ..io.catalog import Catalog
+
+
+def test_catalog(tmp_path, xdi_file, nxxas_model):
+    nexus_file = tmp_path / "data.h5"
+    nexus.save_nexus_file(nxxas_model, f"{nexus_file}?path=/dataset01")
+    patterns = [str(tmp_path / "*.xdi"), str(tmp_path / "*.h5")]
+
+    with Catalog(tmp_path / "catalog.sqlite") as catalog:
+        assert catalog.update(patterns) == 2
+        assert catalog.update(patterns) == 0
+
+        assert catalog.query(element="co", edge="K") == [
+            f"{nexus_file}?path=/dataset01",
+            str(xdi_file),
+        ]
+        urls = catalog.query(beamline="13-ID-C", facility="APS", mode="transmission")
+        assert urls == [str(xdi_file)]
+        assert catalog.query(element="Fe") == []
+
+        start_time = datetime.datetime(2001, 1, 1)
+        assert catalog.query(start_after=start_time) == [str(xdi_file)]
+        assert catalog.query(start_before=start_time) == []
+
+        for url in catalog.query(element="Co"):
+            (model_instance,) = io.load_models(url)
+            assert model_instance is not None
+
+    # Incremental update
+    stat = os.stat(xdi_file)
+    os.utime(xdi_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    with Catalog(tmp_path / "catalog.sqlite") as catalog:
+        assert catalog.update(patterns, jobs=2) == 1
+
+        nexus_file.unlink()
+        assert catalog.prune() == 1
+        assert catalog.query(element="Co") == [str(xdi_file)]
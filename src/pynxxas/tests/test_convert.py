@@ -1,5 +1,8 @@
+import numpy
+
 from .. import models
 from ..models import convert
+from ..models import units
 
 
 def test_xdi_to_xdi(xdi_model):
@@ -17,6 +20,24 @@ def test_xdi_to_nexus(xdi_model):
     _assert_model(nxxas_model)
 
 
+def test_xdi_to_nexus_derive_mu(xdi_model):
+    data = xdi_model.data.model_copy(
+        update={
+            "mutrans": None,
+            "i0": units.as_quantity([100, 110]),
+            "itrans": units.as_quantity([50, 40]),
+        }
+    )
+    xdi_model = xdi_model.model_copy(update={"data": data})
+    assert not list(convert.convert_model(xdi_model, models.NxXasModel))
+
+    (nxxas_model,) = convert.convert_model(xdi_model, models.NxXasModel, derive_mu=True)
+    assert nxxas_model.mode.name == "transmission"
+    numpy.testing.assert_allclose(
+        nxxas_model.intensity.magnitude, numpy.log([100 / 50, 110 / 40])
+    )
+
+
 def test_nexus_to_xdi(nxxas_model):
     xdi_model = next(convert.convert_model(nxxas_model, models.XdiModel))
     _assert_model(xdi_model)
@@ -0,0 +1,255 @@
+import os
+import json
+import pathlib
+
+import h5py
+import numpy
+import pytest
+
+from .. import io
+from ..io import manifest
+from ..io import hdf5_utils
+from ..io.convert import convert_files
+from ..io.metrics import ConversionStats
+from .utils import entry_names
+
+
+def test_convert_files(tmp_path, xdi_file):
+    output_filename = tmp_path / "output.h5"
+    return_code = convert_files([str(xdi_file)], str(output_filename), "nexus")
+    assert return_code == 0
+
+    with h5py.File(output_filename, "r") as nxroot:
+        assert entry_names(nxroot) == ["dataset01"]
+        nxentry = nxroot["dataset01"]
+        assert nxentry["definition"][()] == b"NXxas"
+        numpy.testing.assert_array_equal(nxentry["energy"][()], [7509, 7519])
+
+
+def test_convert_files_rows_per_block(tmp_path, xdi_file):
+    output_filename = tmp_path / "output.h5"
+    return_code = convert_files(
+        [str(xdi_file)], str(output_filename), "nexus", rows_per_block=1
+    )
+    assert return_code == 0
+
+    with h5py.File(output_filename, "r") as nxroot:
+        nxentry = nxroot["dataset01"]
+        assert nxentry["definition"][()] == b"NXxas"
+        assert nxentry["energy"].maxshape == (None,)
+        numpy.testing.assert_array_equal(nxentry["energy"][()], [7509, 7519])
+        numpy.testing.assert_allclose(
+            nxentry["intensity"][()], [-0.51329170, -0.78493490]
+        )
+
+
+def test_convert_files_parallel(tmp_path, xdi_file):
+    file_patterns = []
+    for i in range(5):
+        filename = tmp_path / f"data{i}.xdi"
+        filename.write_text(xdi_file.read_text().replace("7509.0000", f"{7500 + i}"))
+        file_patterns.append(str(filename))
+    file_patterns.append(str(tmp_path / "nonexisting.xdi"))
+
+    output_serial = tmp_path / "serial.h5"
+    return_code = convert_files(file_patterns, str(output_serial), "nexus")
+    assert return_code == 0
+
+    output_parallel = tmp_path / "parallel.h5"
+    return_code = convert_files(file_patterns, str(output_parallel), "nexus", jobs=3)
+    assert return_code == 0
+
+    with h5py.File(output_serial, "r") as nxroot_serial:
+        with h5py.File(output_parallel, "r") as nxroot_parallel:
+            names = [f"dataset{i:02}" for i in range(1, 6)]
+            assert [
+                name
+                for name in nxroot_serial
+                if isinstance(nxroot_serial[name], h5py.Group)
+            ] == names
+            assert [
+                name
+                for name in nxroot_parallel
+                if isinstance(nxroot_parallel[name], h5py.Group)
+            ] == names
+            for i, name in enumerate(names):
+                energy = nxroot_parallel[name]["energy"][()]
+                numpy.testing.assert_array_equal(energy, [7500 + i, 7519])
+                numpy.testing.assert_array_equal(
+                    energy, nxroot_serial[name]["energy"][()]
+                )
+
+
+def test_convert_files_incremental(tmp_path, xdi_file, monkeypatch):
+    def write_xdi(i, energy):
+        filename = input_dir / f"data{i}.xdi"
+        filename.write_text(xdi_file.read_text().replace("7509.0000", f"{energy}"))
+        return filename
+
+    def touch(filename):
+        stat = os.stat(filename)
+        os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    loaded = []
+    load_models = io.load_models
+
+    def counting_load_models(url):
+        loaded.append(pathlib.Path(url).name)
+        return load_models(url)
+
+    monkeypatch.setattr(io, "load_models", counting_load_models)
+
+    input_dir = tmp_path / "input"
+    input_dir.mkdir()
+    for i in range(3):
+        write_xdi(i, 7500 + i)
+    file_patterns = [str(input_dir / f"data{i}.xdi") for i in range(4)]
+    output_filename = tmp_path / "output.h5"
+
+    def convert(**kwargs):
+        loaded.clear()
+        return_code = convert_files(
+            file_patterns, str(output_filename), "nexus", incremental=True, **kwargs
+        )
+        assert return_code == 0
+        with h5py.File(output_filename, "r") as nxroot:
+            return {name: nxroot[name]["energy"][0] for name in entry_names(nxroot)}
+
+    assert convert() == {"dataset01": 7500, "dataset02": 7501, "dataset03": 7502}
+    assert sorted(loaded) == ["data0.xdi", "data1.xdi", "data2.xdi"]
+    assert manifest.manifest_filename(output_filename).exists()
+
+    # Nothing changed
+    assert convert() == {"dataset01": 7500, "dataset02": 7501, "dataset03": 7502}
+    assert loaded == []
+
+    # One file changed and one file added
+    touch(write_xdi(1, 7601))
+    write_xdi(3, 7503)
+    expected = {"dataset01": 7500, "dataset03": 7502, "dataset04": 7601}
+    expected["dataset05"] = 7503
+    assert convert() == expected
+    assert loaded == ["data1.xdi", "data3.xdi"]
+
+    # Only the modification time changed: the hash was not recorded
+    touch(input_dir / "data0.xdi")
+    del expected["dataset01"]
+    expected["dataset06"] = 7500
+    assert convert(use_hash=True) == expected
+    assert loaded == ["data0.xdi"]
+    touch(input_dir / "data0.xdi")
+    assert convert(use_hash=True) == expected
+    assert loaded == []
+    touch(input_dir / "data0.xdi")
+    del expected["dataset06"]
+    expected["dataset07"] = 7500
+    assert convert() == expected
+    assert loaded == ["data0.xdi"]
+
+    # Deleted input files are removed from the manifest, not their outputs
+    (input_dir / "data3.xdi").unlink()
+    assert convert() == expected
+    assert loaded == []
+    with open(manifest.manifest_filename(output_filename)) as fh:
+        recorded = json.load(fh)["files"]
+    assert sorted(pathlib.Path(name).name for name in recorded) == [
+        "data0.xdi",
+        "data1.xdi",
+        "data2.xdi",
+    ]
+    # Files are only hashed with use_hash
+    assert all(record["sha256"] is None for record in recorded.values())
+
+    # Overwrite converts all input files again
+    assert convert(overwrite=True) == {
+        "dataset01": 7500,
+        "dataset02": 7601,
+        "dataset03": 7502,
+    }
+    assert loaded == ["data0.xdi", "data1.xdi", "data2.xdi"]
+
+    # Existing output without incremental mode
+    assert convert_files(file_patterns, str(output_filename), "nexus") == 1
+
+
+@pytest.mark.parametrize("chunks", [None, (1,)])
+def test_convert_files_parallel_nexus(tmp_path, nxxas_model, chunks):
+    filename = tmp_path / "input.h5"
+    storage = hdf5_utils.StoragePolicy(chunks=chunks, compression="gzip")
+    for i in range(1, 3):
+        io.save_model(
+            nxxas_model, f"{filename}?path=/dataset{i:02}", nexus_storage=storage
+        )
+
+    output_filename = tmp_path / "output.h5"
+    return_code = convert_files([str(filename)], str(output_filename), "nexus", jobs=2)
+    assert return_code == 0
+    models = list(io.load_models(output_filename))
+    assert len(models) == 2
+    for model_instance in models:
+        numpy.testing.assert_array_equal(
+            model_instance.intensity.magnitude, nxxas_model.intensity.magnitude
+        )
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_convert_files_metrics(tmp_path, xdi_file, jobs):
+    output_filename = tmp_path / "converted.h5"
+    file_patterns = [str(xdi_file), str(tmp_path / "invalid.xdi")]
+    (tmp_path / "invalid.xdi").write_text("# XDI/1.0\n# Element.edge: K\n1 2\n")
+
+    stats = ConversionStats()
+    return_code = convert_files(
+        file_patterns, str(output_filename), "nexus", jobs=jobs, metrics_sink=stats
+    )
+    assert return_code == 1
+
+    per_file = stats.per_file()
+    assert set(per_file) == {str(xdi_file), str(tmp_path / "invalid.xdi")}
+
+    xdi_stats = per_file[str(xdi_file)]
+    assert xdi_stats["load"]["nmodels"] == 1
+    assert xdi_stats["load"]["nbytes"] == xdi_file.stat().st_size
+    assert xdi_stats["convert"]["nmodels"] == 1
+    assert xdi_stats["save"]["nmodels"] == 1
+    assert xdi_stats["save"]["nbytes"] > 0
+    assert all(totals["nfailed"] == 0 for totals in xdi_stats.values())
+
+    failed_stats = per_file[str(tmp_path / "invalid.xdi")]
+    assert sum(totals["nfailed"] for totals in failed_stats.values()) == 1
+
+    per_stage = stats.per_stage()
+    assert list(per_stage) == ["load", "convert", "save"]
+    assert per_stage["load"]["nfiles"] == 2
+    assert json.loads(stats.to_json())["stages"] == per_stage
+    assert stats.format_table().splitlines()[0].split()[0] == "stage"
+
+
+def test_convert_files_derive_mu(tmp_path):
+    filename = tmp_path / "data.dat"
+    filename.write_text("# energy i0 itrans\n7509 100 50\n7519 110 40\n")
+    output_filename = tmp_path / "output.h5"
+
+    stats = ConversionStats()
+    return_code = convert_files(
+        [str(filename)],
+        str(output_filename),
+        "nexus",
+        derive_mu=False,
+        metrics_sink=stats,
+    )
+    assert return_code == 1
+    assert not output_filename.exists()
+    per_stage = stats.per_stage()
+    assert per_stage["load"]["nfailed"] == 0
+    assert per_stage["convert"]["nfailed"] == 1
+
+    # Derived by default for beamline files
+    return_code = convert_files([str(filename)], str(output_filename), "nexus")
+    assert return_code == 0
+    with h5py.File(output_filename, "r") as nxroot:
+        nxentry = nxroot["dataset01"]
+        assert nxentry["mode/name"][()] == b"transmission"
+        numpy.testing.assert_allclose(
+            nxentry["intensity"][()], numpy.log([100 / 50, 110 / 40])
+        )
@@ -0,0 +1,81 @@
+import os
+
+import h5py
+import pytest
+
+from .. import io
+from ..io import formats
+from ..io import nexus
+
+
+def test_detect_format(tmp_path, xdi_file):
+    assert formats.detect_format(xdi_file).name == "xdi"
+
+    filename = tmp_path / "data.h5"
+    with h5py.File(filename, "w", userblock_size=512):
+        pass
+    assert formats.detect_format(filename).name == "nexus"
+
+    filename = tmp_path / "data.txt"
+    filename.write_text("# energy i0 itrans\n1 2 3\n")
+    assert formats.detect_format(filename).name == "beamline"
+
+    filename = tmp_path / "columns.txt"
+    filename.write_text("1 2 3\n")
+    assert formats.detect_format(filename) is None
+
+    filename = tmp_path / "data.bin"
+    filename.write_bytes(b"\0\1\2\3")
+    assert formats.detect_format(filename) is None
+    with pytest.raises(NotImplementedError):
+        list(io.load_models(filename))
+
+
+@pytest.mark.parametrize("userblock_size", [0, 512, 1024, 2048, 32768])
+def test_detect_format_userblock(tmp_path, userblock_size):
+    filename = tmp_path / "data.h5"
+    with h5py.File(filename, "w", userblock_size=userblock_size) as nxroot:
+        nxroot["data"] = list(range(10))
+    assert formats.detect_format(filename).name == "nexus"
+    assert nexus.is_nexus_file(filename)
+
+
+def test_is_nexus_file(tmp_path):
+    filename = tmp_path / "data.h5"
+    with h5py.File(filename, "w", userblock_size=131072):
+        pass
+    assert nexus.is_nexus_file(filename)
+
+    filename = tmp_path / "data.bin"
+    filename.write_bytes(bytes(4096))
+    assert not nexus.is_nexus_file(filename)
+
+
+def test_detect_format_cache(tmp_path, xdi_file):
+    formats._detect_format.cache_clear()
+    assert formats.detect_format(xdi_file).name == "xdi"
+    assert formats.detect_format(xdi_file).name == "xdi"
+    assert formats._detect_format.cache_info().hits == 1
+
+    with open(xdi_file, "w") as fh:
+        fh.write("# energy mutrans\n7509 0.5\n")
+    stat = os.stat(xdi_file)
+    os.utime(xdi_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert formats.detect_format(xdi_file).name == "beamline"
+
+
+def test_register_format(tmp_path):
+    filename = tmp_path / "data.txt"
+    filename.write_text("# XDI/1.0 custom\n")
+
+    def load_custom(url):
+        yield from []
+
+    formats.register_format(
+        "custom", lambda prefix: b"custom" in prefix, load_custom, priority=100
+    )
+    try:
+        assert formats.detect_format(filename).name == "custom"
+    finally:
+        formats.unregister_format("custom")
+    assert formats.detect_format(filename).name == "xdi"
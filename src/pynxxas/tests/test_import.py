@@ -0,0 +1,40 @@
+import os
+import sys
+import subprocess
+
+# Seconds, can be adapted for slow machines
+_IMPORT_TIME_BUDGET = float(os.environ.get("PYNXXAS_IMPORT_TIME_BUDGET", 0.75))
+
+
+def test_import_time():
+    import_time = _import_time("pynxxas.io")
+    assert import_time < _IMPORT_TIME_BUDGET
+
+
+def test_lazy_imports():
+    code = "\n".join(
+        [
+            "import sys",
+            "import pynxxas.io",
+            "from pynxxas.models import units",
+            "assert units._REGISTRY is None, 'unit registry created on import'",
+            "assert 'charset_normalizer' not in sys.modules",
+        ]
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def _import_time(module: str) -> float:
+    """Cumulative import time in seconds"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    # import time: self [us] | cumulative | imported package
+    for line in result.stderr.splitlines():
+        parts = [s.strip() for s in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1e6
+    raise RuntimeError(f"Import time of '{module}' not found")
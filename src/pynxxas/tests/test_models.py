@@ -1,7 +1,11 @@
+import time
+
 import pytest
 import pydantic
 
-from ..models.nexus import NxElement
+from ..models import NxXasModel, XdiModel
+from ..models.nexus import NxElement, NxXasMode
+from ..models.construct import construct_model
 
 
 def test_nxelement():
@@ -26,3 +30,89 @@ def test_nxelement():
 
         with pytest.raises(pydantic.ValidationError):
             _ = NxElement(symbol=symbol, atomic_number=i + 1)
+
+
+def test_construct_model(nxxas_model):
+    data = nxxas_model.model_dump(by_alias=True, exclude={"title", "plot"})
+    trusted_model = construct_model(NxXasModel, data, check=True)
+    assert trusted_model.model_dump() == nxxas_model.model_dump()
+
+    trusted_model = construct_model(XdiModel, detector={"i1": "Si diode"})
+    assert trusted_model.detector.itrans == "Si diode"
+    assert trusted_model.element is not XdiModel().element
+
+
+def test_construct_model_by_name(nxxas_model):
+    data = nxxas_model.model_dump(by_alias=True, exclude={"title", "plot"})
+    by_alias = construct_model(NxXasModel, data)
+    data["NX_class"] = data.pop("@NX_class")
+    by_name = construct_model(NxXasModel, data)
+    assert by_name.model_dump() == by_alias.model_dump()
+    assert "NX_class" not in by_name.model_extra
+
+    data["@NX_class"] = "NXsubentry"
+    model_instance = construct_model(NxXasModel, data)
+    assert model_instance.NX_class == "NXsubentry"
+    assert "NX_class" not in model_instance.model_extra
+
+
+def test_construct_model_check(nxxas_model):
+    data = nxxas_model.model_dump(by_alias=True, exclude={"title", "plot"})
+    data["mode"]["name"] = "electron yield"
+    _ = construct_model(NxXasModel, data)
+    with pytest.raises(ValueError, match="electron yield"):
+        _ = construct_model(NxXasModel, data, check=True)
+
+    del data["mode"]
+    with pytest.raises(ValueError, match="field required"):
+        _ = construct_model(NxXasModel, data, check=True)
+
+    with pytest.raises(ValueError):
+        _ = construct_model(NxElement, symbol="Fe", atomic_number=27)
+
+
+def test_construct_model_benchmark(nxxas_model):
+    energy = nxxas_model.energy
+    intensity = nxxas_model.intensity
+    nxxas_data = {"element": {"symbol": "Co"}, "edge": {"name": "K"}}
+    xdi_data = {
+        "element": {"symbol": "Co", "edge": "K"},
+        "data": {"energy": energy, "i0": intensity, "mutrans": intensity},
+    }
+
+    def validated_nxxas():
+        model_instance = NxXasModel(mode=NxXasMode(name="transmission"), **nxxas_data)
+        model_instance.energy = energy
+        model_instance.intensity = intensity
+
+    def trusted_nxxas():
+        construct_model(
+            NxXasModel,
+            nxxas_data,
+            check=True,
+            mode={"name": "transmission"},
+            energy=energy,
+            intensity=intensity,
+        )
+
+    def validated_xdi():
+        XdiModel(**xdi_data)
+
+    def trusted_xdi():
+        construct_model(XdiModel, xdi_data)
+
+    def models_per_second(construct, n=2000):
+        construct()
+        t0 = time.perf_counter()
+        for _ in range(n):
+            construct()
+        return n / (time.perf_counter() - t0)
+
+    print()
+    for name, validated, trusted in [
+        ("NxXasModel", validated_nxxas, trusted_nxxas),
+        ("XdiModel", validated_xdi, trusted_xdi),
+    ]:
+        print(f"{name} construction:")
+        print(f" validated: {models_per_second(validated):.0f} models/s")
+        print(f" trusted: {models_per_second(trusted):.0f} models/s")
@@ -0,0 +1,546 @@
+import sys
+import time
+import subprocess
+
+import h5py
+import numpy
+import pydantic
+import pytest
+
+from .. import io
+from ..io import nexus
+from ..io import hdf5_utils
+from ..io import entry_index
+from ..models import units
+from .utils import entry_names
+
+
+def test_save_nexus_file(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    nexus.save_nexus_file(nxxas_model, f"{filename}?path=/dataset01")
+
+    with h5py.File(filename, "r") as nxroot:
+        assert nxroot.attrs["NX_class"] == "NXroot"
+        assert nxroot.attrs["default"] == "dataset01"
+        nxentry = nxroot["dataset01"]
+        assert nxentry.attrs["NX_class"] == "NXentry"
+        numpy.testing.assert_array_equal(nxentry["energy"][()], [7509, 7519])
+        assert nxentry["energy"].attrs["units"] == "eV"
+
+
+def test_nexus_writer(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    with nexus.NexusWriter(str(filename)) as writer:
+        for i in range(1, 4):
+            nexus.save_nexus_file(
+                nxxas_model, f"{filename}?path=/dataset{i:02}", writer=writer
+            )
+
+        with pytest.raises(ValueError):
+            writer.save(nxxas_model, f"{tmp_path / 'other.h5'}?path=/dataset01")
+
+    with h5py.File(filename, "r") as nxroot:
+        names = entry_names(nxroot)
+        assert names == ["dataset01", "dataset02", "dataset03"]
+        for nxentry in map(nxroot.get, names):
+            numpy.testing.assert_array_equal(nxentry["energy"][()], [7509, 7519])
+
+
+def test_save_nexus_models(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    modes = ["transmission", "fy"]
+    nxgroups = [
+        nxxas_model.model_copy(
+            update={
+                "NX_class": "NXsubentry",
+                "mode": nxxas_model.mode.model_copy(update={"name": mode}),
+            }
+        )
+        for mode in modes
+    ]
+    urls = [f"{filename}?path=/dataset01/{mode}" for mode in modes]
+    io.save_models(nxgroups, urls)
+
+    with h5py.File(filename, "r") as nxroot:
+        assert nxroot.attrs["default"] == "dataset01"
+        nxentry = nxroot["dataset01"]
+        assert nxentry.attrs["NX_class"] == "NXentry"
+        assert list(nxentry) == modes
+        assert nxentry.attrs["default"] == "fy"
+        for mode in modes:
+            nxsubentry = nxentry[mode]
+            assert nxsubentry.attrs["NX_class"] == "NXsubentry"
+            assert nxsubentry.attrs["default"] == "plot"
+            assert nxsubentry["mode/name"][()].decode() == mode
+
+    with pytest.raises(ValueError):
+        io.save_models(nxgroups, urls[:1])
+
+
+def test_save_nexus_models_shared_axes(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    energy = units.as_quantity([[7509, 7519], "eV"])
+    shifted = units.as_quantity([[7510, 7520], "eV"])
+    modes = {"transmission": energy, "fy": energy.copy()}
+    nxgroups = [
+        nxxas_model.model_copy(
+            update={
+                "NX_class": "NXsubentry",
+                "mode": nxxas_model.mode.model_copy(update={"name": mode}),
+                "energy": mode_energy,
+            }
+        )
+        for mode, mode_energy in modes.items()
+    ]
+    urls = [f"{filename}?path=/dataset01/{mode}" for mode in modes]
+    urls += [f"{filename}?path=/dataset02/{mode}" for mode in modes]
+    nxgroups += [
+        nxgroup.model_copy(update={"energy": energy}) for nxgroup in nxgroups[:1]
+    ]
+    nxgroups += [
+        nxgroup.model_copy(update={"energy": shifted}) for nxgroup in nxgroups[1:2]
+    ]
+    io.save_models(nxgroups, urls)
+
+    with h5py.File(filename, "r") as nxroot:
+        nxentry = nxroot["dataset01"]
+        assert isinstance(
+            nxentry["transmission"].get("energy", getlink=True), h5py.HardLink
+        )
+        link = nxentry["fy"].get("energy", getlink=True)
+        assert isinstance(link, h5py.SoftLink)
+        assert link.path == "/dataset01/transmission/energy"
+        numpy.testing.assert_array_equal(nxentry["fy/energy"][()], [7509, 7519])
+        assert nxentry["fy/energy"].attrs["units"] == "eV"
+        numpy.testing.assert_array_equal(nxentry["fy/plot/energy"][()], [7509, 7519])
+
+        # Axes are not linked across entries
+        nxentry = nxroot["dataset02"]
+        for mode in modes:
+            assert isinstance(nxentry[mode].get("energy", getlink=True), h5py.HardLink)
+        numpy.testing.assert_array_equal(nxentry["fy/energy"][()], [7510, 7520])
+
+
+def test_nexus_writer_save_blocks(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    modes = ["transmission", "fy"]
+    urls = [f"{filename}?path=/dataset01/{mode}" for mode in modes]
+
+    def iter_blocks():
+        for start in range(0, 10, 4):
+            energy = units.as_quantity([numpy.arange(start, min(start + 4, 10)), "eV"])
+            yield [
+                nxxas_model.model_copy(
+                    update={
+                        "NX_class": "NXsubentry",
+                        "mode": nxxas_model.mode.model_copy(update={"name": mode}),
+                        "energy": energy,
+                        "intensity": units.as_quantity(energy.magnitude * (i + 1)),
+                    }
+                )
+                for i, mode in enumerate(modes)
+            ]
+
+    with nexus.NexusWriter(str(filename)) as writer:
+        writer.save_blocks(iter_blocks(), urls, batch_size=4)
+
+    with h5py.File(filename, "r") as nxroot:
+        nxentry = nxroot["dataset01"]
+        assert nxentry.attrs["default"] == "fy"
+        assert nxentry["transmission"]["energy"].maxshape == (None,)
+        link = nxentry["fy"].get("energy", getlink=True)
+        assert link.path == "/dataset01/transmission/energy"
+        for i, mode in enumerate(modes):
+            nxsubentry = nxentry[mode]
+            numpy.testing.assert_array_equal(nxsubentry["energy"][()], range(10))
+            assert nxsubentry["energy"].attrs["units"] == "eV"
+            numpy.testing.assert_array_equal(
+                nxsubentry["plot/intensity"][()], numpy.arange(10) * (i + 1)
+            )
+
+
+def test_nexus_entry_index(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    modes = ["transmission", "fy"]
+    nxgroups = [
+        nxxas_model.model_copy(
+            update={
+                "NX_class": "NXsubentry",
+                "mode": nxxas_model.mode.model_copy(update={"name": mode}),
+            }
+        )
+        for mode in modes
+    ]
+    io.save_models(nxgroups, [f"{filename}?path=/dataset01/{mode}" for mode in modes])
+    nexus.save_nexus_file(nxxas_model, f"{filename}?path=/dataset02")
+
+    with h5py.File(filename, "r") as nxroot:
+        rows = entry_index.read_entry_index(nxroot)
+    assert [entry_index.decode(path) for path in rows["path"]] == [
+        "/dataset01/transmission",
+        "/dataset01/fy",
+        "/dataset02",
+    ]
+    assert rows["mode"].tolist() == [b"transmission", b"fy", b"transmission"]
+    assert rows["element"].tolist() == [b"Co"] * 3
+    assert rows["npoints"].tolist() == [2] * 3
+    assert rows["energy_min"].tolist() == [7509] * 3
+    assert rows["energy_max"].tolist() == [7519] * 3
+
+    assert nexus.find_nexus_entries(filename, mode="fy") == [
+        f"{filename}?path=/dataset01/fy"
+    ]
+    assert nexus.find_nexus_entries(filename, element="Co", energy=7510) == [
+        f"{filename}?path=/dataset01/transmission",
+        f"{filename}?path=/dataset01/fy",
+        f"{filename}?path=/dataset02",
+    ]
+    assert nexus.find_nexus_entries(f"{filename}?path=/dataset02") == [
+        f"{filename}?path=/dataset02"
+    ]
+    assert not nexus.find_nexus_entries(filename, energy=7600)
+    assert not nexus.find_nexus_entries(filename, element="Fe")
+
+    with nexus.NexusWriter(str(filename)) as writer:
+        writer.remove(f"{filename}?path=/dataset01")
+    assert nexus.find_nexus_entries(filename) == [f"{filename}?path=/dataset02"]
+    (model_instance,) = nexus.load_nexus_file(filename)
+    assert model_instance.mode.name == "transmission"
+
+    # Groups are visited when the index does not match the file
+    with h5py.File(filename, "a") as nxroot:
+        nxroot.move("dataset02", "dataset03")
+    (model_instance,) = nexus.load_nexus_file(filename)
+    assert model_instance.mode.name == "transmission"
+    (header,) = nexus.iter_nexus_headers(filename)
+    assert header["path"] == "/dataset03"
+
+
+def test_find_nexus_entries_without_index(tmp_path):
+    filename = tmp_path / "data.h5"
+    with h5py.File(filename, "w") as nxroot:
+        for name, element in (("entry1", "Fe"), ("entry2", "Cu")):
+            nxentry = nxroot.create_group(name)
+            nxentry.attrs["NX_class"] = "NXentry"
+            nxentry["definition"] = "NXxas"
+            nxentry["mode"] = "fluorescence"
+            nxentry["element/symbol"] = element
+            nxentry["edge/name"] = "K"
+            nxentry["energy"] = [7.1, 7.2]
+            nxentry["energy"].attrs["units"] = "keV"
+            nxentry["intensity"] = [1, 2]
+
+    assert nexus.find_nexus_entries(filename, element="Fe", mode="fy") == [
+        f"{filename}?path=/entry1"
+    ]
+    assert len(nexus.find_nexus_entries(filename, energy=7150)) == 2
+    assert not nexus.find_nexus_entries(filename, energy=7.15)
+
+
+def test_load_nexus_file(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    nexus.save_nexus_file(nxxas_model, f"{filename}?path=/dataset01")
+    nexus.save_nexus_file(nxxas_model, f"{filename}?path=/dataset02")
+
+    models = list(io.load_models(filename))
+    assert len(models) == 2
+    for model_instance in models:
+        assert isinstance(model_instance.energy.magnitude, numpy.memmap)
+        assert model_instance.energy.magnitude.tolist() == [7509, 7519]
+        assert str(model_instance.energy.units) == "eV"
+        assert model_instance.intensity.magnitude.tolist() == [-0.5132917, -0.7849349]
+        assert model_instance.element.symbol == "Co"
+        assert model_instance.title == "Co K (transmission)"
+
+    models = list(nexus.load_nexus_file(f"{filename}?path=/dataset02"))
+    assert len(models) == 1
+
+
+def test_load_nexus_file_chunked(tmp_path):
+    filename = tmp_path / "data.h5"
+    with h5py.File(filename, "w") as nxroot:
+        nxentry = nxroot.create_group("entry")
+        nxentry.attrs["NX_class"] = "NXentry"
+        nxentry["definition"] = "NXxas"
+        nxentry["mode"] = "fluorescence"
+        nxentry["element/symbol"] = "Fe"
+        nxentry["edge/name"] = "K"
+        nxentry.create_dataset("energy", data=[7.1, 7.2], chunks=(1,))
+        nxentry["energy"].attrs["units"] = "keV"
+        nxentry.create_dataset("intensity", data=[1, 2], compression="gzip")
+
+    (model_instance,) = nexus.load_nexus_file(filename)
+    assert model_instance.mode.name == "fy"
+    assert isinstance(model_instance.energy.magnitude, hdf5_utils.LazyDataset)
+    assert isinstance(model_instance.intensity.magnitude, hdf5_utils.LazyDataset)
+    assert model_instance.has_data()
+    numpy.testing.assert_array_equal(model_instance.energy.magnitude, [7.1, 7.2])
+    assert str(model_instance.energy.units) == "keV"
+    numpy.testing.assert_array_equal(model_instance.intensity.magnitude, [1, 2])
+
+
+def test_load_nexus_file_validated(tmp_path):
+    filename = tmp_path / "data.h5"
+    with h5py.File(filename, "w") as nxroot:
+        nxentry = nxroot.create_group("entry")
+        nxentry.attrs["NX_class"] = "NXentry"
+        nxentry["definition"] = "NXxas"
+        nxentry["mode"] = "transmission"
+        nxentry["element/symbol"] = "Fe"
+        nxentry["edge/name"] = "K"
+        nxentry["calculated"] = "maybe"
+
+    with pytest.raises(pydantic.ValidationError, match="calculated"):
+        list(nexus.load_nexus_file(filename))
+
+
+def test_load_nexus_file_closed(tmp_path):
+    filename = tmp_path / "data.h5"
+    with h5py.File(filename, "w") as nxroot:
+        nxentry = nxroot.create_group("entry")
+        nxentry.attrs["NX_class"] = "NXentry"
+        nxentry["definition"] = "NXxas"
+        nxentry["mode"] = "transmission"
+        nxentry["element/symbol"] = "Fe"
+        nxentry["edge/name"] = "K"
+        nxentry.create_dataset("energy", data=[7.1, 7.2], chunks=(1,))
+        nxentry.create_dataset("intensity", data=[1, 2], chunks=(1,))
+
+    (model_instance,) = nexus.load_nexus_file(filename)
+    intensity = model_instance.intensity
+    del model_instance
+    # The file stays open while lazy datasets refer to it
+    numpy.testing.assert_array_equal(intensity.magnitude, [1, 2])
+    del intensity
+    with h5py.File(filename, "a"):
+        pass
+
+    with pytest.raises(KeyError) as excinfo:
+        next(nexus.load_nexus_file(f"{filename}?path=/missing"))
+    # Closed although the traceback refers to the generator
+    assert excinfo.traceback
+    with h5py.File(filename, "a"):
+        pass
+
+
+@pytest.mark.parametrize("chunks", [None, (16,)])
+def test_load_nexus_file_selection(tmp_path, chunks):
+    filename = tmp_path / "data.h5"
+    energy = numpy.linspace(7.0, 7.5, 501)
+    with h5py.File(filename, "w") as nxroot:
+        for name, entry_energy in (("entry1", energy), ("entry2", energy[::-1])):
+            nxentry = nxroot.create_group(name)
+            nxentry.attrs["NX_class"] = "NXentry"
+            nxentry["definition"] = "NXxas"
+            nxentry["mode"] = "transmission"
+            nxentry["element/symbol"] = "Fe"
+            nxentry["edge/name"] = "K"
+            nxentry.create_dataset("energy", data=entry_energy, chunks=chunks)
+            nxentry["energy"].attrs["units"] = "keV"
+            nxentry.create_dataset("intensity", data=entry_energy * 2, chunks=chunks)
+
+    (model_instance,) = nexus.load_nexus_file(
+        f"{filename}?path=/entry1&emin=7099.5&emax=7200.5"
+    )
+    assert str(model_instance.energy.units) == "keV"
+    numpy.testing.assert_allclose(model_instance.energy.magnitude, energy[100:201])
+    numpy.testing.assert_allclose(
+        model_instance.intensity.magnitude, energy[100:201] * 2
+    )
+
+    (model_instance,) = nexus.load_nexus_file(
+        f"{filename}?path=/entry2&emin=7099.5&emax=7200.5"
+    )
+    numpy.testing.assert_allclose(
+        model_instance.energy.magnitude, energy[::-1][300:401]
+    )
+
+    (model_instance,) = nexus.load_nexus_file(
+        f"{filename}?path=/entry1&emin=7099.5&points=::10"
+    )
+    numpy.testing.assert_allclose(model_instance.energy.magnitude, energy[100::10])
+
+    models = list(nexus.load_nexus_file(f"{filename}?points=:3"))
+    assert len(models) == 2
+    for model_instance in models:
+        assert model_instance.energy.size == 3
+        assert model_instance.intensity.size == 3
+
+    (model_instance,) = nexus.load_nexus_file(f"{filename}?path=/entry1&emin=8000")
+    assert not model_instance.has_data()
+
+    with pytest.raises(ValueError, match="positive step"):
+        next(nexus.load_nexus_file(f"{filename}?path=/entry2&emin=7099.5&points=::-1"))
+
+
+def test_save_nexus_file_storage(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+
+    storage = hdf5_utils.StoragePolicy(compact_threshold=1024)
+    nexus.save_nexus_file(nxxas_model, f"{filename}?path=/compact", storage=storage)
+
+    storage = hdf5_utils.StoragePolicy(chunks=(1024,), compression="gzip", shuffle=True)
+    nexus.save_nexus_file(nxxas_model, f"{filename}?path=/gzip", storage=storage)
+
+    with h5py.File(filename, "r") as nxroot:
+        dataset = nxroot["/compact/energy"]
+        layout = dataset.id.get_create_plist().get_layout()
+        assert layout == h5py.h5d.COMPACT
+
+        dataset = nxroot["/gzip/energy"]
+        assert dataset.chunks == (2,)
+        assert dataset.compression == "gzip"
+        assert dataset.shuffle
+
+    for model_instance in nexus.load_nexus_file(filename):
+        energy = numpy.asarray(model_instance.energy.magnitude)
+        numpy.testing.assert_array_equal(energy, [7509, 7519])
+
+
+_STORAGE_POLICIES = {
+    "contiguous": hdf5_utils.StoragePolicy(),
+    "compact": hdf5_utils.StoragePolicy(compact_threshold=64 * 1024),
+    "chunked": hdf5_utils.StoragePolicy(chunks=(1024,)),
+    "gzip": hdf5_utils.StoragePolicy(chunks=(1024,), compression="gzip"),
+    "gzip+shuffle": hdf5_utils.StoragePolicy(
+        chunks=(1024,), compression="gzip", shuffle=True
+    ),
+    "lzf": hdf5_utils.StoragePolicy(chunks=(1024,), compression="lzf"),
+    "lzf+shuffle": hdf5_utils.StoragePolicy(
+        chunks=(1024,), compression="lzf", shuffle=True
+    ),
+}
+
+
+def test_storage_policy_benchmark(tmp_path, nxxas_model):
+    npoints = 2000
+    nentries = 50
+    energy = numpy.linspace(7000, 8000, npoints)
+    intensity = numpy.sin(energy / 50) + numpy.random.normal(scale=0.01, size=npoints)
+    nxxas_model.energy = units.as_quantity((energy, "eV"))
+    nxxas_model.intensity = units.as_quantity(intensity)
+    nbytes = 2 * nentries * npoints * energy.itemsize
+
+    print()
+    print(
+        f"{'storage':>14} {'size (KiB)':>12} {'write (MB/s)':>14} {'read (MB/s)':>14}"
+    )
+    for name, storage in _STORAGE_POLICIES.items():
+        filename = tmp_path / f"{name}.h5"
+
+        t0 = time.perf_counter()
+        with nexus.NexusWriter(str(filename), storage=storage) as writer:
+            for i in range(nentries):
+                writer.save(nxxas_model, f"{filename}?path=/dataset{i:02}")
+        t1 = time.perf_counter()
+        for model_instance in nexus.load_nexus_file(filename):
+            numpy.testing.assert_array_equal(model_instance.energy.magnitude, energy)
+            _ = numpy.asarray(model_instance.intensity.magnitude)
+        t2 = time.perf_counter()
+
+        size = filename.stat().st_size / 1024
+        write_speed = nbytes / (t1 - t0) / 1e6
+        read_speed = nbytes / (t2 - t1) / 1e6
+        print(f"{name:>14} {size:>12.1f} {write_speed:>14.1f} {read_speed:>14.1f}")
+
+
+def test_nexus_stream_writer(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    url = f"{filename}?path=/dataset01"
+    energy = numpy.linspace(7500, 7600, 1000)
+    intensity = numpy.random.uniform(size=1000)
+
+    with nexus.NexusStreamWriter(nxxas_model, url, batch_size=100) as writer:
+        assert writer.npoints == 2
+        writer.append(units.as_quantity((energy[:10] / 1000, "keV")), intensity[:10])
+        for i in range(10, 1000):
+            writer.append(energy[i], intensity[i])
+        assert writer.npoints == 1002
+
+    (model_instance,) = nexus.load_nexus_file(filename)
+    assert model_instance.title == "Co K (transmission)"
+    assert str(model_instance.energy.units) == "eV"
+    numpy.testing.assert_allclose(
+        model_instance.energy.magnitude, [7509, 7519] + energy.tolist()
+    )
+    numpy.testing.assert_allclose(
+        model_instance.intensity.magnitude,
+        [-0.5132917, -0.7849349] + intensity.tolist(),
+    )
+    with h5py.File(filename, "r") as nxroot:
+        assert nxroot["/dataset01/energy"].maxshape == (None,)
+        assert nxroot["/dataset01/plot/energy"].shape == (1002,)
+        (row,) = entry_index.read_entry_index(nxroot)
+        assert row["npoints"] == 1002
+        assert row["energy_min"] == 7500
+        assert row["energy_max"] == 7600
+
+
+def test_nexus_stream_writer_swmr(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    url = f"{filename}?path=/dataset01"
+
+    code = "\n".join(
+        [
+            "from pynxxas.io import nexus",
+            f"(model_instance,) = nexus.load_nexus_file({str(filename)!r}, swmr=True)",
+            "print(model_instance.energy.size)",
+        ]
+    )
+
+    with nexus.NexusStreamWriter(nxxas_model, url, batch_size=10, swmr=True) as writer:
+        for energy in range(25):
+            writer.append(energy, 0)
+        result = subprocess.run(
+            [sys.executable, "-c", code], check=True, capture_output=True, text=True
+        )
+        assert int(result.stdout) == 20
+
+    # Entries which are being streamed are visible next to finished entries
+    code = "\n".join(
+        [
+            "from pynxxas.io import nexus",
+            f"models = nexus.load_nexus_file({str(filename)!r}, swmr=True)",
+            "print(*[model_instance.energy.size for model_instance in models])",
+        ]
+    )
+    url = f"{filename}?path=/dataset02"
+    with nexus.NexusStreamWriter(nxxas_model, url, batch_size=10, swmr=True) as writer:
+        writer.append(numpy.arange(8), numpy.zeros(8))
+        result = subprocess.run(
+            [sys.executable, "-c", code], check=True, capture_output=True, text=True
+        )
+        assert result.stdout.split() == ["27", "10"]
+
+    with h5py.File(filename, "r") as nxroot:
+        rows = entry_index.read_entry_index(nxroot)
+    assert rows["npoints"].tolist() == [27, 10]
+
+
+def test_nexus_stream_writer_swmr_failed(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    nexus.save_nexus_file(nxxas_model, f"{filename}?path=/dataset01")
+
+    # The file was not created with libver="latest"
+    url = f"{filename}?path=/dataset02"
+    with pytest.raises(Exception):
+        nexus.NexusStreamWriter(nxxas_model, url, swmr=True)
+    with h5py.File(filename, "r") as nxroot:
+        assert "dataset02" not in nxroot
+        rows = entry_index.read_entry_index(nxroot)
+    assert [entry_index.decode(path) for path in rows["path"]] == ["/dataset01"]
+
+
+def test_load_nexus_file_unindexed(tmp_path, nxxas_model):
+    filename = tmp_path / "data.h5"
+    nexus.save_nexus_file(nxxas_model, f"{filename}?path=/dataset01")
+    with h5py.File(filename, "a") as nxroot:
+        nxroot.copy("dataset01", "dataset02")
+
+    # The entry index does not match the file
+    assert len(list(nexus.load_nexus_file(filename))) == 2
+    assert len(list(nexus.iter_nexus_headers(filename))) == 2
+    assert nexus.find_nexus_entries(filename) == [
+        f"{filename}?path=/dataset01",
+        f"{filename}?path=/dataset02",
+    ]
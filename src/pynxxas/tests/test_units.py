@@ -1,4 +1,5 @@
 import pint
+import pytest
 import numpy
 from pydantic import TypeAdapter
 
@@ -25,3 +26,25 @@ def _assert_quantity_equal(ta: TypeAdapter, *args):
     assert str(validated.units) == str(expected.units)
 
     validated = ta.validate_python(expected)
+
+
+def test_units_cache():
+    units.clear_units_cache()
+
+    assert units.as_units("keV") is units.as_units("keV")
+    with pytest.raises(pint.UndefinedUnitError):
+        units.as_units("mutrans")
+    with pytest.raises(pint.UndefinedUnitError):
+        units.as_units("mutrans")
+
+    hits, misses, _, currsize = units.units_cache_info()
+    assert hits == 2
+    assert misses == 2
+    assert currsize == 2
+
+
+def test_from_magnitude():
+    magnitude = numpy.array([7.1, 7.2])
+    quantity = units.from_magnitude(magnitude, "keV")
+    assert quantity.magnitude is magnitude
+    assert str(quantity.units) == "keV"
@@ -0,0 +1,41 @@
+import pytest
+
+from ..io import url_utils
+
+
+def test_as_url(tmp_path):
+    filename = str(tmp_path / "data.h5")
+    url = url_utils.as_url(filename)
+    assert url.path == filename
+    assert url.internal_path == ""
+    assert not url.has_selection()
+
+    url = url_utils.as_url(f"{filename}?path=/dataset03&emin=7100&emax=7200.5")
+    assert url.internal_path == "/dataset03"
+    assert url.emin == 7100
+    assert url.emax == 7200.5
+    assert url.points is None
+    assert url.has_selection()
+
+
+@pytest.mark.parametrize(
+    "query,points",
+    [
+        ("points=100:300", slice(100, 300)),
+        ("points=::10", slice(None, None, 10)),
+        ("points=-200:", slice(-200, None)),
+        ("points=5", slice(5, 6)),
+        ("points=-1", slice(-1, None)),
+    ],
+)
+def test_as_url_points(tmp_path, query, points):
+    url = url_utils.as_url(f"{tmp_path / 'data.h5'}?{query}")
+    assert url.points == points
+
+
+@pytest.mark.parametrize(
+    "query", ["points=a:b", "points=1:2:3:4", "points=::0", "points=::-1", "emin=x"]
+)
+def test_as_url_invalid_query(tmp_path, query):
+    with pytest.raises(ValueError):
+        url_utils.as_url(f"{tmp_path / 'data.h5'}?{query}")
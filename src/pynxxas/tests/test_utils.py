@@ -0,0 +1,22 @@
+import pytest
+
+from ..io import utils
+
+
+@pytest.mark.parametrize(
+    "sample,encoding",
+    [
+        (b"# energy i0\n1 2\n", "utf-8"),
+        ("# Å\n1 2\n".encode("utf-8"), "utf-8"),
+        ("# Å\n1 2\n".encode("utf-8")[:3], "utf-8"),
+    ],
+)
+def test_detect_encoding(sample, encoding):
+    assert utils.detect_encoding(sample) == encoding
+
+
+def test_detect_encoding_fallback():
+    sample = "# température à l'échantillon\n".encode("latin-1")
+    encoding = utils.detect_encoding(sample)
+    assert encoding != "utf-8"
+    assert "température" in sample.decode(encoding)
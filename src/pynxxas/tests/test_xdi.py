@@ -1,4 +1,16 @@
+import sys
+import time
+import datetime
+import pathlib
+import subprocess
+
+import numpy
+import pytest
+
 from ..io import xdi
+from ..models import units
+
+_XDI_FILES = sorted((pathlib.Path(__file__).parents[3] / "xdi_files").glob("*.xdi"))
 
 
 def test_is_xdi(xdi_file):
@@ -31,3 +43,159 @@ def test_load_xdi_file(xdi_file):
 
     assert model_instance.data.i0.magnitude.tolist() == [165872.70, 161255.70]
     assert str(model_instance.data.i0.units) == ""
+
+
+def test_load_xdi_file_columns(xdi_file):
+    model_instance = next(xdi.load_xdi_file(xdi_file))
+    columns = [
+        model_instance.data.energy.magnitude,
+        model_instance.data.mutrans.magnitude,
+        model_instance.data.i0.magnitude,
+    ]
+    for column in columns:
+        assert column.flags.c_contiguous
+        assert column.dtype == numpy.float64
+        assert numpy.shares_memory(column, columns[0].base)
+
+    model_instance = next(xdi.load_xdi_file(xdi_file, dtype=numpy.float32))
+    assert model_instance.data.energy.magnitude.dtype == numpy.float32
+    assert model_instance.data.energy.magnitude.tolist() == [7509, 7519]
+
+
+def test_iter_xdi_blocks(xdi_file):
+    models = list(xdi.iter_xdi_blocks(xdi_file, rows_per_block=1))
+    assert len(models) == 2
+    assert [m.data.energy.magnitude.tolist() for m in models] == [[7509], [7519]]
+    for model_instance in models:
+        assert str(model_instance.data.energy.units) == "eV"
+        assert model_instance.data.i0.magnitude.flags.c_contiguous
+        assert model_instance.facility.energy.magnitude == 7
+
+    models = list(xdi.iter_xdi_blocks(xdi_file, rows_per_block=2))
+    assert len(models) == 1
+    assert models[0].data.energy.magnitude.tolist() == [7509, 7519]
+
+
+@pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="resets the peak RSS in /proc"
+)
+def test_load_xdi_file_memory(tmp_path):
+    filename = tmp_path / "large.xdi"
+    ncolumns = 8
+    nrows = 200_000
+    columns = "".join(f"# Column.{i}: col{i}\n" for i in range(1, ncolumns + 1))
+    table = numpy.random.uniform(size=(nrows, ncolumns))
+    with open(filename, "w") as fh:
+        fh.write(f"# XDI/1.0\n{columns}#----\n")
+        numpy.savetxt(fh, table, fmt="%.6f")
+
+    peaks = {
+        mode: _peak_rss_increase(filename, mode)
+        for mode in ("rows", "float64", "float32")
+    }
+
+    print()
+    print(f"Peak RSS increase loading a {table.nbytes / 1024**2:.0f} MB XDI table:")
+    for mode, peak in peaks.items():
+        print(f" {mode}: {peak / 1024**2:.0f} MB")
+    assert peaks["float64"] < peaks["rows"]
+    assert peaks["float32"] < peaks["float64"]
+
+
+def _peak_rss_increase(filename: pathlib.Path, mode: str) -> int:
+    """Returns the increase of the peak resident memory (bytes) of a new process
+    while loading the data columns of an XDI file. The "rows" mode loads the table
+    like before and makes contiguous copies of the columns, as happens when saving.
+    """
+    code = f"""
+import numpy
+
+from pynxxas.io import xdi
+
+def status(key):
+    with open("/proc/self/status") as fh:
+        for line in fh:
+            if line.startswith(key):
+                return int(line.split()[1]) * 1024
+
+with open("/proc/self/clear_refs", "w") as fh:
+    fh.write("5")  # reset the peak RSS
+before = status("VmRSS")
+
+filename = {str(filename)!r}
+mode = {mode!r}
+if mode == "rows":
+    with open(filename, "rb") as file:
+        _ = xdi._read_xdi_header(file, filename)
+        table = numpy.loadtxt(file, dtype=float, ndmin=2)
+    columns = [numpy.ascontiguousarray(column) for column in table.T]
+else:
+    model_instance = next(xdi.load_xdi_file(filename, dtype=mode))
+print(status("VmHWM") - before)
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    )
+    return int(result.stdout)
+
+
+@pytest.mark.skipif(not _XDI_FILES, reason="XDI example files not available")
+def test_load_xdi_file_benchmark():
+    nrepeats = 5
+
+    t0 = time.perf_counter()
+    for _ in range(nrepeats):
+        expected = [_load_xdi_table_two_pass(filename) for filename in _XDI_FILES]
+    t1 = time.perf_counter()
+    for _ in range(nrepeats):
+        tables = [_load_xdi_table_single_pass(filename) for filename in _XDI_FILES]
+    t2 = time.perf_counter()
+
+    for filename, table, expected_table in zip(_XDI_FILES, tables, expected):
+        numpy.testing.assert_array_equal(table, expected_table, err_msg=filename.name)
+
+    nfiles = nrepeats * len(_XDI_FILES)
+    print(
+        f"\nXDI loading ({nfiles} files): two-pass {t1-t0:.3f} s, single-pass {t2-t1:.3f} s"
+    )
+
+
+def _load_xdi_table_two_pass(filename: pathlib.Path) -> numpy.ndarray:
+    with open(filename, "rb") as file:
+        _ = xdi._read_xdi_header(file, str(filename))
+    return numpy.loadtxt(filename, dtype=float, ndmin=2).T
+
+
+def _load_xdi_table_single_pass(filename: pathlib.Path) -> numpy.ndarray:
+    with open(filename, "rb") as file:
+        _ = xdi._read_xdi_header(file, str(filename))
+        return xdi._read_xdi_table(file)
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("13-ID-C", "13-ID-C"),
+        ("Si 111", "Si 111"),
+        ("10cm  N2", "10cm  N2"),
+        ("42", units.as_quantity(42)),
+        ("-3.5e2", units.as_quantity(-350.0)),
+        ("7112.", units.as_quantity(7112.0)),
+        ("7.00 GeV", units.as_quantity("7 GeV")),
+        ("10 parsecs of tape", "10 parsecs of tape"),
+        ("2001-06-26T21:21:20", datetime.datetime(2001, 6, 26, 21, 21, 20)),
+        ("2001-06-26 at noon", "2001-06-26 at noon"),
+    ],
+)
+def test_parse_xdi_value(value, expected):
+    parsed = xdi._parse_xdi_value(value)
+    assert type(parsed) is type(expected)
+    assert parsed == expected
+    assert xdi._parse_xdi_value(value) == parsed
+
+
+def test_parse_xdi_value_is_not_shared():
+    parsed = xdi._parse_xdi_value("7.00 GeV")
+    parsed.ito("MeV")
+    assert xdi._parse_xdi_value("7.00 GeV") == units.as_quantity("7 GeV")
+    assert str(xdi._parse_xdi_value("7.00 GeV").units) == "GeV"
@@ -0,0 +1,8 @@
+from typing import List
+
+import h5py
+
+
+def entry_names(nxroot: h5py.File) -> List[str]:
+    """Names of the groups at the root of a NeXus file (without the entry index)"""
+    return [name for name in nxroot if nxroot.get(name, getclass=True) is h5py.Group]